@@ -0,0 +1,276 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# Bump whenever the arrays written below (or the models producing them) change
+FORMAT_VERSION = 3
+
+
+def content_hash(csv_path: Path, params: Optional[Dict[str, Any]] = None) -> str:
+    """SHA-256 of the catalogue CSV, the artifact format and model parameters."""
+    digest = hashlib.sha256()
+    with open(csv_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    digest.update(json.dumps({"format": FORMAT_VERSION, "params": params or {}}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class ModelArtifacts:
+    """
+    Directory of fitted model arrays, one .npy file per array plus meta.json.
+
+    Arrays are loaded with np.load(mmap_mode='r'), so every worker process
+    maps the same files and shares their pages instead of refitting.
+    """
+
+    def __init__(self, root: Path, key: str):
+        self.root = Path(root)
+        self.key = key
+        self.path = self.root / key[:16]
+
+    def exists(self) -> bool:
+        meta = self.path / "meta.json"
+        if not meta.exists():
+            return False
+        with open(meta) as f:
+            return json.load(f).get("key") == self.key
+
+    def save(self, arrays: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None, replace: bool = False):
+        """
+        Write all arrays, then publish the directory atomically.
+
+        With replace, a directory already published under this key is
+        swapped out (processes that mapped its files keep their pages);
+        otherwise the first one published wins.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=self.root))
+        try:
+            for name, array in arrays.items():
+                np.save(staging / f"{name}.npy", np.ascontiguousarray(array), allow_pickle=False)
+            with open(staging / "meta.json", 'w') as f:
+                json.dump({"key": self.key, "format": FORMAT_VERSION, "arrays": sorted(arrays), **(meta or {})}, f)
+            if replace and self.path.exists():
+                retired = Path(tempfile.mkdtemp(prefix=".retired-", dir=self.root))
+                os.replace(self.path, retired)
+                try:
+                    os.rename(staging, self.path)
+                finally:
+                    shutil.rmtree(retired, ignore_errors=True)
+                return
+            try:
+                os.rename(staging, self.path)
+            except OSError:
+                # Another process published the same artifact first
+                shutil.rmtree(staging, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    def load(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Memory-map every array; returns (arrays, meta)."""
+        with open(self.path / "meta.json") as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(self.path / f"{name}.npy", mmap_mode='r', allow_pickle=False)
+            for name in meta["arrays"]
+        }
+        return arrays, meta
+
+
+class StringColumn:
+    """Read-only sequence of optional strings backed by a UTF-8 blob and offsets."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, missing: Optional[np.ndarray] = None, intern: bool = False):
+        self.blob = blob
+        self.offsets = offsets
+        self.missing = missing
+        self.intern = intern
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str, intern: bool = False) -> "StringColumn":
+        return cls(arrays[f"{prefix}.blob"], arrays[f"{prefix}.offsets"], arrays.get(f"{prefix}.missing"), intern)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Optional[str], List[Optional[str]]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if self.missing is not None and self.missing[index]:
+            return None
+        value = bytes(self.blob[self.offsets[index]:self.offsets[index + 1]]).decode('utf-8')
+        return sys.intern(value) if self.intern else value
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        return iter(self.tolist())
+
+    def tolist(self) -> List[Optional[str]]:
+        """Every value, decoding the blob in one pass when it is plain ASCII."""
+        blob = np.asarray(self.blob)
+        if len(blob) and blob.max() >= 0x80:
+            return [self[i] for i in range(len(self))]
+        # ASCII: byte offsets are character offsets into the decoded text
+        text = blob.tobytes().decode('ascii')
+        offsets = self.offsets.tolist()
+        values = [text[start:end] for start, end in zip(offsets, offsets[1:])]
+        if self.intern:
+            values = [sys.intern(value) for value in values]
+        if self.missing is not None:
+            for i in np.flatnonzero(self.missing).tolist():
+                values[i] = None
+        return values
+
+
+class EditableStringColumn:
+    """
+    StringColumn with replaced and appended values kept beside it.
+
+    The blob stays shared and undecoded, so an edit costs O(1) rather than
+    a copy of the column.
+    """
+
+    def __init__(self, base: StringColumn):
+        self.base = base
+        self.replaced: Dict[int, Optional[str]] = {}  # row within the base -> new value
+        self.appended: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.appended)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Optional[str], List[Optional[str]]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index >= len(self.base):
+            return self.appended[index - len(self.base)]
+        if index in self.replaced:
+            return self.replaced[index]
+        return self.base[index]
+
+    def __setitem__(self, index: int, value: Optional[str]):
+        if index < 0:
+            index += len(self)
+        if index >= len(self.base):
+            self.appended[index - len(self.base)] = value
+        else:
+            self.replaced[index] = value
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        return iter(self.tolist())
+
+    def append(self, value: Optional[str]):
+        self.appended.append(value)
+
+    def tolist(self) -> List[Optional[str]]:
+        values = self.base.tolist()
+        for index, value in self.replaced.items():
+            values[index] = value
+        return values + self.appended
+
+
+class StringColumnBuilder:
+    """Accumulates chunks of optional strings straight into StringColumn blob/offset form."""
+
+    def __init__(self):
+        self._blobs: List[bytes] = []
+        self._lengths: List[np.ndarray] = []
+        self._missing: List[np.ndarray] = []
+
+    def append(self, values: pd.Series):
+        """Add a chunk; NaN/None entries are recorded as missing."""
+        missing = values.isna().to_numpy()
+        strings = values.tolist()
+        if missing.any():
+            strings = ['' if absent else value for value, absent in zip(strings, missing)]
+        # Encode the chunk as one string; for ASCII text byte lengths equal character lengths
+        text = ''.join(strings)
+        blob = text.encode('utf-8')
+        if len(blob) == len(text):
+            lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+        else:
+            lengths = np.fromiter((len(value.encode('utf-8')) for value in strings), dtype=np.int64, count=len(strings))
+        self._blobs.append(blob)
+        self._lengths.append(lengths)
+        self._missing.append(missing)
+
+    def build(self, intern: bool = False) -> StringColumn:
+        lengths = np.concatenate(self._lengths) if self._lengths else np.empty(0, dtype=np.int64)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        missing = np.concatenate(self._missing) if self._missing else np.empty(0, dtype=bool)
+        # Copy chunk by chunk, releasing each, rather than joining (which doubles the peak)
+        blob = np.empty(sum(len(chunk) for chunk in self._blobs), dtype=np.uint8)
+        position = 0
+        self._blobs.reverse()
+        while self._blobs:
+            chunk = self._blobs.pop()
+            blob[position:position + len(chunk)] = np.frombuffer(chunk, dtype=np.uint8)
+            position += len(chunk)
+        return StringColumn(blob, offsets, missing if missing.any() else None, intern)
+
+
+def csr_to_arrays(prefix: str, matrix: sp.csr_matrix) -> Dict[str, np.ndarray]:
+    matrix = sp.csr_matrix(matrix)
+    return {
+        f"{prefix}.data": matrix.data,
+        f"{prefix}.indices": matrix.indices,
+        f"{prefix}.indptr": matrix.indptr,
+        f"{prefix}.shape": np.asarray(matrix.shape, dtype=np.int64),
+    }
+
+
+def csr_from_arrays(arrays: Dict[str, np.ndarray], prefix: str) -> sp.csr_matrix:
+    """CSR matrix over (possibly memory-mapped) arrays, without copying them."""
+    shape = tuple(int(n) for n in arrays[f"{prefix}.shape"])
+    return sp.csr_matrix(
+        (arrays[f"{prefix}.data"], arrays[f"{prefix}.indices"], arrays[f"{prefix}.indptr"]),
+        shape=shape,
+        copy=False
+    )
+
+
+def strings_to_arrays(prefix: str, values) -> Dict[str, np.ndarray]:
+    """UTF-8 blob + offsets (+ missing mask) for a sequence of optional strings."""
+    if isinstance(values, StringColumn):
+        missing = values.missing if values.missing is not None else np.zeros(len(values), dtype=bool)
+        return {f"{prefix}.blob": values.blob, f"{prefix}.offsets": values.offsets, f"{prefix}.missing": missing}
+    values = list(values)
+    encoded = [b'' if value is None else value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    return {
+        f"{prefix}.blob": np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        f"{prefix}.offsets": offsets,
+        f"{prefix}.missing": np.array([value is None for value in values], dtype=bool),
+    }
+
+
+def vectorizer_to_arrays(prefix: str, vectorizer: TfidfVectorizer) -> Dict[str, np.ndarray]:
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    return {
+        **strings_to_arrays(f"{prefix}.terms", terms),
+        f"{prefix}.idf": vectorizer.idf_,
+    }
+
+
+def vectorizer_from_arrays(arrays: Dict[str, np.ndarray], prefix: str, **params) -> TfidfVectorizer:
+    """Rebuild a fitted TfidfVectorizer (same params) from its vocabulary and IDF weights."""
+    terms = StringColumn.from_arrays(arrays, f"{prefix}.terms")
+    vectorizer = TfidfVectorizer(**params)
+    vectorizer.vocabulary_ = {term: i for i, term in enumerate(terms)}
+    vectorizer.idf_ = np.asarray(arrays[f"{prefix}.idf"])
+    return vectorizer
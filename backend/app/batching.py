@@ -0,0 +1,132 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Tuple
+from .concurrency import BoundedExecutor
+from .metrics import Histogram
+from .models import Movie, RecommendationMode
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+BATCH_SIZE = Histogram(
+    "recommend_batch_size", "Requests per coalesced /recommend batch.", labels=("mode",), buckets=BATCH_SIZE_BUCKETS
+)
+QUEUE_DELAY = Histogram(
+    "recommend_queue_delay_seconds", "Time from a /recommend call arriving to its batch starting to score.",
+    labels=("mode",)
+)
+
+
+class RecommendationCoalescer:
+    """
+    Coalesces concurrent recommend requests into batches.
+
+    Requests for the same (mode, limit) are collected for up to `window`
+    seconds or `max_batch` requests, whichever comes first, then scored by
+    one DataService.get_recommendations_many call on the executor (one
+    matrix product per mode instead of one per request). Each awaiting
+    handler gets its own slice of the result, or the batch's exception.
+    Runs entirely on the event loop; only the scoring call leaves it.
+    """
+
+    def __init__(self, service, executor: BoundedExecutor, window: float = 0.002, max_batch: int = 64):
+        """
+        Args:
+            service: DataService providing get_recommendations_many
+            executor: Pool the batched scoring call runs on
+            window: Seconds to wait for more requests after the first one of a batch
+            max_batch: Requests that close a batch early
+        """
+        self.service = service
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[Tuple[RecommendationMode, int], List[Tuple[str, asyncio.Future, float]]] = {}
+        self._timers: Dict[Tuple[RecommendationMode, int], asyncio.TimerHandle] = {}
+        self._tasks = set()
+        self.batches = 0
+        self.requests = 0
+        self.max_batch_size = 0
+        self.batch_sizes = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+
+    async def get_recommendations(self, user_id: str, mode: RecommendationMode, limit: int = 10) -> List[Movie]:
+        """Recommendations for one user, scored together with concurrent requests."""
+        loop = asyncio.get_running_loop()
+        key = (RecommendationMode(mode), limit)
+        future = loop.create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((user_id, future, time.monotonic()))
+        if len(batch) >= self.max_batch:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch size and queueing delay (enqueue to scoring start) counters."""
+        histogram = {f"le_{bound}": count for bound, count in zip(BATCH_SIZE_BUCKETS, self.batch_sizes)}
+        histogram[f"gt_{BATCH_SIZE_BUCKETS[-1]}"] = self.batch_sizes[-1]
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "pending": sum(len(batch) for batch in self._pending.values()),
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "batch_sizes": histogram,
+            "mean_queue_delay_ms": round(self.total_queue_delay / self.requests * 1000, 3) if self.requests else 0.0,
+            "max_queue_delay_ms": round(self.max_queue_delay * 1000, 3)
+        }
+
+    def _flush(self, key: Tuple[RecommendationMode, int]):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if batch:
+            task = asyncio.ensure_future(self._run(key, batch))
+            # The loop only keeps weak references to tasks
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Tuple[RecommendationMode, int], batch: List[Tuple[str, asyncio.Future, float]]):
+        # Handlers that gave up (client gone, deadline) need no scoring
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        mode, limit = key
+        user_ids = list(dict.fromkeys(user_id for user_id, _, _ in batch))
+        try:
+            started, results = await self.executor.run(self._score, user_ids, mode, limit)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._record(batch, started, mode)
+        by_user = dict(zip(user_ids, results))
+        for user_id, future, _ in batch:
+            if not future.done():
+                future.set_result(list(by_user[user_id]))
+
+    def _score(self, user_ids: List[str], mode: RecommendationMode, limit: int) -> Tuple[float, List[List[Movie]]]:
+        started = time.monotonic()
+        return started, self.service.get_recommendations_many(user_ids, mode, limit)
+
+    def _record(self, batch: List[Tuple[str, asyncio.Future, float]], started: float, mode: RecommendationMode):
+        size = len(batch)
+        BATCH_SIZE.observe(size, mode.value)
+        self.batches += 1
+        self.requests += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        bucket = next((i for i, bound in enumerate(BATCH_SIZE_BUCKETS) if size <= bound), len(BATCH_SIZE_BUCKETS))
+        self.batch_sizes[bucket] += 1
+        for _, _, enqueued in batch:
+            delay = max(started - enqueued, 0.0)
+            QUEUE_DELAY.observe(delay, mode.value)
+            self.total_queue_delay += delay
+            self.max_queue_delay = max(self.max_queue_delay, delay)
@@ -0,0 +1,228 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+
+class RecommendationCache:
+    """
+    LRU + TTL cache for recommendation results.
+
+    Keys start with the user ID so every entry of a user can be dropped at
+    once when their preferences change. Callers pass the TTL on lookup,
+    which lets modes that depend on other users' preferences use a shorter
+    staleness window than modes that only depend on the user's own.
+    """
+
+    def __init__(self, max_entries: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._keys_by_user: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: tuple, ttl: float) -> Optional[Any]:
+        """Cached value for `key` if it is younger than `ttl` seconds."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if self._clock() - stored_at > ttl:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: tuple, value: Any):
+        """Store a value; key[0] must be the user ID."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = (self._clock(), value)
+            self._keys_by_user.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: str):
+        """Drop every cached entry for a user."""
+        with self._lock:
+            for key in self._keys_by_user.pop(user_id, ()):
+                self._entries.pop(key, None)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+    def _remove(self, key: Hashable):
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+
+class SimilarityCache:
+    """
+    LRU cache of each user's nearest neighbours, bounded by entries, bytes and age.
+
+    Entries map a user ID to a list of (neighbour ID, similarity). A reverse
+    index maps every neighbour to the users whose entries list it, so a
+    preference change drops exactly the entries it can make stale: the
+    user's own and every entry it appears in.
+
+    A change can also promote a user into someone's neighbour list without
+    them being listed yet, which no reverse index can see; entries older
+    than `max_age` seconds are therefore dropped on lookup. Dropped entries
+    are recomputed on their next lookup (counted as refreshes); the users
+    awaiting one are tracked up to `max_entries`, oldest forgotten first.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_bytes: int = 32 * 2**20,
+        max_age: float = float('inf'),
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._clock = clock
+        # user -> (neighbours, bytes, stored at)
+        self._entries: "OrderedDict[str, Tuple[List[Tuple[str, float]], int, float]]" = OrderedDict()
+        self._dependents: Dict[str, Set[str]] = {}  # neighbour -> users whose entry lists it
+        self._stale: "OrderedDict[str, None]" = OrderedDict()  # dropped and not yet recomputed
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.refreshes = 0
+
+    def get(self, user_id: str) -> Optional[List[Tuple[str, float]]]:
+        """Cached neighbours of a user if younger than max_age, or None."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self._clock() - entry[2] > self.max_age:
+                self._remove(user_id)
+                self._mark_stale((user_id,))
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, user_id: str, neighbours: List[Tuple[str, float]]):
+        """Store a user's neighbours, evicting least recently used entries over either bound."""
+        size = _neighbour_list_bytes(neighbours)
+        with self._lock:
+            self._remove(user_id)
+            if user_id in self._stale:
+                del self._stale[user_id]
+                self.refreshes += 1
+            self._entries[user_id] = (neighbours, size, self._clock())
+            self._bytes += size
+            for neighbour, _ in neighbours:
+                self._dependents.setdefault(neighbour, set()).add(user_id)
+            while len(self._entries) > self.max_entries or (self._bytes > self.max_bytes and len(self._entries) > 1):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, user_id: str):
+        """Drop the user's own entry and every entry that lists them as a neighbour."""
+        with self._lock:
+            affected = self._dependents.get(user_id, set()) | ({user_id} if user_id in self._entries else set())
+            for key in affected:
+                self._remove(key)
+                self.invalidations += 1
+            self._mark_stale(affected)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dependents.clear()
+            self._stale.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss, eviction, expiration, invalidation and refresh counters, size and memory use."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "refreshes": self.refreshes
+            }
+
+    def _remove(self, user_id: str):
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return
+        neighbours, size, _ = entry
+        self._bytes -= size
+        for neighbour, _ in neighbours:
+            dependents = self._dependents.get(neighbour)
+            if dependents is not None:
+                dependents.discard(user_id)
+                if not dependents:
+                    del self._dependents[neighbour]
+
+    def _mark_stale(self, user_ids: Iterable[str]):
+        for user_id in user_ids:
+            self._stale[user_id] = None
+            self._stale.move_to_end(user_id)
+        while len(self._stale) > self.max_entries:
+            self._stale.popitem(last=False)
+
+
+def _neighbour_list_bytes(neighbours: List[Tuple[str, float]]) -> int:
+    """Memory held by a neighbour list: the list, its tuples and floats (IDs are shared)."""
+    return sys.getsizeof(neighbours) + sum(sys.getsizeof(pair) + sys.getsizeof(pair[1]) for pair in neighbours)
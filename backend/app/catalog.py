@@ -0,0 +1,374 @@
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from .artifacts import EditableStringColumn, StringColumn, StringColumnBuilder, strings_to_arrays
+from .models import MAX_MOVIE_ID, Movie
+
+STRING_COLUMNS = ('titles', 'genres', 'directors', 'descriptions', 'poster_urls', 'trailer_ids')
+
+# movies.csv column -> parse dtype; text columns map to the STRING_COLUMNS attributes.
+# Integers parse as float64 (NaN for blanks, checked in bulk) - much faster than Int64
+CSV_DTYPES = {
+    'id': 'float64',
+    'title': object,
+    'genre': object,
+    'year': 'float64',
+    'director': object,
+    'description': object,
+    'rating': 'float64',
+    'poster_url': object,
+    'trailer_id': object,
+}
+CSV_TEXT_COLUMNS = {
+    'title': 'titles',
+    'genre': 'genres',
+    'director': 'directors',
+    'description': 'descriptions',
+    'poster_url': 'poster_urls',
+    'trailer_id': 'trailer_ids',
+}
+REQUIRED_CSV_COLUMNS = ('id', 'title', 'genre', 'year', 'director', 'description', 'rating')
+
+
+class MovieCatalog:
+    """
+    Columnar movie catalogue shared by DataService and every recommender.
+
+    Numeric fields are NumPy columns, repeated strings (genre, director) are
+    interned, and IDs are looked up by binary search in a sorted copy (plus
+    a dict of movies upserted since). Movie objects are only built when a
+    response needs them, then cached.
+
+    Rows are only ever appended (upsert replaces a movie in place), so a
+    row keeps naming the same movie for the life of the process. Upserts
+    write into numeric columns with spare capacity and leave string blobs
+    shared, so each one is O(1) amortised.
+    """
+
+    def __init__(
+        self,
+        ids: Iterable[int],
+        titles: List[str],
+        genres: List[str],
+        years: Iterable[int],
+        directors: List[str],
+        descriptions: List[str],
+        ratings: Iterable[float],
+        poster_urls: Optional[Sequence[Optional[str]]] = None,
+        trailer_ids: Optional[Sequence[Optional[str]]] = None,
+        id_index: Optional[Tuple[np.ndarray, np.ndarray]] = None
+    ):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        n = len(self.ids)
+        self.titles = _string_column(titles)
+        self.genres = _string_column(genres, intern=True)
+        self.years = np.asarray(years, dtype=np.int32)
+        self.directors = _string_column(directors, intern=True)
+        self.descriptions = _string_column(descriptions)
+        self.ratings = np.asarray(ratings, dtype=np.float64)
+        self.poster_urls = _string_column(poster_urls) if poster_urls is not None else [None] * n
+        self.trailer_ids = _string_column(trailer_ids) if trailer_ids is not None else [None] * n
+        self._movies: List[Optional[Movie]] = [None] * n
+        self._buffers: Dict[str, np.ndarray] = {}  # numeric column -> backing array with spare capacity
+        self._added_rows: Dict[int, int] = {}  # id -> row of movies added by upsert
+
+        if id_index is not None:
+            # Trusted (sorted IDs, their rows) from a saved catalogue
+            self._sorted_ids, self._sorted_rows = id_index
+            return
+        if n and self.ids.min() < 0:
+            raise ValueError("Movie IDs must be non-negative")
+        self._sorted_rows = np.argsort(self.ids, kind='stable')
+        self._sorted_ids = self.ids[self._sorted_rows]
+        if n and (np.diff(self._sorted_ids) == 0).any():
+            raise ValueError("Movie IDs must be unique")
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "MovieCatalog":
+        """Build a catalogue from a DataFrame with the movies.csv columns."""
+        def optional(column: str) -> Optional[List[Optional[str]]]:
+            if column not in df:
+                return None
+            return [None if pd.isna(value) else str(value) for value in df[column]]
+
+        return cls(
+            ids=df['id'].to_numpy(),
+            titles=df['title'].astype(str).tolist(),
+            genres=df['genre'].astype(str).tolist(),
+            years=df['year'].to_numpy(),
+            directors=df['director'].astype(str).tolist(),
+            descriptions=df['description'].astype(str).tolist(),
+            ratings=df['rating'].to_numpy(),
+            poster_urls=optional('poster_url'),
+            trailer_ids=optional('trailer_id')
+        )
+
+    @classmethod
+    def from_csv(cls, path: Path, chunk_size: int = 50_000) -> "MovieCatalog":
+        """
+        Stream a movies.csv-style file into a catalogue, `chunk_size` rows at a time.
+        
+        Each chunk is parsed with fixed dtypes, validated with vectorised
+        checks and appended to the numeric columns and UTF-8 string blobs, so
+        at most one chunk is ever held as a DataFrame and no per-row objects
+        are built.
+        
+        Raises:
+            ValueError: A required column is absent, or rows have a missing
+                id/title/year/rating, a non-integer or out-of-range id/year
+                (ids 0 to MAX_MOVIE_ID, years within int32) or a non-finite rating
+        """
+        columns = pd.read_csv(path, nrows=0).columns
+        absent = [column for column in REQUIRED_CSV_COLUMNS if column not in columns]
+        if absent:
+            raise ValueError(f"{path} is missing columns: {', '.join(absent)}")
+        usecols = [column for column in CSV_DTYPES if column in columns]
+        
+        numeric: Dict[str, List[np.ndarray]] = {'id': [], 'year': [], 'rating': []}
+        text = {column: StringColumnBuilder() for column in usecols if column in CSV_TEXT_COLUMNS}
+        invalid: List[np.ndarray] = []
+        start = 0
+        chunks = pd.read_csv(
+            path,
+            usecols=usecols,
+            dtype={column: CSV_DTYPES[column] for column in usecols},
+            chunksize=chunk_size
+        )
+        for chunk in chunks:
+            rows = _invalid_rows(chunk)
+            if len(rows) or invalid:
+                # Keep scanning to report every bad row, but stop building
+                invalid.append(start + rows)
+                start += len(chunk)
+                continue
+            numeric['id'].append(chunk['id'].to_numpy(dtype=np.int64))
+            numeric['year'].append(chunk['year'].to_numpy(dtype=np.int32))
+            numeric['rating'].append(chunk['rating'].to_numpy(dtype=np.float64))
+            for column, builder in text.items():
+                values = chunk[column]
+                # Free-text fields may be blank; only the optional URL columns stay missing
+                builder.append(values if column in ('poster_url', 'trailer_id') else values.fillna(''))
+            start += len(chunk)
+        
+        invalid = np.concatenate(invalid) if invalid else np.empty(0, dtype=np.int64)
+        if len(invalid):
+            # +2: one for the header, one for 1-based numbering
+            lines = (invalid + 2).tolist()
+            shown = ', '.join(map(str, lines[:10])) + (' ...' if len(lines) > 10 else '')
+            raise ValueError(f"{path}: {len(lines)} invalid rows: missing id, title, year or rating, or a non-integer or out-of-range id/year (lines {shown})")
+        
+        def concat(arrays: List[np.ndarray], dtype) -> np.ndarray:
+            return np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+        
+        strings = {
+            CSV_TEXT_COLUMNS[column]: builder.build(intern=column in ('genre', 'director'))
+            for column, builder in text.items()
+        }
+        return cls(
+            ids=concat(numeric['id'], np.int64),
+            years=concat(numeric['year'], np.int32),
+            ratings=concat(numeric['rating'], np.float64),
+            **strings
+        )
+    
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "MovieCatalog":
+        """Catalogue over saved (typically memory-mapped) arrays; see to_arrays."""
+        columns = {
+            name: StringColumn.from_arrays(arrays, f"catalog.{name}", intern=name in ('genres', 'directors'))
+            for name in STRING_COLUMNS
+        }
+        return cls(
+            ids=arrays["catalog.ids"],
+            years=arrays["catalog.years"],
+            ratings=arrays["catalog.ratings"],
+            id_index=(arrays["catalog.sorted_ids"], arrays["catalog.sorted_rows"]),
+            **columns
+        )
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Every column as flat arrays, suitable for ModelArtifacts."""
+        sorted_ids, sorted_rows = self._sorted_ids, self._sorted_rows
+        if self._added_rows:
+            sorted_rows = np.argsort(self.ids, kind='stable')
+            sorted_ids = self.ids[sorted_rows]
+        arrays = {
+            "catalog.ids": self.ids,
+            "catalog.years": self.years,
+            "catalog.ratings": self.ratings,
+            "catalog.sorted_ids": sorted_ids,
+            "catalog.sorted_rows": sorted_rows,
+        }
+        for name in STRING_COLUMNS:
+            arrays.update(strings_to_arrays(f"catalog.{name}", getattr(self, name)))
+        return arrays
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def upsert(self, movie: Movie) -> Tuple[int, bool]:
+        """
+        Replace the movie with this ID, or append it as a new last row.
+
+        Returns:
+            (row, whether it was added)
+        """
+        if movie.id < 0:
+            raise ValueError("Movie IDs must be non-negative")
+        row = self.row_of(movie.id)
+        added = row is None
+        if added:
+            row = len(self)
+            self._added_rows[movie.id] = row
+            for name, value in (('ids', movie.id), ('years', movie.year), ('ratings', movie.rating)):
+                self._writable(name, row + 1)[row] = value
+            self._movies.append(None)
+        else:
+            self._writable('years', len(self))[row] = movie.year
+            self._writable('ratings', len(self))[row] = movie.rating
+            self._movies[row] = None
+
+        values = {
+            'titles': movie.title,
+            'genres': sys.intern(movie.genre),
+            'directors': sys.intern(movie.director),
+            'descriptions': movie.description,
+            'poster_urls': movie.poster_url,
+            'trailer_ids': movie.trailer_id,
+        }
+        for name, value in values.items():
+            column = getattr(self, name)
+            if isinstance(column, StringColumn):
+                # Blob columns are immutable (and may be shared maps): edit beside them
+                column = EditableStringColumn(column)
+                setattr(self, name, column)
+            if added:
+                column.append(value)
+            else:
+                column[row] = value
+        return row, added
+
+    def _writable(self, name: str, length: int) -> np.ndarray:
+        """
+        Numeric column `name` resized to `length` rows, as a writeable view
+        of a buffer that doubles when full (saved columns may be read-only maps).
+        """
+        column = getattr(self, name)
+        buffer = self._buffers.get(name)
+        if buffer is None or length > len(buffer):
+            grown = np.empty(max(16, length, 2 * len(column)), dtype=column.dtype)
+            grown[:len(column)] = column
+            self._buffers[name] = buffer = grown
+        column = buffer[:length]
+        setattr(self, name, column)
+        return column
+
+    def row_of(self, movie_id: int) -> Optional[int]:
+        """Row of a movie ID, or None if it is not in the catalogue."""
+        row = self._added_rows.get(movie_id)
+        if row is not None:
+            return row
+        i = int(np.searchsorted(self._sorted_ids, movie_id))
+        if i < len(self._sorted_ids) and self._sorted_ids[i] == movie_id:
+            return int(self._sorted_rows[i])
+        return None
+
+    def rows_for(self, movie_ids: Iterable[int]) -> np.ndarray:
+        """Rows of the given movie IDs, skipping IDs not in the catalogue."""
+        rows = self.lookup_rows(movie_ids)
+        return rows[rows >= 0]
+
+    def lookup_rows(self, movie_ids: Iterable[int]) -> np.ndarray:
+        """Row of each movie ID, aligned with the input; -1 where it is not in the catalogue."""
+        ids = np.fromiter(movie_ids, dtype=np.int64)
+        rows = np.full(len(ids), -1, dtype=np.int64)
+        if len(self._sorted_ids):
+            positions = np.minimum(np.searchsorted(self._sorted_ids, ids), len(self._sorted_ids) - 1)
+            known = self._sorted_ids[positions] == ids
+            rows[known] = self._sorted_rows[positions[known]]
+        if self._added_rows:
+            for i in np.flatnonzero(rows < 0).tolist():
+                rows[i] = self._added_rows.get(int(ids[i]), -1)
+        return rows
+
+    def indicator(self, movie_id_lists: List[List[int]]) -> sp.csr_matrix:
+        """len(lists) x catalogue 0/1 matrix marking each list's movies."""
+        rows = [np.unique(self.rows_for(movie_ids)) for movie_ids in movie_id_lists]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(r) for r in rows])
+        indices = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        return sp.csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(rows), len(self)))
+
+    def movie(self, row: int) -> Movie:
+        """Movie at a row, materialised on first access."""
+        movie = self._movies[row]
+        if movie is None:
+            movie = Movie(
+                id=int(self.ids[row]),
+                title=self.titles[row],
+                genre=self.genres[row],
+                year=int(self.years[row]),
+                director=self.directors[row],
+                description=self.descriptions[row],
+                rating=float(self.ratings[row]),
+                poster_url=self.poster_urls[row],
+                trailer_id=self.trailer_ids[row]
+            )
+            self._movies[row] = movie
+        return movie
+
+    def get(self, movie_id: int) -> Optional[Movie]:
+        """Movie with the given ID, or None."""
+        row = self.row_of(movie_id)
+        return None if row is None else self.movie(row)
+
+    def movies(self) -> List[Movie]:
+        """Every movie in catalogue order."""
+        return [self.movie(row) for row in range(len(self))]
+
+    def feature_text(self, include_title: bool = False, rows: Optional[Iterable[int]] = None) -> List[str]:
+        """Per-movie text for TF-IDF: [title] genre director description (of `rows`, default every movie)."""
+        columns = [self.genres, self.directors, self.descriptions]
+        if include_title:
+            columns.insert(0, self.titles)
+        if rows is not None:
+            return [' '.join(column[row] for column in columns) for row in rows]
+        return [' '.join(values) for values in zip(*columns)]
+
+
+# Inclusive bounds on the integer columns; years are stored as int32
+INTEGER_BOUNDS = {
+    'id': (0, MAX_MOVIE_ID),
+    'year': (np.iinfo(np.int32).min, np.iinfo(np.int32).max)
+}
+
+
+def _invalid_rows(chunk: pd.DataFrame) -> np.ndarray:
+    """
+    Positions within the chunk of rows missing a required value, with a
+    fractional or out-of-range id/year, or a non-finite rating.
+    """
+    # to_numpy() may return read-only views (pandas copy-on-write), so
+    # every step builds a new mask rather than updating one in place
+    invalid = chunk['title'].isna().to_numpy()
+    for column in ('id', 'year', 'rating'):
+        values = chunk[column].to_numpy()
+        finite = np.isfinite(values)
+        invalid = invalid | ~finite
+        if column in INTEGER_BOUNDS:
+            low, high = INTEGER_BOUNDS[column]
+            invalid = invalid | (finite & ((values != np.round(values)) | (values < low) | (values > high)))
+    return np.flatnonzero(invalid)
+
+
+def _string_column(values: Sequence[Optional[str]], intern: bool = False) -> Sequence[Optional[str]]:
+    """Keep blob-backed columns as they are; copy anything else into a list."""
+    if isinstance(values, StringColumn):
+        values.intern = intern
+        return values
+    if intern:
+        return [None if value is None else sys.intern(value) for value in values]
+    return list(values)
@@ -0,0 +1,209 @@
+import base64
+import binascii
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from .catalog import MovieCatalog
+
+# Movie field -> MovieCatalog column, in Movie field order
+MOVIE_FIELDS: Dict[str, str] = {
+    'id': 'ids',
+    'title': 'titles',
+    'genre': 'genres',
+    'year': 'years',
+    'director': 'directors',
+    'description': 'descriptions',
+    'rating': 'ratings',
+    'poster_url': 'poster_urls',
+    'trailer_id': 'trailer_ids',
+}
+NUMERIC_COLUMNS = ('ids', 'years', 'ratings')
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class CatalogPage(NamedTuple):
+    body: bytes  # JSON array of (projected) movies
+    etag: str  # Strong validator derived from the body
+    next_cursor: Optional[str]  # None on the last page
+    count: int
+
+
+class CatalogPages:
+    """
+    Pre-encoded JSON pages of the catalogue for GET /api/items.
+
+    A page is a run of catalogue rows matching a genre/year filter, starting
+    at a cursor, projected onto some Movie fields. Pages are encoded once,
+    straight from the catalogue columns (no Movie objects, no pydantic), and
+    kept in an LRU keyed by catalogue version and query, so repeated reads
+    are a dictionary lookup. The ETag is a hash of the body: identical pages
+    get the same tag in every worker and across restarts.
+
+    Cursors are opaque to clients; each names the catalogue row to resume
+    from, which stays valid while rows are only ever appended.
+    """
+
+    def __init__(self, max_pages: int = 1024, max_filters: int = 64):
+        self.max_pages = max_pages
+        self.max_filters = max_filters
+        self._version = None
+        self._pages: "OrderedDict[tuple, CatalogPage]" = OrderedDict()
+        self._matches: "OrderedDict[tuple, np.ndarray]" = OrderedDict()  # filter -> matching rows
+        self._genre_codes: Optional[np.ndarray] = None  # row -> lower-cased genre code
+        self._codes_of_genre: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def page(
+        self,
+        catalog: MovieCatalog,
+        version: int,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        fields: Optional[Sequence[str]] = None,
+        genres: Sequence[str] = (),
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None
+    ) -> CatalogPage:
+        """
+        One page of the catalogue at `version`.
+
+        Args:
+            cursor: next_cursor of the previous page (None for the first)
+            limit: Movies per page, 1..MAX_PAGE_SIZE
+            fields: Movie fields to include (None for all), in Movie order
+            genres: Keep movies of any of these genres (case-insensitive)
+            year_from, year_to: Inclusive release year bounds
+
+        Raises:
+            ValueError: Unknown field, bad limit or malformed cursor
+        """
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        if fields:
+            unknown = sorted(set(fields) - MOVIE_FIELDS.keys())
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+            fields = tuple(name for name in MOVIE_FIELDS if name in fields)
+        else:
+            fields = tuple(MOVIE_FIELDS)
+        start = _decode_cursor(cursor)
+        genres = tuple(sorted({genre.strip().lower() for genre in genres if genre.strip()}))
+        key = (version, start, limit, fields, genres, year_from, year_to)
+
+        with self._lock:
+            if version != self._version:
+                # Every cached page and filter belongs to the old catalogue
+                self._pages.clear()
+                self._matches.clear()
+                self._genre_codes = None
+                self._version = version
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                self.hits += 1
+                return page
+            self.misses += 1
+            rows = self._matching_rows(catalog, genres, year_from, year_to)
+
+        # Encode outside the lock; two threads racing on one page store the same bytes
+        first = int(np.searchsorted(rows, start))
+        selected = rows[first:first + limit]
+        more = first + limit < len(rows)
+        body = _encode(catalog, selected, fields)
+        page = CatalogPage(
+            body=body,
+            etag='"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"',
+            next_cursor=_encode_cursor(int(selected[-1]) + 1) if more else None,
+            count=len(selected)
+        )
+        with self._lock:
+            if self._version == version:
+                self._pages[key] = page
+                while len(self._pages) > self.max_pages:
+                    self._pages.popitem(last=False)
+        return page
+
+    def stats(self) -> Dict[str, Any]:
+        """Page cache counters and size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "pages": len(self._pages),
+                "max_pages": self.max_pages,
+                "filters": len(self._matches),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def _matching_rows(
+        self,
+        catalog: MovieCatalog,
+        genres: Tuple[str, ...],
+        year_from: Optional[int],
+        year_to: Optional[int]
+    ) -> np.ndarray:
+        """Ascending catalogue rows passing the filter; caller holds the lock."""
+        key = (genres, year_from, year_to)
+        rows = self._matches.get(key)
+        if rows is not None:
+            self._matches.move_to_end(key)
+            return rows
+
+        mask = np.ones(len(catalog), dtype=bool)
+        if genres:
+            if self._genre_codes is None:
+                codes, uniques = pd.factorize(pd.Series(list(catalog.genres), dtype=object).str.lower())
+                self._genre_codes = codes
+                self._codes_of_genre = {genre: code for code, genre in enumerate(uniques)}
+            wanted = [self._codes_of_genre[genre] for genre in genres if genre in self._codes_of_genre]
+            mask &= np.isin(self._genre_codes, wanted)
+        if year_from is not None:
+            mask &= catalog.years >= year_from
+        if year_to is not None:
+            mask &= catalog.years <= year_to
+        rows = np.flatnonzero(mask)
+
+        self._matches[key] = rows
+        while len(self._matches) > self.max_filters:
+            self._matches.popitem(last=False)
+        return rows
+
+
+def _encode(catalog: MovieCatalog, rows: np.ndarray, fields: Tuple[str, ...]) -> bytes:
+    """JSON array of the movies at `rows`, encoded as Starlette's JSONResponse would."""
+    columns: List[list] = []
+    for name in fields:
+        attribute = MOVIE_FIELDS[name]
+        column = getattr(catalog, attribute)
+        if attribute in NUMERIC_COLUMNS:
+            columns.append(column[rows].tolist())
+        else:
+            columns.append([column[row] for row in rows.tolist()])
+    movies = [dict(zip(fields, values)) for values in zip(*columns)]
+    return json.dumps(movies, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def _encode_cursor(row: int) -> str:
+    return base64.urlsafe_b64encode(f"r{row}".encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: Optional[str]) -> int:
+    """Catalogue row a cursor resumes from (0 without one)."""
+    if not cursor:
+        return 0
+    try:
+        text = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        if text[:1] == 'r' and text[1:].isdigit():
+            return int(text[1:])
+    except (binascii.Error, UnicodeDecodeError):
+        pass
+    raise ValueError("Invalid cursor")
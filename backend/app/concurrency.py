@@ -0,0 +1,159 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+
+class ExecutorError(Exception):
+    """Base for requests the executor layer refused or gave up on."""
+
+
+class Overloaded(ExecutorError):
+    """Every worker is busy and the queue is full; the request was shed."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} executor is saturated, retry later")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(ExecutorError):
+    """The request did not finish (or start) within its deadline."""
+
+
+class BoundedExecutor:
+    """
+    Runs blocking calls off the event loop on a thread pool with a bounded queue.
+
+    At most `max_workers` calls run and `max_queue` wait; beyond that `run`
+    raises Overloaded immediately instead of letting latency grow without
+    bound. Each call has a deadline: the caller stops waiting when it
+    passes, and a call still queued at its deadline is skipped rather than
+    run for nobody. Threads suit the NumPy/SciPy scoring here, which spends
+    most of its time in GIL-releasing kernels; process-level parallelism is
+    provided by the workers of app.serving.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, timeout: float):
+        """
+        Args:
+            name: Label for thread names, errors and stats
+            max_workers: Threads running calls concurrently
+            max_queue: Calls allowed to wait for a thread
+            timeout: Default deadline in seconds
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self.completed = 0
+        self.shed = 0
+        self.expired = 0
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Await fn(*args, **kwargs) on the pool, within `timeout` seconds (default: self.timeout)."""
+        with self._lock:
+            self._check()
+            self._in_flight += 1
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        # Carry context variables (e.g. the request's profile) into the thread
+        context = contextvars.copy_context()
+        future = self._pool.submit(context.run, self._call, deadline, fn, args, kwargs)
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self.expired += 1
+            raise DeadlineExceeded(f"{self.name} call exceeded its {timeout:g}s deadline")
+
+    def check(self):
+        """Raise Overloaded if a call submitted now would be shed."""
+        with self._lock:
+            self._check()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._in_flight - self._running,
+                "completed": self.completed,
+                "shed": self.shed,
+                "expired": self.expired
+            }
+
+    def _check(self):
+        if self._in_flight >= self.max_workers + self.max_queue:
+            self.shed += 1
+            raise Overloaded(self.name, retry_after=max(self.timeout, 1.0))
+
+    def _call(self, deadline: float, fn: Callable[..., Any], args, kwargs) -> Any:
+        if time.monotonic() > deadline:
+            raise DeadlineExceeded(f"{self.name} call expired in the queue")
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if not future.cancelled() and future.exception() is None:
+                self.completed += 1
+
+
+class ReadWriteLock:
+    """
+    Many concurrent readers or one writer.
+
+    A waiting writer blocks new readers, so a steady stream of reads cannot
+    starve writes. Not reentrant: don't take `read` while holding either side.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
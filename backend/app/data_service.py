@@ -1,77 +1,553 @@
-import pandas as pd
-from typing import List, Dict
+import json
+import logging
+import os
+import threading
+import numpy as np
+from typing import Any, Iterable, Iterator, List, Dict, Optional, Tuple, Union
 from pathlib import Path
 from .models import Movie, UserPreference, RecommendationMode
+from .artifacts import ModelArtifacts, content_hash
+from .cache import RecommendationCache
+from .catalog import MovieCatalog
+from .catalog_pages import DEFAULT_PAGE_SIZE, CatalogPage, CatalogPages
+from .concurrency import ReadWriteLock
+from .metrics import RECOMMENDATIONS, recording, span
+from .preference_store import PreferenceStore, StoreUnavailable, make_preference_store
 from .ml.content_based import ContentBasedRecommender
 from .ml.collaborative import CollaborativeRecommender
+from .ml.cooccurrence import ItemCooccurrenceRecommender
+from .ml.factorization import FactorizationRecommender
 from .ml.hybrid import HybridRecommender
+from .ml.interactions import InteractionMatrix
+from .ml.neighbors import make_neighbor_index
+from .ml.popularity import PopularityRanking
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent.parent / "data"
 
 
 class DataService:
-    def __init__(self):
-        self.movies: List[Movie] = []
-        self.user_preferences: Dict[str, Dict[int, bool]] = {}  # user_id -> {movie_id: liked}
+    def __init__(
+        self,
+        cache_size: int = 10000,
+        cache_ttl: float = 300.0,
+        neighbor_cache_ttl: float = 5.0,
+        csv_path: Path = DATA_DIR / "movies.csv",
+        artifact_dir: Optional[Path] = DATA_DIR / "artifacts",
+        preference_store: Union[str, PreferenceStore] = "log",
+        preference_dir: Path = DATA_DIR / "preferences",
+        durable_writes: bool = True,
+        neighbor_index: str = "lsh",
+        retrain_interval: float = 300.0,
+        first_training_preferences: int = 50,
+        similarity_refresh_interval: float = 30.0,
+        catalog_log: Optional[Path] = DATA_DIR / "catalog_updates.jsonl",
+        catalog_refit_interval: float = 600.0
+    ):
+        """
+        Args:
+            cache_size: Maximum cached recommendation lists
+            cache_ttl: Seconds a content-based result may be served from cache
+            neighbor_cache_ttl: Staleness bound for collaborative, hybrid and
+                matrix factorisation results, which also change when other
+                users' preferences do, and for cached neighbour lists
+            csv_path: Movie catalogue CSV
+            artifact_dir: Where fitted models are saved and memory-mapped from
+                (None always fits in memory)
+            preference_store: Store kind ("log", "sqlite", "memory") or a store instance
+            preference_dir: Directory for the named preference store's files
+            durable_writes: Return from add_user_preference only once the
+                preference is committed to the store
+            neighbor_index: Similar-user search shared by the collaborative
+                and hybrid recommenders ("lsh" or "exact")
+            retrain_interval: Seconds between background retrains of the
+                matrix factorisation model when preferences have changed
+                (0 disables them; changes are still folded in)
+            first_training_preferences: Stored preferences at which a matrix
+                factorisation model that was never trained is trained at once
+                rather than at the next retrain (only when retraining is
+                enabled); until then that mode recommends popular movies
+            similarity_refresh_interval: Seconds between background refreshes
+                of the item-item similar-items table when co-occurrence
+                counts have changed (0 disables them)
+            catalog_log: JSON Lines record of movies added or changed through
+                upsert_movie, replayed over the CSV on startup (None keeps
+                them in memory only)
+            catalog_refit_interval: Seconds between background refits of the
+                TF-IDF models when the catalogue has changed (0 disables
+                them; upserted movies are still indexed in the fitted space)
+        """
+        self.csv_path = Path(csv_path)
+        self.artifact_dir = artifact_dir
+        if isinstance(preference_store, str):
+            preference_store = make_preference_store(preference_store, preference_dir)
+        self.preference_store = preference_store
+        self.durable_writes = durable_writes
+        self.catalog_log = Path(catalog_log) if catalog_log is not None else None
+        self.retrain_interval = retrain_interval
+        self.first_training_preferences = first_training_preferences
+        # Scoring runs on several threads at once; preference writes are exclusive
+        self._lock = ReadWriteLock()
+        # Model builds off the lock (retrains, refreshes) run one at a time
+        self._training_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._first_training: Optional[threading.Thread] = None
+        self._replay_training: Optional[threading.Thread] = None
+        self.catalog: MovieCatalog = None
+        # Bumped whenever the catalogue changes; keys the encoded /items pages
+        self.catalog_version = 0
+        self._refit_version = 0  # catalog_version the TF-IDF models were last fitted at
+        self.catalog_pages = CatalogPages()
+        self.popularity: PopularityRanking = None
+        # The one copy of every like/dislike; recommenders only read it
+        self.interactions = InteractionMatrix()
+        self.neighbors = make_neighbor_index(self.interactions, neighbor_index)
+        self.preference_versions: Dict[str, int] = {}  # user_id -> number of preference changes
+        # Bumped whenever retrained item factors or a refreshed similar-items table is installed
+        self.trained_version = 0
+        self.recommendation_cache = RecommendationCache(cache_size)
+        self.cache_ttl = cache_ttl
+        self.neighbor_cache_ttl = neighbor_cache_ttl
         self.content_recommender = ContentBasedRecommender()
-        self.collaborative_recommender = CollaborativeRecommender()
-        self.hybrid_recommender = HybridRecommender()
+        self.collaborative_recommender = CollaborativeRecommender(
+            neighbor_index=self.neighbors, interactions=self.interactions
+        )
+        self.hybrid_recommender = HybridRecommender(
+            neighbor_index=self.neighbors, interactions=self.interactions, similarity_max_age=neighbor_cache_ttl
+        )
+        self.factorization_recommender = FactorizationRecommender(interactions=self.interactions)
+        self.item_recommender = ItemCooccurrenceRecommender(interactions=self.interactions)
         self.current_mode = RecommendationMode.CONTENT_BASED
+        self._load_models()
+        self._replay_catalog_log()
+        self._replay_preferences()
+        self._start_periodic("factorization-retrain", retrain_interval, self._retrain_if_changed)
+        self._start_periodic("item-similarity-refresh", similarity_refresh_interval, self._refresh_if_changed)
+        self._start_periodic("catalog-refit", catalog_refit_interval, self._refit_if_changed)
+    
+    def _load_models(self):
+        """
+        Memory-map fitted models saved for this exact CSV and model
+        configuration, or fit them and save them for the next start.
+        """
+        if self.artifact_dir is None:
+            self._load_movies()
+            self._initialize_recommenders()
+            return
+        
+        artifacts = ModelArtifacts(self.artifact_dir, content_hash(self.csv_path, self._model_params()))
+        if artifacts.exists():
+            arrays, _ = artifacts.load()
+            self._load_model_arrays(arrays)
+            return
+        
         self._load_movies()
         self._initialize_recommenders()
+        try:
+            artifacts.save(self.model_arrays(), {"csv_path": str(self.csv_path)})
+        except OSError as e:
+            # Serving does not depend on the artifacts; the next start refits
+            logger.warning("Could not save model artifacts to %s: %s", self.artifact_dir, e)
+    
+    def model_arrays(self) -> Dict[str, np.ndarray]:
+        """Catalogue and fitted models as flat arrays (see _load_model_arrays)."""
+        return {
+            **self.catalog.to_arrays(),
+            **self.content_recommender.state_arrays(),
+            **self.hybrid_recommender.state_arrays()
+        }
+    
+    def _load_model_arrays(self, arrays: Dict[str, np.ndarray]):
+        """Catalogue and fitted models from model_arrays output, without copying."""
+        self.catalog = MovieCatalog.from_arrays(arrays)
+        self.popularity = PopularityRanking(self.catalog)
+        self.content_recommender.load_state(self.catalog, self.popularity, arrays)
+        self.collaborative_recommender.fit(self.catalog, self.popularity)
+        self.hybrid_recommender.load_state(self.catalog, self.popularity, arrays)
+        self.factorization_recommender.fit(self.catalog, self.popularity)
+        self.item_recommender.fit(self.catalog, self.popularity)
+    
+    def preference_arrays(self) -> Dict[str, np.ndarray]:
+        """Interaction matrix, popularity ranking, per-user versions and trained state as flat arrays."""
+        with self._lock.read():
+            versions = [self.preference_versions.get(user_id, 0) for user_id in self.interactions.user_ids]
+            return {
+                **self.interactions.state_arrays(),
+                **self.popularity.state_arrays(),
+                **self._trained_arrays(),
+                "preference_versions": np.asarray(versions, dtype=np.int64)
+            }
+    
+    def trained_arrays(self) -> Dict[str, np.ndarray]:
+        """Item factors and the similar-items table (what trained_version counts) as flat arrays."""
+        with self._lock.read():
+            return self._trained_arrays()
+    
+    def _trained_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            **self.factorization_recommender.state_arrays(),
+            **self.item_recommender.state_arrays()
+        }
+    
+    def _model_params(self) -> Dict[str, Any]:
+        """Everything besides the CSV that changes the saved arrays."""
+        return {
+            "content": {"n_neighbors": self.content_recommender.n_neighbors, **self.content_recommender.tfidf_params},
+            "hybrid": self.hybrid_recommender.tfidf_params
+        }
     
     def _load_movies(self):
         """Load movies from CSV file."""
-        csv_path = Path(__file__).parent.parent / "data" / "movies.csv"
-        df = pd.read_csv(csv_path)
-        
-        self.movies = []
-        for _, row in df.iterrows():
-            movie = Movie(
-                id=int(row['id']),
-                title=row['title'],
-                genre=row['genre'],
-                year=int(row['year']),
-                director=row['director'],
-                description=row['description'],
-                rating=float(row['rating']),
-                poster_url=row.get('poster_url', None),
-                trailer_id=row.get('trailer_id', None)
-            )
-            self.movies.append(movie)
+        # One columnar catalogue shared by every recommender, streamed in chunks
+        self.catalog = MovieCatalog.from_csv(self.csv_path)
+        self.popularity = PopularityRanking(self.catalog)
     
     def _initialize_recommenders(self):
         """Initialize all recommender systems."""
-        self.content_recommender.fit(self.movies)
-        self.collaborative_recommender.fit(self.movies)
-        self.hybrid_recommender.fit(self.movies)
+        self.content_recommender.fit(self.catalog, self.popularity)
+        self.collaborative_recommender.fit(self.catalog, self.popularity)
+        self.hybrid_recommender.fit(self.catalog, self.popularity)
+        self.factorization_recommender.fit(self.catalog, self.popularity)
+        self.item_recommender.fit(self.catalog, self.popularity)
+    
+    def _replay_catalog_log(self):
+        """Apply the movies upserted in earlier runs on top of the CSV catalogue."""
+        if self.catalog_log is None or not self.catalog_log.exists():
+            return
+        with open(self.catalog_log, encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    movie = Movie(**json.loads(line))
+                except (ValueError, TypeError) as e:
+                    # A torn last line from a crash mid-write, or a hand edit
+                    logger.warning("Skipping line %d of %s: %s", number, self.catalog_log, e)
+                    continue
+                self._apply_movie(movie)
+    
+    def _replay_preferences(self):
+        """Rebuild every in-memory preference structure from the store in bulk."""
+        # Later records win; dict order keeps users in first-seen order
+        latest: Dict[Tuple[str, int], bool] = {}
+        for user_id, movie_id, liked in self.preference_store.replay():
+            latest[(user_id, movie_id)] = liked
+        if not latest:
+            return
+        
+        user_ids = [user_id for user_id, _ in latest]
+        movie_ids = [movie_id for _, movie_id in latest]
+        signals = np.fromiter((1 if liked else -1 for liked in latest.values()), dtype=np.int8, count=len(latest))
+        del latest
+        
+        self.interactions.load(user_ids, movie_ids, signals)
+        self.neighbors.rebuild()
+        self.popularity.load(movie_ids, signals)
+        self.hybrid_recommender.rebuild_profiles()
+        self.item_recommender.reset()
+        # ALS and the pair counts cost O(interactions) and more: build them
+        # in the background so serving starts now, with the popularity
+        # fallback for those two modes until they are installed
+        self._replay_training = self._start_background("replay-training", self._train_replayed_models)
+    
+    def _train_replayed_models(self):
+        self.retrain_factorization()
+        self.refresh_item_similarities()
+    
+    def retrain_factorization(self):
+        """
+        Retrain the matrix factorisation model without blocking requests.
+        
+        Only taking the snapshot and installing the new factors hold the
+        lock; the training in between runs alongside reads and writes. If
+        the catalogue changes meanwhile the factors are dropped (an added
+        movie may have swapped interaction columns, see _apply_movie) and
+        the next round retrains again.
+        """
+        with self._training_lock:
+            with self._lock.read():
+                version = self.catalog_version
+                snapshot = self.factorization_recommender.snapshot()
+            factors = self.factorization_recommender.train(*snapshot)
+            with self._lock.write():
+                if self.catalog_version != version:
+                    return
+                self.factorization_recommender.install(factors)
+                self.trained_version += 1
+    
+    def refresh_item_similarities(self):
+        """
+        Merge pending co-occurrence changes and recompute the similar-items
+        table off the lock, or recount every pair after a reset. Like a
+        retrain, the result is dropped if the catalogue changes meanwhile;
+        the changes it merged stay pending for the next round.
+        """
+        with self._training_lock:
+            with self._lock.read():
+                version = self.catalog_version
+                if self.item_recommender.counted:
+                    snapshot, refresh = self.item_recommender.snapshot(), self.item_recommender.refresh
+                else:
+                    snapshot, refresh = self.item_recommender.recount_snapshot(), self.item_recommender.recount
+            refreshed = refresh(*snapshot)
+            with self._lock.write():
+                if self.catalog_version != version:
+                    return
+                self.item_recommender.install(refreshed)
+                self.trained_version += 1
+    
+    def refit_content_models(self):
+        """
+        Refit both TF-IDF models on the current catalogue without blocking requests.
+        
+        Upserted movies are indexed against the vocabulary and IDF weights
+        of the last fit; this learns their new terms and document
+        frequencies and rebuilds the neighbour table. Only snapshotting the
+        feature text and installing the models hold the lock. If the
+        catalogue changes meanwhile the result is dropped and the next round
+        refits again. The refitted catalogue then replaces the saved
+        artifacts and the catalogue log is cut back to later upserts.
+        """
+        with self._lock.read():
+            version = self.catalog_version
+            content_text = self.catalog.feature_text()
+            hybrid_text = self.catalog.feature_text(include_title=True)
+        content_model = self.content_recommender.train(content_text)
+        hybrid_model = self.hybrid_recommender.train(hybrid_text)
+        with self._lock.write():
+            if self.catalog_version != version:
+                return
+            self.content_recommender.install(content_model)
+            self.hybrid_recommender.install(hybrid_model)
+            self.hybrid_recommender.rebuild_profiles()
+            self.recommendation_cache.clear()
+            self._refit_version = version
+        self._compact_catalog_log()
+    
+    def _compact_catalog_log(self):
+        """
+        Save the catalogue and models as this CSV's artifacts and drop the
+        catalogue log lines they include, so the next start maps them
+        instead of replaying every upsert since the CSV.
+        
+        Without an artifact directory the log is the only record of the
+        upserts and is kept.
+        """
+        if self.artifact_dir is None or self.catalog_log is None:
+            return
+        with self._lock.read():
+            if self.catalog_version != self._refit_version:
+                return  # Upserted since the refit; the next refit compacts
+            # Copies: upserts patch the catalogue and neighbour rows in place
+            arrays = {name: np.array(array) for name, array in self.model_arrays().items()}
+            logged = self.catalog_log.stat().st_size if self.catalog_log.exists() else 0
+        if not logged:
+            return
+        artifacts = ModelArtifacts(self.artifact_dir, content_hash(self.csv_path, self._model_params()))
+        try:
+            artifacts.save(arrays, {"csv_path": str(self.csv_path)}, replace=True)
+        except OSError as e:
+            logger.warning("Could not save model artifacts to %s: %s", self.artifact_dir, e)
+            return
+        with self._lock.write():
+            # Upserts appended after the snapshot are not in the artifacts
+            with open(self.catalog_log, 'rb') as f:
+                f.seek(logged)
+                later = f.read()
+            staging = self.catalog_log.with_name(self.catalog_log.name + ".tmp")
+            with open(staging, 'wb') as f:
+                f.write(later)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(staging, self.catalog_log)
+    
+    def _retrain_if_changed(self):
+        recommender = self.factorization_recommender
+        # An untrained model with preferences: the replay training failed
+        if recommender.changes_since_training or (not recommender.trained and self.interactions.nnz):
+            self.retrain_factorization()
+    
+    def _refresh_if_changed(self):
+        if self.item_recommender.pending_changes or not self.item_recommender.counted:
+            self.refresh_item_similarities()
+    
+    def _refit_if_changed(self):
+        if self.catalog_version != self._refit_version:
+            self.refit_content_models()
+    
+    def _start_periodic(self, name: str, interval: float, task):
+        """Run `task` every `interval` seconds on a daemon thread until close (0 disables it)."""
+        if interval <= 0:
+            return
+        
+        def run():
+            while not self._closed.wait(interval):
+                self._run_task(name, task)
+        
+        threading.Thread(target=run, name=name, daemon=True).start()
+    
+    def _start_background(self, name: str, task) -> threading.Thread:
+        """Run `task` once on a daemon thread."""
+        thread = threading.Thread(target=self._run_task, args=(name, task), name=name, daemon=True)
+        thread.start()
+        return thread
+    
+    def _run_task(self, name: str, task):
+        try:
+            task()
+        except Exception:
+            # Keep serving from the current model; the next round retries
+            logger.exception("Background task %s failed", name)
+    
+    def close(self):
+        """Commit outstanding preference writes and release the store."""
+        self._closed.set()
+        self.preference_store.close()
     
     def get_all_movies(self) -> List[Movie]:
         """Get all available movies."""
-        return self.movies
+        with self._lock.read():
+            return self.catalog.movies()
+    
+    def get_movie_page(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        fields: Optional[List[str]] = None,
+        genres: List[str] = (),
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None
+    ) -> CatalogPage:
+        """One pre-encoded JSON page of the catalogue; see CatalogPages.page."""
+        with self._lock.read():
+            return self.catalog_pages.page(
+                self.catalog, self.catalog_version, cursor, limit, fields, genres, year_from, year_to
+            )
     
     def get_movie_by_id(self, movie_id: int) -> Movie:
         """Get a specific movie by ID."""
-        for movie in self.movies:
-            if movie.id == movie_id:
-                return movie
-        raise ValueError(f"Movie with ID {movie_id} not found")
+        with self._lock.read():
+            movie = self.catalog.get(movie_id)
+        if movie is None:
+            raise ValueError(f"Movie with ID {movie_id} not found")
+        return movie
+    
+    def upsert_movie(self, movie: Movie) -> Movie:
+        """
+        Add a movie to the catalogue, or replace the one with its ID.
+        
+        Every model is patched in place rather than refitted, so the movie
+        is recommendable as soon as this returns. It is also appended to
+        the catalogue log for the next start.
+        """
+        with self._lock.write():
+            movie = self._apply_movie(movie)
+            self._log_movie(movie)
+        return movie
+    
+    def _apply_movie(self, movie: Movie) -> Movie:
+        """Put one movie into the catalogue and every structure built on it."""
+        row, added = self.catalog.upsert(movie)
+        net_likes = 0
+        if added:
+            # Catalogue rows are the first interaction columns (see the
+            # recommenders' fit). A movie rated before it was catalogued, or
+            # any such movie, holds the next column: swap the new one into place
+            col = self.interactions.add_movie(movie.id)
+            if col != row:
+                self.interactions.swap_movies(col, row)
+                self.neighbors.swap_columns(col, row)
+                self.factorization_recommender.swap_columns(col, row)
+                self.item_recommender.swap_columns(col, row)
+            net_likes = int(self.interactions.column(row)[1].sum())
+        self.popularity.upsert(row, net_likes)
+        self.content_recommender.upsert(row)
+        self.hybrid_recommender.upsert(row)
+        
+        # New pages for /items; cached lists may hold the old movie or miss the new one
+        self.catalog_version += 1
+        self.recommendation_cache.clear()
+        return self.catalog.movie(row)
+    
+    def _log_movie(self, movie: Movie):
+        if self.catalog_log is None:
+            return
+        self.catalog_log.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.catalog_log, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(movie.dict(), ensure_ascii=False) + '\n')
+            f.flush()
+            if self.durable_writes:
+                os.fsync(f.fileno())
     
     def add_user_preference(self, user_id: str, movie_id: int, liked: bool):
         """Add or update user preference for a movie."""
-        if user_id not in self.user_preferences:
-            self.user_preferences[user_id] = {}
+        error, = self.add_user_preferences([(user_id, movie_id, liked)])
+        if error is not None:
+            raise error
+    
+    def add_user_preferences(self, preferences: Iterable[Tuple[str, int, bool]]) -> List[Optional[Exception]]:
+        """
+        Add or update many (user_id, movie_id, liked) preferences, waiting for one commit.
+        
+        Returns:
+            Per preference, None once it is applied, or the error that
+            rejected it (nothing of it was stored); the others still apply
+        """
+        errors: List[Optional[Exception]] = []
+        sequence = 0
+        with self._lock.write():
+            # Log and apply under one lock so the log order is the applied
+            # order; waiting for the commit happens outside it, so concurrent
+            # writers share one group commit
+            for user_id, movie_id, liked in preferences:
+                try:
+                    sequence = self.preference_store.append(user_id, movie_id, liked)
+                except (ValueError, StoreUnavailable) as e:
+                    errors.append(e)
+                    continue
+                self._apply_preference(user_id, movie_id, liked)
+                errors.append(None)
+            if self._first_training_due():
+                self._first_training = self._start_background("factorization-first-training", self.retrain_factorization)
+        if self.durable_writes and sequence:
+            self.preference_store.wait_for(sequence)
+        return errors
+    
+    def _first_training_due(self) -> bool:
+        """Whether to train a never-trained factorisation model now; call under the write lock."""
+        if self.retrain_interval <= 0 or self._first_training is not None or self._replay_training is not None:
+            return False
+        return not self.factorization_recommender.trained and self.interactions.nnz >= self.first_training_preferences
+    
+    def _apply_preference(self, user_id: str, movie_id: int, liked: bool):
+        """Apply one preference to every in-memory structure."""
+        change = self.interactions.set(user_id, movie_id, liked)
+        self.neighbors.update(*change)
+        # Refit the user's latent vector against the current item factors
+        self.factorization_recommender.update(*change)
+        # Count the pairs the change forms with the user's other ratings
+        self.item_recommender.update(*change)
+        _, _, old, new = change
+        
+        # A new preference version makes the user's cached results unreachable
+        self.preference_versions[user_id] = self.preference_versions.get(user_id, 0) + 1
+        self.recommendation_cache.invalidate_user(user_id)
         
-        self.user_preferences[user_id][movie_id] = liked
+        # Keep the shared popularity ranking in step with live likes
+        self.popularity.update(movie_id, old, new)
         
-        # Update collaborative and hybrid recommenders
-        self.collaborative_recommender.update_user_preferences(user_id, movie_id, liked)
-        self.hybrid_recommender.update_user_preferences(user_id, movie_id, liked)
+        # The collaborative recommender reads the store directly; the hybrid
+        # one also keeps a per-user content profile
+        self.hybrid_recommender.observe_preference(user_id, movie_id, old, new)
     
     def get_user_preferences(self, user_id: str) -> Dict[str, List[int]]:
         """Get user's liked and disliked movies."""
-        if user_id not in self.user_preferences:
-            return {"liked_movies": [], "disliked_movies": []}
-        
-        prefs = self.user_preferences[user_id]
+        with self._lock.read():
+            return self._user_preferences(user_id)
+    
+    def _user_preferences(self, user_id: str) -> Dict[str, List[int]]:
+        prefs = self.interactions.user_preferences(user_id)
         liked_movies = [movie_id for movie_id, liked in prefs.items() if liked]
         disliked_movies = [movie_id for movie_id, liked in prefs.items() if not liked]
         
@@ -81,8 +557,27 @@ class DataService:
         }
     
     def get_recommendations(self, user_id: str, mode: RecommendationMode, limit: int = 10) -> List[Movie]:
-        """Get movie recommendations for a user."""
-        user_prefs = self.get_user_preferences(user_id)
+        """Get movie recommendations for a user, served from cache when fresh."""
+        mode = RecommendationMode(mode)
+        ttl = self.cache_ttl if mode == RecommendationMode.CONTENT_BASED else self.neighbor_cache_ttl
+        with self._lock.read(), recording(mode.value):
+            key = (user_id, mode, limit, self._preference_version(user_id))
+            with span("cache"):
+                recommendations = self.recommendation_cache.get(key, ttl)
+            RECOMMENDATIONS.inc(mode.value, "miss" if recommendations is None else "hit")
+            if recommendations is None:
+                recommendations = self._compute_recommendations(user_id, mode, limit)
+                self.recommendation_cache.put(key, recommendations)
+        return list(recommendations)
+    
+    def _preference_version(self, user_id: str) -> int:
+        """Counter that changes whenever the user's preferences do (part of cache keys)."""
+        return self.preference_versions.get(user_id, 0)
+    
+    def _compute_recommendations(self, user_id: str, mode: RecommendationMode, limit: int) -> List[Movie]:
+        """Run the recommender for `mode` and materialise the results."""
+        with span("preferences"):
+            user_prefs = self._user_preferences(user_id)
         liked_movies = user_prefs["liked_movies"]
         disliked_movies = user_prefs["disliked_movies"]
         
@@ -94,21 +589,137 @@ class DataService:
             recommended_ids = self.collaborative_recommender.get_recommendations(
                 user_id, liked_movies, disliked_movies, limit
             )
-        else:  # HYBRID
+        elif mode == RecommendationMode.HYBRID:
             recommended_ids = self.hybrid_recommender.get_recommendations(
                 user_id, liked_movies, disliked_movies, limit
             )
+        elif mode == RecommendationMode.MATRIX_FACTORIZATION:
+            recommended_ids = self.factorization_recommender.get_recommendations(
+                user_id, liked_movies, disliked_movies, limit
+            )
+        else:  # ITEM_BASED
+            recommended_ids = self.item_recommender.get_recommendations(
+                user_id, liked_movies, disliked_movies, limit
+            )
         
         # Convert IDs to Movie objects
-        recommendations = []
-        for movie_id in recommended_ids:
-            try:
-                movie = self.get_movie_by_id(movie_id)
-                recommendations.append(movie)
-            except ValueError:
-                continue  # Skip if movie not found
-        
-        return recommendations
+        return self._movies_for(recommended_ids)
+    
+    def get_recommendations_batch(
+        self,
+        user_ids: List[str],
+        mode: RecommendationMode,
+        limit: int = 10,
+        block_size: int = 256
+    ) -> Iterator[Tuple[str, List[Movie]]]:
+        """
+        Recommendations for many users, yielded block by block as (user_id, movies).
+        
+        Each block is scored by the recommender's batch API with matrix
+        products instead of one request per user. Results bypass the cache.
+        """
+        mode = RecommendationMode(mode)
+        for start in range(0, len(user_ids), block_size):
+            block = user_ids[start:start + block_size]
+            # Upserts replace catalogue rows in place: read them under the same lock
+            with self._lock.read(), recording(mode.value):
+                recommended = self._score_block(block, mode, limit)
+                movies = [self._movies_for(recommended_ids) for recommended_ids in recommended]
+            
+            # Yield outside the lock so a slow consumer never blocks writers
+            yield from zip(block, movies)
+    
+    def get_recommendations_many(self, user_ids: List[str], mode: RecommendationMode, limit: int = 10) -> List[List[Movie]]:
+        """
+        Recommendations for concurrent requests, aligned with `user_ids`.
+        
+        Same results and caching as calling get_recommendations per user, but
+        the cache misses are scored together as one batch.
+        """
+        mode = RecommendationMode(mode)
+        ttl = self.cache_ttl if mode == RecommendationMode.CONTENT_BASED else self.neighbor_cache_ttl
+        with self._lock.read(), recording(mode.value):
+            keys = {user_id: (user_id, mode, limit, self._preference_version(user_id)) for user_id in user_ids}
+            results = {}
+            with span("cache"):
+                for user_id, key in keys.items():
+                    cached = self.recommendation_cache.get(key, ttl)
+                    if cached is not None:
+                        results[user_id] = cached
+            misses = [user_id for user_id in keys if user_id not in results]
+            RECOMMENDATIONS.inc(mode.value, "hit", amount=len(results))
+            RECOMMENDATIONS.inc(mode.value, "miss", amount=len(misses))
+            if misses:
+                for user_id, recommended_ids in zip(misses, self._score_block(misses, mode, limit)):
+                    results[user_id] = self._movies_for(recommended_ids)
+                    self.recommendation_cache.put(keys[user_id], results[user_id])
+        return [list(results[user_id]) for user_id in user_ids]
+    
+    def _score_block(self, user_ids: List[str], mode: RecommendationMode, limit: int) -> List[List[int]]:
+        """Recommended movie IDs per user from the recommender's batch API; caller holds the read lock."""
+        with span("preferences"):
+            prefs = [self._user_preferences(user_id) for user_id in user_ids]
+        liked_lists = [p["liked_movies"] for p in prefs]
+        disliked_lists = [p["disliked_movies"] for p in prefs]
+        
+        if mode == RecommendationMode.CONTENT_BASED:
+            return self.content_recommender.get_recommendations_batch(
+                liked_lists, disliked_lists, limit
+            )
+        elif mode == RecommendationMode.COLLABORATIVE:
+            return self.collaborative_recommender.get_recommendations_batch(
+                user_ids, liked_lists, disliked_lists, limit
+            )
+        elif mode == RecommendationMode.HYBRID:
+            return self.hybrid_recommender.get_recommendations_batch(
+                user_ids, liked_lists, disliked_lists, limit
+            )
+        elif mode == RecommendationMode.MATRIX_FACTORIZATION:
+            return self.factorization_recommender.get_recommendations_batch(
+                user_ids, liked_lists, disliked_lists, limit
+            )
+        else:  # ITEM_BASED
+            return self.item_recommender.get_recommendations_batch(
+                user_ids, liked_lists, disliked_lists, limit
+            )
+    
+    def explain_recommendations(self, user_id: str, movie_ids: Optional[List[int]] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Content and collaborative contributions behind each movie's hybrid score.
+        
+        Without `movie_ids`, explains the user's current hybrid
+        recommendations (served from the result cache when fresh). Only the
+        requested movies are scored; see HybridRecommender.explain.
+        
+        Raises:
+            ValueError: A movie ID is not in the catalogue
+        """
+        if movie_ids is None:
+            movie_ids = [movie.id for movie in self.get_recommendations(user_id, RecommendationMode.HYBRID, limit)]
+        with self._lock.read(), recording(RecommendationMode.HYBRID.value):
+            for movie_id in movie_ids:
+                if self.catalog.row_of(movie_id) is None:
+                    raise ValueError(f"Movie with ID {movie_id} not found")
+            with span("preferences"):
+                prefs = self._user_preferences(user_id)
+            with span("explain"):
+                return self.hybrid_recommender.explain(
+                    user_id, movie_ids, prefs["liked_movies"], prefs["disliked_movies"]
+                )
+    
+    def _movies_for(self, movie_ids: Iterable[int]) -> List[Movie]:
+        """Movies for IDs, skipping any not in the catalogue."""
+        with span("materialise"):
+            movies = [self.catalog.get(movie_id) for movie_id in movie_ids]
+            return [movie for movie in movies if movie is not None]
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Recommendation cache counters."""
+        return self.recommendation_cache.stats()
+    
+    def get_similarity_cache_stats(self) -> Dict[str, Any]:
+        """Hybrid neighbour-list cache counters and memory use."""
+        return self.hybrid_recommender.user_similarities.stats()
     
     def set_recommendation_mode(self, mode: RecommendationMode):
         """Set the current recommendation mode."""
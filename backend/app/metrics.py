@@ -0,0 +1,204 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Every Histogram and Counter, in creation order, for render()
+REGISTRY: List[Any] = []
+
+# Seconds; stage timings range from microseconds (cache hits) to seconds
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    """Prometheus histogram with one series per combination of label values."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # labels -> per-bucket counts, +Inf count, sum
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *label_values: str):
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bucket] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(counts) for labels, counts in self._series.items()}
+        for label_values, counts in sorted(series.items()):
+            labels = _labels(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_labels(zip(self.labels + ('le',), label_values + (le,)))} {cumulative}")
+            lines.append(f"{self.name}_sum{labels} {counts[-1]:.9g}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Prometheus counter with one series per combination of label values."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._series: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = dict(self._series)
+        for label_values, value in sorted(series.items()):
+            lines.append(f"{self.name}{_labels(zip(self.labels, label_values))} {value:g}")
+        return lines
+
+
+class Profile:
+    """Per-stage time of one request, reported in its Server-Timing header."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}  # stage -> seconds, summed over repeated spans
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.started
+        entries = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.stages.items()]
+        entries.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(entries)
+
+
+STAGE_SECONDS = Histogram(
+    "recommendation_stage_seconds",
+    "Time spent in each stage of computing recommendations.",
+    labels=("mode", "stage")
+)
+RECOMMENDATIONS = Counter(
+    "recommendations_total",
+    "Recommendation lists served, by mode and whether the result cache answered.",
+    labels=("mode", "cache")
+)
+
+_mode: ContextVar[str] = ContextVar("recommendation_mode", default="")
+_profile: ContextVar[Optional[Profile]] = ContextVar("request_profile", default=None)
+
+
+class recording:
+    """Label the spans inside this block with a recommendation mode."""
+
+    __slots__ = ('mode', '_token')
+
+    def __init__(self, mode: str):
+        self.mode = mode
+
+    def __enter__(self):
+        self._token = _mode.set(self.mode)
+
+    def __exit__(self, *exc):
+        _mode.reset(self._token)
+
+
+class span:
+    """
+    Time one stage: observed in STAGE_SECONDS under the current mode, and
+    added to the request's Profile when profiling is on.
+    """
+
+    __slots__ = ('stage', '_started')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._started
+        STAGE_SECONDS.observe(elapsed, _mode.get(), self.stage)
+        profile = _profile.get()
+        if profile is not None:
+            profile.add(self.stage, elapsed)
+
+
+def current_profile() -> Optional[Profile]:
+    """Profile of the request being handled, if it asked for one."""
+    return _profile.get()
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware for opt-in profiling: a request sent with an
+    `X-Profile` header gets a `Server-Timing` header breaking its time down
+    by stage. Other requests pass straight through.
+    """
+
+    HEADER = b"x-profile"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(name == self.HEADER for name, _ in scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile()
+        token = _profile.set(profile)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", profile.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _profile.reset(token)
+
+
+def gauges(name: str, help: str, samples: Iterable[Tuple[Dict[str, str], Any]]) -> List[str]:
+    """Prometheus gauge lines for (labels, value) samples, skipping non-numeric values."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+    for labels, value in samples:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"{name}{_labels(labels.items())} {value:g}")
+    return lines
+
+
+def render(*extra: Iterable[str]) -> str:
+    """Prometheus text exposition of every registered metric, plus extra lines."""
+    lines = [line for metric in REGISTRY for line in metric.render()]
+    for group in extra:
+        lines.extend(group)
+    return "\n".join(lines) + "\n"
+
+
+def _labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    pairs = list(pairs)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
@@ -1,125 +1,176 @@
-from typing import List, Dict
-import pandas as pd
+from typing import List, Dict, Optional, Union
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from ..models import Movie
+import scipy.sparse as sp
+from ..catalog import MovieCatalog
+from ..metrics import span
+from .popularity import PopularityRanking
+from .interactions import InteractionMatrix
+from .neighbors import NeighborIndex, make_neighbor_index
+from .topk import row_blocks, top_k_indices, top_k_rows
 
 
 class CollaborativeRecommender:
-    def __init__(self):
-        self.movies_df: pd.DataFrame = None
-        self.user_preferences: Dict[str, Dict[int, bool]] = {}
-        self.user_movie_matrix: pd.DataFrame = None
-        
-    def fit(self, movies: List[Movie]):
+    def __init__(
+        self,
+        n_neighbors: int = 5,
+        neighbor_index: Union[str, NeighborIndex] = "lsh",
+        interactions: Optional[InteractionMatrix] = None
+    ):
+        """
+        Args:
+            n_neighbors: Similar users whose likes are aggregated
+            neighbor_index: Candidate search ("lsh", "exact") or a shared index over `interactions`
+            interactions: Shared interaction store; the owner writes to it, this only reads
+        """
+        self.n_neighbors = n_neighbors
+        self.catalog: MovieCatalog = None
+        self.popularity: PopularityRanking = None
+        self.interactions = interactions if interactions is not None else InteractionMatrix()
+        if isinstance(neighbor_index, str):
+            neighbor_index = make_neighbor_index(self.interactions, neighbor_index)
+        self.neighbors = neighbor_index
+        
+    def fit(self, catalog: MovieCatalog, popularity: PopularityRanking = None):
         """Initialize the collaborative filtering model with movie data."""
-        movies_data = [movie.dict() for movie in movies]
-        self.movies_df = pd.DataFrame(movies_data)
-        
-    def update_user_preferences(self, user_id: str, movie_id: int, liked: bool):
-        """Update user preferences for collaborative filtering."""
-        if user_id not in self.user_preferences:
-            self.user_preferences[user_id] = {}
-        self.user_preferences[user_id][movie_id] = liked
-        
-    def _build_user_movie_matrix(self):
-        """Build user-movie interaction matrix."""
-        if not self.user_preferences:
-            return None
-            
-        # Create a list of all unique users and movies
-        all_users = list(self.user_preferences.keys())
-        all_movies = set()
-        for user_prefs in self.user_preferences.values():
-            all_movies.update(user_prefs.keys())
-        all_movies = sorted(list(all_movies))
+        self.catalog = catalog
+        self.popularity = popularity or PopularityRanking(catalog)
         
-        # Build the matrix
-        matrix_data = []
-        for user in all_users:
-            user_row = []
-            for movie in all_movies:
-                if movie in self.user_preferences[user]:
-                    # Convert boolean to numeric: True (like) = 1, False (dislike) = -1
-                    user_row.append(1 if self.user_preferences[user][movie] else -1)
-                else:
-                    user_row.append(0)  # No preference
-            matrix_data.append(user_row)
-        
-        self.user_movie_matrix = pd.DataFrame(
-            matrix_data, 
-            index=all_users, 
-            columns=all_movies
-        )
+        # Give catalogue movies the first, stable matrix columns
+        for movie_id in catalog.ids.tolist():
+            self.interactions.add_movie(movie_id)
+
         
     def get_recommendations(
         self, 
         user_id: str,
         liked_movies: List[int], 
         disliked_movies: List[int], 
-        limit: int = 10
+        limit: int = 10,
+        exact: bool = False
     ) -> List[int]:
-        """Get movie recommendations using collaborative filtering."""
-        self._build_user_movie_matrix()
+        """
+        Get movie recommendations using collaborative filtering.
         
-        if (self.user_movie_matrix is None or 
-            user_id not in self.user_movie_matrix.index or
-            len(self.user_movie_matrix) < 2):
-            # Fallback to content-based approach (top-rated movies)
-            return self._get_top_rated_movies(limit, liked_movies + disliked_movies)
+        Args:
+            exact: Bypass the approximate neighbour index (for correctness checks)
+        """
+        user_idx = self.interactions.user_index.get(user_id)
         
-        # Get user similarity matrix
-        user_similarity = cosine_similarity(self.user_movie_matrix.values)
-        user_similarity_df = pd.DataFrame(
-            user_similarity,
-            index=self.user_movie_matrix.index,
-            columns=self.user_movie_matrix.index
-        )
-        
-        # Find similar users (excluding the target user)
-        target_user_similarities = user_similarity_df[user_id].drop(user_id)
-        
-        if target_user_similarities.empty:
+        if user_idx is None or self.interactions.n_users < 2:
+            # Fallback to content-based approach (top-rated movies)
             return self._get_top_rated_movies(limit, liked_movies + disliked_movies)
         
-        # Get top similar users
-        similar_users = target_user_similarities.sort_values(ascending=False).head(5)
-        
-        # Aggregate recommendations from similar users
-        movie_scores = {}
-        excluded_movies = set(liked_movies + disliked_movies)
-        
-        for similar_user, similarity_score in similar_users.items():
-            if similarity_score <= 0:
-                continue
-                
-            user_prefs = self.user_preferences.get(similar_user, {})
-            for movie_id, liked in user_prefs.items():
-                if movie_id not in excluded_movies and liked:  # Only consider liked movies
-                    if movie_id not in movie_scores:
-                        movie_scores[movie_id] = 0
-                    movie_scores[movie_id] += similarity_score
+        # Get top similar users with a positive similarity
+        with span("candidates"):
+            similar_users, similarities = self.neighbors.query(user_idx, self.n_neighbors, exact=exact)
+            positive = similarities > 0
+        
+        # Aggregate recommendations from similar users' likes
+        with span("scoring"):
+            movie_scores = np.zeros(self.interactions.n_movies)
+            for similar_user, similarity in zip(similar_users[positive], similarities[positive]):
+                cols, vals = self.interactions.row(similar_user)
+                movie_scores[cols[vals > 0]] += similarity
+            
+            for movie_id in liked_movies + disliked_movies:
+                col = self.interactions.movie_index.get(movie_id)
+                if col is not None:
+                    movie_scores[col] = 0
         
         # Sort movies by aggregated scores
-        if not movie_scores:
+        if not movie_scores.any():
             return self._get_top_rated_movies(limit, liked_movies + disliked_movies)
         
-        recommended_movies = sorted(
-            movie_scores.items(), 
-            key=lambda x: x[1], 
-            reverse=True
+        with span("top_k"):
+            top = top_k_indices(movie_scores, limit)
+            top = top[movie_scores[top] > 0]
+        return [self.interactions.movie_ids[col] for col in top]
+    
+    def get_recommendations_batch(
+        self,
+        user_ids: List[str],
+        liked_lists: List[List[int]],
+        disliked_lists: List[List[int]],
+        limit: int = 10
+    ) -> List[List[int]]:
+        """
+        Recommendations for many users, equal to get_recommendations for each.
+        
+        Neighbours come from the shared index: while it is exact, each block
+        of users is scored against every user with one sparse matrix product
+        and a row-wise top-k; once it is approximate, each user is queried
+        like a single request. Their likes are then aggregated for the whole
+        block with a second product.
+        """
+        results = [None] * len(user_ids)
+        matrix = self.interactions.csr().astype(np.float64)
+        norms = self.interactions.norms()
+        likes = matrix.multiply(matrix > 0).tocsr()
+        
+        known = [i for i, user_id in enumerate(user_ids) if user_id in self.interactions.user_index]
+        if self.interactions.n_users < 2:
+            known = []
+        
+        for block in row_blocks(len(known), self.interactions.n_users):
+            positions = known[block]
+            rows = np.array([self.interactions.user_index[user_ids[i]] for i in positions])
+            
+            with span("candidates"):
+                if self.neighbors.approximate:
+                    weights = self._queried_weights(rows)
+                else:
+                    weights = self._exact_weights(rows, matrix, norms)
+            
+            # Aggregate neighbour likes, excluding what the user already rated
+            with span("scoring"):
+                movie_scores = (weights @ likes).toarray()
+                movie_scores[matrix[rows].nonzero()] = 0
+                movie_scores[movie_scores <= 0] = -np.inf
+            
+            with span("top_k"):
+                tops = top_k_rows(movie_scores, limit)
+            for position, top in zip(positions, tops):
+                if len(top):
+                    results[position] = [self.interactions.movie_ids[col] for col in top]
+        
+        for position, recommendations in enumerate(results):
+            if recommendations is None:
+                results[position] = self._get_top_rated_movies(
+                    limit, liked_lists[position] + disliked_lists[position]
+                )
+        return results
+    
+    def _exact_weights(self, rows: np.ndarray, matrix: sp.csr_matrix, norms: np.ndarray) -> sp.csr_matrix:
+        """(block x users) similarities of each row's top neighbours with a positive similarity, by brute force."""
+        # Cosine similarity of the block against every user
+        similarities = (matrix[rows] @ matrix.T).toarray()
+        denominator = norms[rows][:, None] * norms[None, :]
+        np.divide(similarities, denominator, out=similarities, where=denominator > 0)
+        similarities[np.arange(len(rows)), rows] = -np.inf
+        
+        neighbors = top_k_rows(similarities, self.n_neighbors)
+        weight_rows = np.repeat(np.arange(len(rows)), [len(n) for n in neighbors])
+        weight_cols = np.concatenate(neighbors)
+        weights = similarities[weight_rows, weight_cols]
+        positive = weights > 0
+        return sp.csr_matrix(
+            (weights[positive], (weight_rows[positive], weight_cols[positive])),
+            shape=similarities.shape
+        )
+    
+    def _queried_weights(self, rows: np.ndarray) -> sp.csr_matrix:
+        """As _exact_weights, with each row's neighbours from a neighbour index query."""
+        queried = [self.neighbors.query(row, self.n_neighbors) for row in rows.tolist()]
+        weight_rows = np.repeat(np.arange(len(rows)), [len(neighbors) for neighbors, _ in queried])
+        weight_cols = np.concatenate([neighbors for neighbors, _ in queried]) if queried else np.empty(0, dtype=np.intp)
+        weights = np.concatenate([similarities for _, similarities in queried]) if queried else np.empty(0)
+        positive = weights > 0
+        return sp.csr_matrix(
+            (weights[positive], (weight_rows[positive], weight_cols[positive])),
+            shape=(len(rows), self.interactions.n_users)
         )
-        
-        return [movie_id for movie_id, score in recommended_movies[:limit]]
     
     def _get_top_rated_movies(self, limit: int, excluded_movies: List[int]) -> List[int]:
-        """Get top-rated movies as fallback recommendations."""
-        excluded_set = set(excluded_movies)
-        top_movies = self.movies_df.sort_values('rating', ascending=False)
-        
-        recommendations = []
-        for _, movie in top_movies.iterrows():
-            if movie['id'] not in excluded_set and len(recommendations) < limit:
-                recommendations.append(movie['id'])
-        
-        return recommendations
+        """Get the most popular movies as fallback recommendations."""
+        with span("fallback"):
+            return self.popularity.top(limit, excluded_movies)
@@ -1,41 +1,197 @@
-from typing import List, Dict
-import pandas as pd
+# ML module for recommender system
+from typing import List, Dict, Optional, Tuple
 import numpy as np
+import scipy.sparse as sp
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from ..models import Movie
+from ..artifacts import csr_from_arrays, csr_to_arrays, vectorizer_from_arrays, vectorizer_to_arrays
+from ..catalog import MovieCatalog
+from ..metrics import span
+from .popularity import PopularityRanking
+from .sparse_rows import GrowableCSR
+from .topk import row_blocks, top_k_indices, top_k_neighbors, top_k_rows, top_k_sparse_rows
+
+# (vectoriser, TF-IDF matrix, neighbour table)
+ContentModel = Tuple[TfidfVectorizer, sp.csr_matrix, sp.csr_matrix]
 
 
 class ContentBasedRecommender:
-    def __init__(self):
-        self.movies_df: pd.DataFrame = None
-        self.tfidf_matrix = None
-        self.tfidf_vectorizer = None
-        self.cosine_sim = None
+    """
+    Item-item content similarity over TF-IDF vectors of genre, director and
+    description, read from a top-k neighbour table.
+
+    Movies added or changed after fitting are indexed by upsert against the
+    fitted (frozen) vocabulary and IDF weights. Their effect on the table is
+    kept as a sparse additive patch, so scores are the table's plus the
+    patch's; the patch is folded into the table once it outgrows a fraction
+    of it.
+    """
+    tfidf_params = {'stop_words': 'english', 'max_features': 5000, 'ngram_range': (1, 2)}
+
+    def __init__(self, n_neighbors: int = 200, chunk_size: int = 1024, compact_ratio: float = 0.05, min_compact: int = 4096):
+        """
+        Args:
+            n_neighbors: Similar movies kept per movie in the neighbour table
+            chunk_size: Movies scored per block while building the table
+            compact_ratio: Fold the patch into the table once it holds this
+                fraction of the table's entries...
+            min_compact: ...and more than this many
+        """
+        self.n_neighbors = n_neighbors
+        self.chunk_size = chunk_size
+        self.compact_ratio = compact_ratio
+        self.min_compact = min_compact
+        self.catalog: MovieCatalog = None
+        self.popularity: PopularityRanking = None
+        self._install(None, None, None)
         
-    def fit(self, movies: List[Movie]):
+    def fit(self, catalog: MovieCatalog, popularity: PopularityRanking = None):
         """Train the content-based model with movie data."""
-        # Convert movies to DataFrame
-        movies_data = [movie.dict() for movie in movies]
-        self.movies_df = pd.DataFrame(movies_data)
-        
-        # Create feature text by combining genre, director, and description
-        self.movies_df['features'] = (
-            self.movies_df['genre'] + ' ' + 
-            self.movies_df['director'] + ' ' + 
-            self.movies_df['description']
+        self.catalog = catalog
+        self.popularity = popularity or PopularityRanking(catalog)
+        self.install(self.train(catalog.feature_text()))
+    
+    def train(self, texts: List[str]) -> ContentModel:
+        """
+        Fit a vectoriser and neighbour table on per-movie feature texts.
+        
+        Touches no shared state, so it can run without the owner's lock.
+        """
+        # Create TF-IDF matrix from genre, director, and description
+        vectorizer = TfidfVectorizer(**self.tfidf_params)
+        tfidf_matrix = vectorizer.fit_transform(texts)
+        
+        # Keep only each movie's top-k cosine neighbours, built block by block
+        return vectorizer, tfidf_matrix, top_k_neighbors(tfidf_matrix, self.n_neighbors, self.chunk_size)
+    
+    def install(self, model: ContentModel):
+        """Switch to a trained model (dropping any patch); call under the owner's write lock."""
+        self._install(*model)
+    
+    def state_arrays(self) -> Dict[str, np.ndarray]:
+        """Fitted state as flat arrays for ModelArtifacts."""
+        return {
+            **vectorizer_to_arrays("content.vectorizer", self.tfidf_vectorizer),
+            **csr_to_arrays("content.tfidf", self.tfidf_matrix),
+            **csr_to_arrays("content.neighbors", self._patched_table()),
+        }
+    
+    def load_state(self, catalog: MovieCatalog, popularity: PopularityRanking, arrays: Dict[str, np.ndarray]):
+        """Restore a fitted model from state_arrays output instead of calling fit."""
+        self.catalog = catalog
+        self.popularity = popularity
+        self._install(
+            vectorizer_from_arrays(arrays, "content.vectorizer", **self.tfidf_params),
+            csr_from_arrays(arrays, "content.tfidf"),
+            csr_from_arrays(arrays, "content.neighbors")
         )
+    
+    def upsert(self, row: int):
+        """
+        Index the movie at a new or changed catalogue row without refitting.
+        
+        The movie is mapped into the fitted feature space (terms outside the
+        vocabulary are ignored until the next fit) and one sparse product
+        gives its similarity to every movie. Its own neighbour row becomes
+        its top-k; it joins the row of every movie whose k-th neighbour it
+        beats, and its similarity is updated in rows that already list it.
+        A joined row keeps its previous neighbours too until the patch is
+        folded into the table, which trims every row back to k.
+        """
+        n = len(self.catalog)
+        added = row >= self.tfidf_matrix.shape[0]
+        vector = self.tfidf_vectorizer.transform(self.catalog.feature_text(rows=[row]))
+        self._tfidf_rows.set_row(row, vector)
+        self.tfidf_matrix = self._tfidf_rows.matrix
+        self.neighbors = _padded(self.neighbors, n)
+        
+        similarities = self.tfidf_matrix @ vector.toarray().ravel()
+        top = top_k_indices(similarities, self.n_neighbors)
+        top = top[similarities[top] > 0]
+        wanted_row = np.zeros(n)
+        wanted_row[top] = similarities[top]
+        
+        # A new movie is in no other row yet; a changed one may be in any row
+        # it was similar to, or that a patch added it to
+        current_column = np.zeros(n) if added else self._column(row)
+        threshold = self._admission_thresholds(n)
+        joins = (similarities > 0) & ((current_column != 0) | (similarities > threshold))
+        wanted_column = np.where(joins, similarities, 0.0)
         
-        # Create TF-IDF matrix
-        self.tfidf_vectorizer = TfidfVectorizer(
-            stop_words='english',
-            max_features=5000,
-            ngram_range=(1, 2)
+        row_change = wanted_row - self._row(row)
+        column_change = wanted_column - current_column
+        column_change[row] = 0  # the diagonal belongs to the row
+        changed_cols = np.flatnonzero(row_change)
+        changed_rows = np.flatnonzero(column_change)
+        rows, cols, values = self._patch_entries
+        self._patch_entries = (
+            np.concatenate([rows, np.full(len(changed_cols), row), changed_rows]),
+            np.concatenate([cols, changed_cols, np.full(len(changed_rows), row)]),
+            np.concatenate([values, row_change[changed_cols], column_change[changed_rows]])
         )
-        self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(self.movies_df['features'])
+        threshold[row] = similarities[top].min() if len(top) >= self.n_neighbors else 0.0
         
-        # Compute cosine similarity matrix
-        self.cosine_sim = cosine_similarity(self.tfidf_matrix)
+        rows, cols, values = self._patch_entries
+        self._patch = sp.csr_matrix((values, (rows, cols)), shape=(n, n))
+        if len(values) > max(self.min_compact, self.compact_ratio * self.neighbors.nnz):
+            self.neighbors = self._patched_table()
+            self._clear_patch()
+    
+    def _install(
+        self,
+        vectorizer: Optional[TfidfVectorizer],
+        tfidf_matrix: Optional[sp.csr_matrix],
+        neighbors: Optional[sp.csr_matrix]
+    ):
+        self.tfidf_vectorizer = vectorizer
+        self.tfidf_matrix = tfidf_matrix
+        self.neighbors = neighbors
+        self._tfidf_rows = GrowableCSR(tfidf_matrix) if tfidf_matrix is not None else None
+        self._clear_patch()
+    
+    def _clear_patch(self):
+        # (rows, cols, additive changes) to the neighbour table, and their sum as CSR
+        self._patch_entries = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+        self._patch = sp.csr_matrix((0, 0))
+        self._thresholds: Optional[np.ndarray] = None  # row -> similarity a movie must beat to join it
+    
+    def _patched_table(self) -> sp.csr_matrix:
+        """Neighbour table with the patch folded in and every row trimmed to its top k."""
+        if not len(self._patch_entries[2]):
+            return self.neighbors
+        return top_k_sparse_rows(self.neighbors + self._patch, self.n_neighbors)
+    
+    def _row(self, row: int) -> np.ndarray:
+        """Dense neighbour row of the patched table."""
+        values = np.zeros(self.neighbors.shape[1])
+        start, end = self.neighbors.indptr[row], self.neighbors.indptr[row + 1]
+        values[self.neighbors.indices[start:end]] = self.neighbors.data[start:end]
+        if row < self._patch.shape[0]:
+            start, end = self._patch.indptr[row], self._patch.indptr[row + 1]
+            values[self._patch.indices[start:end]] += self._patch.data[start:end]
+        return values
+    
+    def _column(self, col: int) -> np.ndarray:
+        """Dense neighbour column of the patched table (a scan of the table, O(nnz))."""
+        values = np.zeros(self.neighbors.shape[0])
+        for table in (self.neighbors, self._patch):
+            if table.nnz:
+                positions = np.flatnonzero(table.indices == col)
+                values[np.searchsorted(table.indptr, positions, 'right') - 1] += table.data[positions]
+        return values
+    
+    def _admission_thresholds(self, n: int) -> np.ndarray:
+        """Per row, the k-th neighbour's similarity, or 0 while the row has fewer than k."""
+        if self._thresholds is None:
+            table = self.neighbors
+            counts = np.diff(table.indptr)
+            smallest = np.zeros(table.shape[0])
+            filled = counts > 0
+            if filled.any():
+                smallest[filled] = np.minimum.reduceat(table.data, table.indptr[:-1][filled])
+            self._thresholds = np.where(counts >= self.n_neighbors, smallest, 0.0)
+        if len(self._thresholds) < n:
+            self._thresholds = np.concatenate([self._thresholds, np.zeros(n - len(self._thresholds))])
+        return self._thresholds
         
     def get_recommendations(
         self, 
@@ -48,47 +204,72 @@ class ContentBasedRecommender:
             # If no likes, return top-rated movies
             return self._get_top_rated_movies(limit, disliked_movies)
         
-        # Get indices of liked movies
-        liked_indices = []
-        for movie_id in liked_movies:
-            idx = self.movies_df[self.movies_df['id'] == movie_id].index
-            if len(idx) > 0:
-                liked_indices.append(idx[0])
+        # Get rows of liked movies
+        liked_rows = self.catalog.rows_for(liked_movies)
         
-        if not liked_indices:
+        if len(liked_rows) == 0:
             return self._get_top_rated_movies(limit, disliked_movies)
         
-        # Calculate average similarity scores for liked movies
-        similarity_scores = np.zeros(len(self.movies_df))
-        for idx in liked_indices:
-            similarity_scores += self.cosine_sim[idx]
-        similarity_scores /= len(liked_indices)
-        
-        # Create a list of (movie_index, similarity_score) tuples
-        movie_scores = list(enumerate(similarity_scores))
+        # Average similarity to the liked movies: one sum over their neighbour rows
+        with span("scoring"):
+            similarity_scores = np.asarray(self.neighbors[liked_rows].sum(axis=0)).ravel()
+            if self._patch.nnz:
+                similarity_scores += np.asarray(self._patch[liked_rows].sum(axis=0)).ravel()
+            similarity_scores /= len(liked_rows)
         
-        # Sort movies by similarity score
-        movie_scores.sort(key=lambda x: x[1], reverse=True)
+        # Rank the movies that are not already liked/disliked
+        with span("candidates"):
+            candidates = np.ones(len(similarity_scores), dtype=bool)
+            candidates[self.catalog.rows_for(liked_movies + disliked_movies)] = False
+            candidates = np.flatnonzero(candidates)
+        with span("top_k"):
+            top = top_k_indices(similarity_scores[candidates], limit)
         
-        # Get movie IDs, excluding already liked/disliked movies
-        excluded_movies = set(liked_movies + disliked_movies)
-        recommendations = []
+        return self.catalog.ids[candidates[top]].tolist()
+    
+    def get_recommendations_batch(
+        self,
+        liked_lists: List[List[int]],
+        disliked_lists: List[List[int]],
+        limit: int = 10
+    ) -> List[List[int]]:
+        """Recommendations for many users: one sparse product per block of users."""
+        liked = self.catalog.indicator(liked_lists)
+        rated = self.catalog.indicator([l + d for l, d in zip(liked_lists, disliked_lists)])
+        counts = liked.getnnz(axis=1)
+        results = []
         
-        for idx, score in movie_scores:
-            movie_id = self.movies_df.iloc[idx]['id']
-            if movie_id not in excluded_movies and len(recommendations) < limit:
-                recommendations.append(movie_id)
+        for block in row_blocks(liked.shape[0], len(self.catalog)):
+            # Average similarity to each user's liked movies
+            with span("scoring"):
+                scores = liked[block] @ self.neighbors
+                if self._patch.nnz:
+                    scores = scores + liked[block] @ self._patch
+                scores = scores.toarray()
+                scores /= np.maximum(counts[block], 1)[:, None]
+            with span("candidates"):
+                scores[rated[block].nonzero()] = -np.inf
+            
+            with span("top_k"):
+                tops = top_k_rows(scores, limit)
+            for offset, top in enumerate(tops):
+                user = block.start + offset
+                if counts[user]:
+                    results.append(self.catalog.ids[top].tolist())
+                else:
+                    results.append(self._get_top_rated_movies(limit, disliked_lists[user]))
         
-        return recommendations
+        return results
     
     def _get_top_rated_movies(self, limit: int, excluded_movies: List[int]) -> List[int]:
-        """Get top-rated movies as fallback recommendations."""
-        excluded_set = set(excluded_movies)
-        top_movies = self.movies_df.sort_values('rating', ascending=False)
-        
-        recommendations = []
-        for _, movie in top_movies.iterrows():
-            if movie['id'] not in excluded_set and len(recommendations) < limit:
-                recommendations.append(movie['id'])
-        
-        return recommendations
+        """Get the most popular movies as fallback recommendations."""
+        with span("fallback"):
+            return self.popularity.top(limit, excluded_movies)
+
+
+def _padded(matrix: sp.csr_matrix, n: int) -> sp.csr_matrix:
+    """A square CSR matrix grown to n x n with empty rows and columns, sharing its data."""
+    if matrix.shape == (n, n):
+        return matrix
+    indptr = np.concatenate([matrix.indptr, np.full(n - matrix.shape[0], matrix.indptr[-1])])
+    return sp.csr_matrix((matrix.data, matrix.indices, indptr), shape=(n, n))
@@ -0,0 +1,275 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import scipy.sparse as sp
+from ..artifacts import csr_from_arrays, csr_to_arrays
+from ..catalog import MovieCatalog
+from ..metrics import span
+from .popularity import PopularityRanking
+from .interactions import InteractionMatrix
+from .topk import top_k_indices, top_k_sparse_rows
+
+# (merged co-occurrence counts, similar-items table, pending changes they include)
+Refresh = Tuple[sp.csr_matrix, sp.csr_matrix, Dict[Tuple[int, int], float]]
+
+
+class ItemCooccurrenceRecommender:
+    """
+    Item-item collaborative filtering over incrementally maintained co-occurrence counts.
+
+    For every pair of movies rated by the same users the model keeps their
+    signed co-occurrence: co-likes plus co-dislikes minus disagreements (the
+    dot product of the two movie columns), and per movie its number of
+    ratings. A preference change updates the pairs it forms with the user's
+    other ratings, O(profile size), into a pending tail; nothing is
+    recomputed over other users.
+
+    Recommendations read a top-k similar-items table (cosine of the
+    columns), which DataService refreshes periodically by merging the tail.
+    Scoring sums the table rows of the user's liked movies minus those of
+    the disliked ones, so it touches only their neighbours, whatever the
+    number of users or movies.
+    """
+
+    def __init__(self, n_similar: int = 50, interactions: Optional[InteractionMatrix] = None):
+        """
+        Args:
+            n_similar: Similar movies kept per movie
+            interactions: Shared interaction store; the owner writes to it, this only reads
+        """
+        self.n_similar = n_similar
+        self.catalog: MovieCatalog = None
+        self.popularity: PopularityRanking = None
+        self.interactions = interactions if interactions is not None else InteractionMatrix()
+        self.similar = sp.csr_matrix((0, 0), dtype=np.float32)  # movie column -> top-k similar columns
+        self._counts = sp.csr_matrix((0, 0), dtype=np.float64)  # symmetric, diagonal excluded; None on a published copy
+        self._sq_norms = np.zeros(0, dtype=np.float64)  # movie column -> number of ratings
+        self._pending: Dict[Tuple[int, int], float] = {}  # (col, col) with col < col -> change since _counts
+        self.counted = True  # False from reset until a recount is installed
+
+    def fit(self, catalog: MovieCatalog, popularity: PopularityRanking = None):
+        """Attach the catalogue; counts come from rebuild and update."""
+        self.catalog = catalog
+        self.popularity = popularity or PopularityRanking(catalog)
+        for movie_id in catalog.ids.tolist():
+            self.interactions.add_movie(movie_id)
+
+    @property
+    def pending_changes(self) -> int:
+        return len(self._pending)
+
+    def state_arrays(self) -> Dict[str, np.ndarray]:
+        """Similar-items table as flat arrays; the counts stay with the writer."""
+        return csr_to_arrays("cooccurrence.similar", self.similar)
+
+    def load_state(self, arrays: Dict[str, np.ndarray]):
+        """
+        Adopt a published similar-items table, without copying it.
+
+        The counts behind it stay with the writer that publishes it, so
+        from here on update() ignores changes.
+        """
+        self.similar = csr_from_arrays(arrays, "cooccurrence.similar")
+        self._counts = None
+        self._pending.clear()
+
+    def rebuild(self):
+        """Recount every pair from the interaction matrix synchronously (after a bulk load of the store)."""
+        self.reset()
+        self.install(self.recount(*self.recount_snapshot()))
+
+    def reset(self):
+        """
+        Start over after a bulk load of the interaction matrix.
+
+        Rating counts are exact at once, O(nnz); the pair counts and the
+        table stay empty until recount/install, which can run off the
+        owner's lock. Changes made meanwhile stay pending on top of it.
+        """
+        signals = self.interactions.csr()
+        self._sq_norms = np.bincount(
+            signals.indices, weights=signals.data.astype(np.float64) ** 2, minlength=signals.shape[1]
+        )
+        self._counts = sp.csr_matrix((0, 0), dtype=np.float64)
+        self._pending = {}
+        self.similar = sp.csr_matrix((0, 0), dtype=np.float32)
+        self.counted = False
+
+    def update(self, row: int, col: int, old: int, new: int):
+        """Follow one change already written to the interaction store."""
+        change = new - old
+        if not change or self._counts is None:
+            return
+        if col >= len(self._sq_norms):
+            grown = np.zeros(max(col + 1, 2 * len(self._sq_norms)))
+            grown[:len(self._sq_norms)] = self._sq_norms
+            self._sq_norms = grown
+        self._sq_norms[col] += new * new - old * old
+
+        cols, signals = self.interactions.row(row)
+        for other, signal in zip(cols.tolist(), signals.tolist()):
+            if other != col:
+                key = (col, other) if col < other else (other, col)
+                self._pending[key] = self._pending.get(key, 0) + change * signal
+
+    def swap_columns(self, a: int, b: int):
+        """Follow InteractionMatrix.swap_movies(a, b), permuting the counts and the table, O(nnz)."""
+        n = max(len(self._sq_norms), a + 1, b + 1)
+        order = np.arange(n)
+        order[[a, b]] = order[[b, a]]
+        sq_norms = np.zeros(n)
+        sq_norms[:len(self._sq_norms)] = self._sq_norms
+        self._sq_norms = sq_norms[order]
+        self._counts = _permuted(self._counts, order)
+        self.similar = _permuted(self.similar, order)
+        self._pending = {
+            tuple(sorted((int(order[i]), int(order[j])))): change for (i, j), change in self._pending.items()
+        }
+
+    def snapshot(self) -> Tuple[sp.csr_matrix, np.ndarray, Dict[Tuple[int, int], float]]:
+        """Counts, rating counts and pending changes to refresh from; call under the owner's read lock."""
+        return self._counts, self._sq_norms.copy(), dict(self._pending)
+
+    def recount_snapshot(self) -> Tuple[sp.csr_matrix, np.ndarray, Dict[Tuple[int, int], float]]:
+        """Interaction matrix, rating counts and pending changes to recount from; call under the owner's read lock."""
+        return self.interactions.csr(), self._sq_norms.copy(), dict(self._pending)
+
+    def recount(self, matrix: sp.csr_matrix, sq_norms: np.ndarray, pending: Dict[Tuple[int, int], float]) -> Refresh:
+        """
+        Count every pair of a snapshot of the interaction matrix and compute the table.
+
+        Touches no shared state, so it can run without the owner's lock.
+        The counts include the pending changes made before the snapshot.
+        """
+        signals = matrix.astype(np.float64)
+        counts = (signals.T @ signals).tocsr()
+        counts.setdiag(0)
+        counts.eliminate_zeros()
+        n = max(len(sq_norms), counts.shape[0])
+        counts.resize(n, n)
+        return counts, self._similar_items(counts, sq_norms), pending
+
+    def refresh(self, counts: sp.csr_matrix, sq_norms: np.ndarray, pending: Dict[Tuple[int, int], float]) -> Refresh:
+        """
+        Merge pending changes into the counts and recompute the table.
+
+        Touches no shared state, so it can run without the owner's lock.
+        """
+        n = max(len(sq_norms), counts.shape[0])
+        counts = counts.copy()
+        counts.resize(n, n)
+        if pending:
+            pairs = np.array(list(pending), dtype=np.int64).reshape(-1, 2)
+            changes = np.fromiter(pending.values(), dtype=np.float64, count=len(pending))
+            delta = sp.csr_matrix(
+                (np.concatenate([changes, changes]),
+                 (np.concatenate([pairs[:, 0], pairs[:, 1]]), np.concatenate([pairs[:, 1], pairs[:, 0]]))),
+                shape=(n, n)
+            )
+            counts = (counts + delta).tocsr()
+            counts.eliminate_zeros()
+        return counts, self._similar_items(counts, sq_norms), pending
+
+    def install(self, refreshed: Refresh):
+        """Switch to refreshed or recounted counts and table; call under the owner's write lock."""
+        counts, similar, merged = refreshed
+        self._counts = counts
+        self.similar = similar
+        self.counted = True
+        # Changes made while refreshing stay pending for the next refresh
+        for key, change in merged.items():
+            remaining = self._pending.get(key, 0) - change
+            if remaining:
+                self._pending[key] = remaining
+            else:
+                self._pending.pop(key, None)
+
+    def get_recommendations(
+        self,
+        user_id: str,
+        liked_movies: List[int],
+        disliked_movies: List[int],
+        limit: int = 10
+    ) -> List[int]:
+        """Neighbours of the user's liked movies (minus those of disliked ones), best first."""
+        row = self.interactions.user_index.get(user_id)
+        if row is None:
+            return self._get_top_rated_movies(limit, liked_movies + disliked_movies)
+
+        with span("scoring"):
+            cols, signals = self.interactions.row(row)
+            profile = sp.csr_matrix(
+                (signals.astype(np.float32), (np.zeros(len(cols), dtype=np.int64), cols)),
+                shape=(1, self.interactions.n_movies)
+            )
+            scores = self._scores(profile)
+
+        with span("top_k"):
+            top = self._top(scores.indices, scores.data, cols, limit)
+        if not top:
+            return self._get_top_rated_movies(limit, liked_movies + disliked_movies)
+        return top
+
+    def get_recommendations_batch(
+        self,
+        user_ids: List[str],
+        liked_lists: List[List[int]],
+        disliked_lists: List[List[int]],
+        limit: int = 10
+    ) -> List[List[int]]:
+        """Recommendations for many users from one sparse (users x movies) @ (movies x movies) product."""
+        results = [None] * len(user_ids)
+        known = [i for i, user_id in enumerate(user_ids) if user_id in self.interactions.user_index]
+        if known:
+            rows = np.array([self.interactions.user_index[user_ids[i]] for i in known])
+            with span("scoring"):
+                profiles = self.interactions.submatrix(rows).astype(np.float32)
+                scores = self._scores(profiles)
+
+            with span("top_k"):
+                for i, position in enumerate(known):
+                    start, end = scores.indptr[i], scores.indptr[i + 1]
+                    rated = profiles.indices[profiles.indptr[i]:profiles.indptr[i + 1]]
+                    results[position] = self._top(scores.indices[start:end], scores.data[start:end], rated, limit)
+
+        for position, recommendations in enumerate(results):
+            if not recommendations:
+                results[position] = self._get_top_rated_movies(
+                    limit, liked_lists[position] + disliked_lists[position]
+                )
+        return results
+
+    def _scores(self, profiles: sp.csr_matrix) -> sp.csr_matrix:
+        """Sparse scores: signed profile rows times the similar-items table (new columns have no neighbours)."""
+        similar = self.similar
+        n = min(profiles.shape[1], similar.shape[0])
+        scores = (profiles[:, :n] @ similar[:n]).tocsr()
+        scores.sort_indices()
+        return scores
+
+    def _top(self, cols: np.ndarray, scores: np.ndarray, rated: np.ndarray, limit: int) -> List[int]:
+        """Best positively scored unrated catalogue movies among sparse (ascending column) scores."""
+        keep = (scores > 0) & (cols < len(self.catalog)) & ~np.isin(cols, rated)
+        cols, scores = cols[keep], scores[keep]
+        top = top_k_indices(scores, limit)
+        return self.catalog.ids[cols[top]].tolist()
+
+    def _similar_items(self, counts: sp.csr_matrix, sq_norms: np.ndarray) -> sp.csr_matrix:
+        """Top-k cosine similarities of every movie column."""
+        counts = counts.tocoo()
+        norms = np.sqrt(sq_norms)
+        denominator = norms[counts.row] * norms[counts.col]
+        cosine = np.divide(counts.data, denominator, out=np.zeros(len(counts.data)), where=denominator > 0)
+        similarities = sp.csr_matrix((cosine.astype(np.float32), (counts.row, counts.col)), shape=counts.shape)
+        return top_k_sparse_rows(similarities, self.n_similar)
+
+    def _get_top_rated_movies(self, limit: int, excluded_movies: List[int]) -> List[int]:
+        """Get the most popular movies as fallback recommendations."""
+        with span("fallback"):
+            return self.popularity.top(limit, excluded_movies)
+
+
+def _permuted(matrix: sp.csr_matrix, order: np.ndarray) -> sp.csr_matrix:
+    """Square matrix with rows and columns reordered by `order` (padded to its length)."""
+    matrix = matrix.tocsr(copy=True)
+    matrix.resize(len(order), len(order))
+    return matrix[order][:, order].tocsr()
@@ -0,0 +1,323 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import scipy.sparse as sp
+from ..catalog import MovieCatalog
+from ..metrics import span
+from .popularity import PopularityRanking
+from .interactions import InteractionMatrix
+from .topk import row_blocks, top_k_indices, top_k_rows
+
+# (user factors, item factors, update counter at the snapshot they were trained on)
+Factors = Tuple[np.ndarray, np.ndarray, int]
+
+
+class FactorizationRecommender:
+    """
+    Implicit-feedback matrix factorisation (ALS) over the like/dislike matrix.
+
+    Likes are positive preferences and dislikes negative ones, both with
+    confidence 1 + alpha; unrated movies are weak negatives with confidence 1
+    (Hu, Koren & Volinsky). Training alternates user and item solves, each a
+    few conjugate-gradient steps run for every row at once with sparse and
+    dense matrix products, warm-started from the previous factors.
+
+    Scoring a user is one k-dimensional dot product per movie, independent
+    of the number of users. A preference change refits that user's vector in
+    closed form against the current item factors (fold-in); the item factors
+    only move when DataService retrains in the background.
+    """
+
+    def __init__(
+        self,
+        factors: int = 32,
+        regularization: float = 0.1,
+        alpha: float = 10.0,
+        iterations: int = 10,
+        cg_steps: int = 3,
+        seed: int = 0,
+        interactions: Optional[InteractionMatrix] = None
+    ):
+        """
+        Args:
+            factors: Latent dimensions (k)
+            regularization: L2 penalty on every factor vector
+            alpha: Extra confidence of a rated movie over an unrated one
+            iterations: Alternating user/item sweeps per training
+            cg_steps: Conjugate-gradient steps per solve
+            seed: Seed for initialising factors
+            interactions: Shared interaction store; the owner writes to it, this only reads
+        """
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.cg_steps = cg_steps
+        self.seed = seed
+        self.catalog: MovieCatalog = None
+        self.popularity: PopularityRanking = None
+        self.interactions = interactions if interactions is not None else InteractionMatrix()
+        self.item_factors: Optional[np.ndarray] = None  # movie column -> vector (float32)
+        self.user_factors = np.zeros((0, factors), dtype=np.float32)  # user row -> vector, as trained
+        self._gram: Optional[np.ndarray] = None  # Y^T Y + regularization * I
+        self._folded: Dict[int, np.ndarray] = {}  # user row -> vector refitted since training
+        self._updated: Dict[int, int] = {}  # user row -> update counter of its last change
+        self._updates = 0
+
+    def fit(self, catalog: MovieCatalog, popularity: PopularityRanking = None):
+        """Attach the catalogue; factors come from train/install once there are interactions."""
+        self.catalog = catalog
+        self.popularity = popularity or PopularityRanking(catalog)
+        for movie_id in catalog.ids.tolist():
+            self.interactions.add_movie(movie_id)
+
+    @property
+    def trained(self) -> bool:
+        return self.item_factors is not None
+
+    @property
+    def changes_since_training(self) -> int:
+        return len(self._updated)
+
+    def state_arrays(self) -> Dict[str, np.ndarray]:
+        """Item factors as flat arrays; user vectors are folded in again from the interactions."""
+        if self.item_factors is None:
+            return {"factorization.item_factors": np.zeros((0, self.factors), dtype=np.float32)}
+        return {"factorization.item_factors": self.item_factors}
+
+    def load_state(self, arrays: Dict[str, np.ndarray]):
+        """Adopt published item factors; every user vector is then folded in on demand."""
+        item_factors = arrays["factorization.item_factors"]
+        self.user_factors = np.zeros((0, self.factors), dtype=np.float32)
+        self._folded.clear()
+        self._updated.clear()
+        if len(item_factors):
+            self._set_item_factors(item_factors)
+        else:
+            self.item_factors, self._gram = None, None
+
+    def update(self, row: int, col: int, old: int, new: int):
+        """Follow one change already written to the interaction store: refit the user in closed form."""
+        self._updates += 1
+        self._updated[row] = self._updates
+        if self.item_factors is not None:
+            self._folded[row] = self._fold_in(row)
+
+    def swap_columns(self, a: int, b: int):
+        """Follow InteractionMatrix.swap_movies(a, b): the two movies keep their item factors."""
+        if self.item_factors is None:
+            return
+        n = max(len(self.item_factors), a + 1, b + 1)
+        item_factors = np.zeros((n, self.factors), dtype=np.float32)
+        item_factors[:len(self.item_factors)] = self.item_factors
+        item_factors[[a, b]] = item_factors[[b, a]]
+        self._set_item_factors(item_factors)
+
+    def snapshot(self) -> Tuple[sp.csr_matrix, int]:
+        """The interaction matrix and update counter to train on; call under the owner's read lock."""
+        return self.interactions.csr(), self._updates
+
+    def train(self, matrix: sp.csr_matrix, marker: int = 0) -> Factors:
+        """
+        ALS factors for a snapshot of the interaction matrix.
+
+        Touches no shared state, so it can run without the owner's lock.
+        Rows and columns that existed at the last training start from their
+        previous factors.
+        """
+        n_users, n_items = matrix.shape
+        rng = np.random.default_rng(self.seed)
+        users = self._warm_start(self.user_factors, n_users, rng)
+        items = self._warm_start(self.item_factors, n_items, rng)
+
+        signals = matrix.astype(np.float64)
+        signals.eliminate_zeros()
+        # Confidence above the unrated baseline, and confidence x preference (likes only)
+        weights = abs(signals) * self.alpha
+        targets = (signals > 0).astype(np.float64) * (1 + self.alpha)
+        weights_t, targets_t = weights.T.tocsr(), targets.T.tocsr()
+
+        for _ in range(self.iterations):
+            users = _conjugate_gradient(users, items, weights, targets, self.regularization, self.cg_steps)
+            items = _conjugate_gradient(items, users, weights_t, targets_t, self.regularization, self.cg_steps)
+        return users.astype(np.float32), items.astype(np.float32), marker
+
+    def install(self, factors: Factors):
+        """
+        Switch to trained factors; call under the owner's write lock.
+
+        Users whose preferences changed after the training snapshot are
+        folded in again against the new item factors.
+        """
+        user_factors, item_factors, marker = factors
+        self.user_factors = user_factors
+        self._set_item_factors(item_factors)
+        self._folded.clear()
+        self._updated = {row: update for row, update in self._updated.items() if update > marker}
+        for row in self._updated:
+            self._folded[row] = self._fold_in(row)
+
+    def rebuild(self):
+        """Train synchronously on the current interactions (after a bulk load of the store)."""
+        self.install(self.train(*self.snapshot()))
+
+    def get_recommendations(
+        self,
+        user_id: str,
+        liked_movies: List[int],
+        disliked_movies: List[int],
+        limit: int = 10
+    ) -> List[int]:
+        """Catalogue movies with the highest predicted preference, excluding rated ones."""
+        row = self.interactions.user_index.get(user_id)
+        vector = None if row is None or self.item_factors is None else self._user_vector(row)
+        if vector is None or not vector.any():
+            return self._get_top_rated_movies(limit, liked_movies + disliked_movies)
+
+        with span("scoring"):
+            scores = self._catalog_factors() @ vector
+            rated = self.interactions.row(row)[0]
+            scores[rated[rated < len(scores)]] = -np.inf
+
+        with span("top_k"):
+            top = top_k_indices(scores, limit)
+            top = top[np.isfinite(scores[top])]
+        if not len(top):
+            return self._get_top_rated_movies(limit, liked_movies + disliked_movies)
+        return self.catalog.ids[top].tolist()
+
+    def get_recommendations_batch(
+        self,
+        user_ids: List[str],
+        liked_lists: List[List[int]],
+        disliked_lists: List[List[int]],
+        limit: int = 10
+    ) -> List[List[int]]:
+        """Recommendations for many users: one (users x k) @ (k x movies) product per block."""
+        results = [None] * len(user_ids)
+        known = [i for i, user_id in enumerate(user_ids) if user_id in self.interactions.user_index]
+        if self.item_factors is None:
+            known = []
+        items = self._catalog_factors() if known else None
+
+        for block in row_blocks(len(known), len(self.catalog)):
+            positions = known[block]
+            rows = np.array([self.interactions.user_index[user_ids[i]] for i in positions])
+
+            with span("scoring"):
+                vectors = np.stack([self._user_vector(row) for row in rows.tolist()])
+                scores = vectors @ items.T
+                rated = self.interactions.submatrix(rows)[:, :len(self.catalog)].tocoo()
+                scores[rated.row, rated.col] = -np.inf
+
+            with span("top_k"):
+                tops = top_k_rows(scores, limit)
+            for position, vector, top in zip(positions, vectors, tops):
+                if len(top) and vector.any():
+                    results[position] = self.catalog.ids[top].tolist()
+
+        for position, recommendations in enumerate(results):
+            if recommendations is None:
+                results[position] = self._get_top_rated_movies(
+                    limit, liked_lists[position] + disliked_lists[position]
+                )
+        return results
+
+    def _user_vector(self, row: int) -> np.ndarray:
+        """A user's latent vector: refitted since training, as trained, or folded in now."""
+        vector = self._folded.get(row)
+        if vector is not None:
+            return vector
+        if row < len(self.user_factors):
+            return self.user_factors[row]
+        vector = self._fold_in(row)
+        self._folded[row] = vector
+        return vector
+
+    def _fold_in(self, row: int) -> np.ndarray:
+        """
+        Exact least-squares user vector for fixed item factors:
+        (Y^T Y + Y^T (C_u - I) Y + lambda I)^-1 Y^T C_u p_u, built from the
+        user's rated movies only.
+        """
+        cols, vals = self.interactions.row(row)
+        known = cols < len(self.item_factors)
+        cols, vals = cols[known], vals[known].astype(np.float64)
+        if not len(cols):
+            return np.zeros(self.factors, dtype=np.float32)
+        rated = self.item_factors[cols].astype(np.float64)
+        weights = self.alpha * np.abs(vals)
+        system = self._gram + (rated.T * weights) @ rated
+        target = ((vals > 0) * (1 + self.alpha)) @ rated
+        return np.linalg.solve(system, target).astype(np.float32)
+
+    def _set_item_factors(self, item_factors: np.ndarray):
+        self.item_factors = item_factors
+        y = item_factors.astype(np.float64)
+        self._gram = y.T @ y + self.regularization * np.eye(self.factors)
+
+    def _catalog_factors(self) -> np.ndarray:
+        """Item factors of the catalogue columns (the first ones, see fit); new columns score 0."""
+        n = len(self.catalog)
+        if len(self.item_factors) >= n:
+            return self.item_factors[:n]
+        padded = np.zeros((n, self.factors), dtype=np.float32)
+        padded[:len(self.item_factors)] = self.item_factors
+        return padded
+
+    def _warm_start(self, previous: Optional[np.ndarray], n: int, rng: np.random.Generator) -> np.ndarray:
+        """n x k starting factors: previous rows where they exist, small random values for the rest."""
+        start = rng.normal(scale=0.01, size=(n, self.factors))
+        if previous is not None and len(previous):
+            kept = min(n, len(previous))
+            start[:kept] = previous[:kept]
+        return start
+
+    def _get_top_rated_movies(self, limit: int, excluded_movies: List[int]) -> List[int]:
+        """Get the most popular movies as fallback recommendations."""
+        with span("fallback"):
+            return self.popularity.top(limit, excluded_movies)
+
+
+def _conjugate_gradient(
+    x: np.ndarray,
+    y: np.ndarray,
+    weights: sp.csr_matrix,
+    targets: sp.csr_matrix,
+    regularization: float,
+    steps: int,
+    max_cells: int = 1 << 22
+) -> np.ndarray:
+    """
+    A few CG steps on every row's ALS normal equations at once:
+    (Y^T Y + Y^T W_u Y + lambda I) x_u = Y^T t_u for each row u of `weights`.
+
+    The per-row matrices are never formed: applying them needs Y^T Y, and
+    W_u Y only at the row's nonzeros, i.e. one dot product per interaction.
+    """
+    gram = y.T @ y + regularization * np.eye(y.shape[1])
+    rows = np.repeat(np.arange(weights.shape[0]), np.diff(weights.indptr))
+    cols = weights.indices
+    step = max(1, max_cells // y.shape[1])
+
+    def apply(v: np.ndarray) -> np.ndarray:
+        dots = np.empty(len(cols))
+        for start in range(0, len(cols), step):
+            end = start + step
+            dots[start:end] = np.einsum('ij,ij->i', v[rows[start:end]], y[cols[start:end]])
+        dots *= weights.data
+        return v @ gram + sp.csr_matrix((dots, cols, weights.indptr), shape=weights.shape) @ y
+
+    residual = targets @ y - apply(x)
+    direction = residual.copy()
+    norms = np.einsum('ij,ij->i', residual, residual)
+    for _ in range(steps):
+        applied = apply(direction)
+        curvature = np.einsum('ij,ij->i', direction, applied)
+        alpha = np.divide(norms, curvature, out=np.zeros_like(norms), where=curvature > 0)
+        x += alpha[:, None] * direction
+        residual -= alpha[:, None] * applied
+        new_norms = np.einsum('ij,ij->i', residual, residual)
+        beta = np.divide(new_norms, norms, out=np.zeros_like(norms), where=norms > 0)
+        direction = residual + beta[:, None] * direction
+        norms = new_norms
+    return x
@@ -1,257 +1,487 @@
 import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import List, Dict
-from ..models import Movie
+from typing import List, Dict, Optional, Tuple, Union
+from ..artifacts import csr_from_arrays, csr_to_arrays, vectorizer_from_arrays, vectorizer_to_arrays
+from ..cache import SimilarityCache
+from ..catalog import MovieCatalog
+from ..metrics import span
+from .popularity import PopularityRanking
+from .interactions import InteractionMatrix
+from .neighbors import NeighborIndex, make_neighbor_index
+from .sparse_rows import GrowableCSR
+from .topk import row_blocks, top_k_indices, top_k_rows
 
 
 class HybridRecommender:
-    def __init__(self, content_weight=0.6, collaborative_weight=0.4):
+    tfidf_params = {'max_features': 1000, 'stop_words': 'english', 'ngram_range': (1, 2)}
+
+    def __init__(
+        self,
+        content_weight=0.6,
+        collaborative_weight=0.4,
+        neighbor_index: Union[str, NeighborIndex] = "lsh",
+        interactions: Optional[InteractionMatrix] = None,
+        similarity_cache_size: int = 10000,
+        similarity_cache_bytes: int = 32 * 2**20,
+        similarity_max_age: float = 5.0
+    ):
         """
         Initialize hybrid recommender with configurable weights.
         
         Args:
             content_weight: Weight for content-based recommendations (0-1)
             collaborative_weight: Weight for collaborative recommendations (0-1)
+            neighbor_index: Candidate search for similar users ("lsh", "exact")
+                or a shared index over `interactions`
+            interactions: Shared interaction store; the owner writes to it, this only reads
+            similarity_cache_size: Users whose neighbour lists are cached at most
+            similarity_cache_bytes: Memory the cached neighbour lists may use at most
+            similarity_max_age: Seconds a cached neighbour list is used before
+                it is recomputed, bounding staleness no invalidation catches
         """
         self.content_weight = content_weight
         self.collaborative_weight = collaborative_weight
-        self.movies = []
+        self.catalog: MovieCatalog = None
+        self.popularity: PopularityRanking = None
         self.tfidf_matrix = None
         self.tfidf_vectorizer = None
-        self.user_movie_matrix = {}
-        self.user_similarities = {}
+        self._tfidf_rows: GrowableCSR = None
+        self.interactions = interactions if interactions is not None else InteractionMatrix()
+        if isinstance(neighbor_index, str):
+            neighbor_index = make_neighbor_index(self.interactions, neighbor_index)
+        self.neighbors = neighbor_index
+        self.user_similarities = SimilarityCache(
+            similarity_cache_size, similarity_cache_bytes, max_age=similarity_max_age
+        )
+        self.user_profiles: Dict[str, sp.csr_matrix] = {}
         self._fitted = False
     
-    def fit(self, movies: List[Movie]):
+    def fit(self, catalog: MovieCatalog, popularity: PopularityRanking = None):
         """Fit the hybrid recommender with movie data."""
-        self.movies = movies
+        self.catalog = catalog
+        self.popularity = popularity or PopularityRanking(catalog)
+        for movie_id in catalog.ids.tolist():
+            self.interactions.add_movie(movie_id)
         self._fit_content_based()
         self._fitted = True
     
+    def state_arrays(self) -> Dict[str, np.ndarray]:
+        """Fitted content component as flat arrays for ModelArtifacts."""
+        return {
+            **vectorizer_to_arrays("hybrid.vectorizer", self.tfidf_vectorizer),
+            **csr_to_arrays("hybrid.tfidf", self.tfidf_matrix),
+        }
+    
+    def load_state(self, catalog: MovieCatalog, popularity: PopularityRanking, arrays: Dict[str, np.ndarray]):
+        """Restore a fitted model from state_arrays output instead of calling fit."""
+        self.catalog = catalog
+        self.popularity = popularity
+        for movie_id in catalog.ids.tolist():
+            self.interactions.add_movie(movie_id)
+        self.install((
+            vectorizer_from_arrays(arrays, "hybrid.vectorizer", **self.tfidf_params),
+            csr_from_arrays(arrays, "hybrid.tfidf")
+        ))
+        self._fitted = True
+    
     def _fit_content_based(self):
         """Fit the content-based component."""
         # Create feature text for each movie
-        movie_features = []
-        for movie in self.movies:
-            features = f"{movie.title} {movie.genre} {movie.director} {movie.description}"
-            movie_features.append(features)
-        
-        # Create TF-IDF matrix
-        self.tfidf_vectorizer = TfidfVectorizer(
-            max_features=1000,
-            stop_words='english',
-            ngram_range=(1, 2)
-        )
-        self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(movie_features)
+        self.install(self.train(self.catalog.feature_text(include_title=True)))
     
-    def update_user_preferences(self, user_id: str, movie_id: int, liked: bool):
-        """Update user preferences for collaborative filtering."""
-        if user_id not in self.user_movie_matrix:
-            self.user_movie_matrix[user_id] = {}
-        
-        self.user_movie_matrix[user_id][movie_id] = 1 if liked else -1
-        
-        # Clear cached similarities for this user
-        if user_id in self.user_similarities:
-            del self.user_similarities[user_id]
+    def train(self, movie_features: List[str]) -> Tuple[TfidfVectorizer, sp.csr_matrix]:
+        """Fit a vectoriser on per-movie feature texts; touches no shared state."""
+        vectorizer = TfidfVectorizer(**self.tfidf_params)
+        return vectorizer, vectorizer.fit_transform(movie_features)
     
-    def _get_content_based_scores(self, liked_movies: List[int], disliked_movies: List[int]) -> Dict[int, float]:
-        """Get content-based recommendation scores."""
-        if not liked_movies and not disliked_movies:
-            return {movie.id: 0.0 for movie in self.movies}
-        
-        # Create user profile vector
-        user_profile = np.zeros(self.tfidf_matrix.shape[1])
+    def install(self, model: Tuple[TfidfVectorizer, sp.csr_matrix]):
+        """Switch to a trained content component; profiles then need rebuild_profiles."""
+        self.tfidf_vectorizer, self.tfidf_matrix = model
+        self._tfidf_rows = GrowableCSR(self.tfidf_matrix)
+    
+    def upsert(self, row: int):
+        """
+        Index the movie at a new or changed catalogue row in the fitted
+        feature space, and move the profiles of users who rated it by the
+        change in its TF-IDF row.
+        """
+        old_vector = self.tfidf_matrix[row] if row < self.tfidf_matrix.shape[0] else None
+        vector = self.tfidf_vectorizer.transform(self.catalog.feature_text(include_title=True, rows=[row]))
+        self._tfidf_rows.set_row(row, vector)
+        self.tfidf_matrix = self._tfidf_rows.matrix
         
-        # Add liked movies to profile
-        for movie_id in liked_movies:
-            movie_idx = next(i for i, movie in enumerate(self.movies) if movie.id == movie_id)
-            user_profile += self.tfidf_matrix[movie_idx].toarray().flatten()
+        col = self.interactions.movie_index.get(int(self.catalog.ids[row]))
+        if col is None:
+            return
+        delta = vector if old_vector is None else vector - old_vector
+        user_rows, signals = self.interactions.column(col)
+        for user_row, signal in zip(user_rows.tolist(), signals.tolist()):
+            user_id = self.interactions.user_ids[user_row]
+            profile = self.user_profiles.get(user_id)
+            if profile is not None:
+                self.user_profiles[user_id] = profile + signal * delta
+    
+    def observe_preference(self, user_id: str, movie_id: int, old: int, new: int):
+        """
+        Follow one change already written to the interaction store.
         
-        # Subtract disliked movies from profile
-        for movie_id in disliked_movies:
-            movie_idx = next(i for i, movie in enumerate(self.movies) if movie.id == movie_id)
-            user_profile -= self.tfidf_matrix[movie_idx].toarray().flatten()
+        Args:
+            old: Previous signal (1, -1 or 0 if unrated)
+            new: New signal (1 or -1)
+        """
+        # Fold the change into the user's TF-IDF profile
+        movie_idx = self.catalog.row_of(movie_id)
+        if movie_idx is not None and new != old:
+            delta = (new - old) * self.tfidf_matrix[movie_idx]
+            profile = self.user_profiles.get(user_id)
+            self.user_profiles[user_id] = delta if profile is None else profile + delta
         
-        # Normalize profile
-        if np.linalg.norm(user_profile) > 0:
-            user_profile = user_profile / np.linalg.norm(user_profile)
+        # Drop the cached neighbours of this user and of everyone who lists them
+        self.user_similarities.invalidate(user_id)
+    
+    def rebuild_profiles(self):
+        """Recompute every user's profile and drop cached similarities after a bulk load of the store."""
+        # Every user's profile in one product: signals x TF-IDF rows. The
+        # first columns are the catalogue rows (see fit); later columns are
+        # unknown movies, which have no features
+        matrix = self.interactions.csr()[:, :len(self.catalog)].astype(np.float64)
+        profiles = (matrix @ self.tfidf_matrix).tocsr()
+        for user_id, row in self.interactions.user_index.items():
+            self.user_profiles[user_id] = profiles[row]
+        self.user_similarities.clear()
+    
+    def _user_profile(self, user_id: str, liked_movies: List[int], disliked_movies: List[int]) -> sp.csr_matrix:
+        """
+        Sparse 1 x vocabulary profile: sum of liked minus disliked TF-IDF rows.
         
-        # Calculate similarities with all movies
-        similarities = cosine_similarity([user_profile], self.tfidf_matrix.toarray())[0]
+        Uses the profile folded in by observe_preference when there is
+        one, otherwise builds it from the given lists.
+        """
+        profile = self.user_profiles.get(user_id)
+        if profile is not None:
+            return profile
         
-        # Convert to dictionary
-        scores = {}
-        for i, movie in enumerate(self.movies):
-            if movie.id not in liked_movies and movie.id not in disliked_movies:
-                scores[movie.id] = float(similarities[i])
-            else:
-                scores[movie.id] = -1.0  # Exclude already rated movies
+        liked_rows = self.catalog.rows_for(liked_movies)
+        disliked_rows = self.catalog.rows_for(disliked_movies)
+        rows = np.concatenate([liked_rows, disliked_rows])
+        signs = np.concatenate([np.ones(len(liked_rows)), -np.ones(len(disliked_rows))])
+        return sp.csr_matrix(signs) @ self.tfidf_matrix[rows]
+    
+    def _get_content_based_scores(self, liked_movies: List[int], disliked_movies: List[int], user_id: str = None) -> np.ndarray:
+        """Content-based scores for every catalogue row; rated movies score -1."""
+        if not liked_movies and not disliked_movies:
+            return np.zeros(len(self.catalog))
         
+        with span("scoring"):
+            user_profile = self._user_profile(user_id, liked_movies, disliked_movies)
+            
+            # Cosine similarity with all movies in one sparse mat-vec; TF-IDF rows
+            # are L2-normalised, so only the profile norm needs dividing out
+            norm = sp.linalg.norm(user_profile)
+            scores = (self.tfidf_matrix @ user_profile.T).toarray().ravel()
+            if norm > 0:
+                scores /= norm
+            
+            scores[self.catalog.rows_for(liked_movies + disliked_movies)] = -1.0  # Exclude already rated movies
         return scores
     
-    def _get_collaborative_scores(self, user_id: str, liked_movies: List[int], disliked_movies: List[int]) -> Dict[int, float]:
-        """Get collaborative filtering recommendation scores."""
-        if user_id not in self.user_movie_matrix or len(self.user_movie_matrix) < 2:
-            return {movie.id: 0.0 for movie in self.movies}
+    def _get_collaborative_scores(self, user_id: str, liked_movies: List[int], disliked_movies: List[int]) -> np.ndarray:
+        """Collaborative scores for every catalogue row; rated movies score -1."""
+        scores = np.zeros(len(self.catalog))
+        if user_id not in self.interactions.user_index or self.interactions.n_users < 2:
+            return scores
         
         # Find similar users
-        similar_users = self._find_similar_users(user_id)
+        with span("candidates"):
+            similar_users = self._find_similar_users(user_id)
         
         if not similar_users:
-            return {movie.id: 0.0 for movie in self.movies}
-        
-        # Calculate predicted ratings
-        scores = {}
-        for movie in self.movies:
-            if movie.id in liked_movies or movie.id in disliked_movies:
-                scores[movie.id] = -1.0  # Exclude already rated movies
-                continue
-            
-            # Calculate weighted average rating from similar users
-            numerator = 0
-            denominator = 0
-            
-            for sim_user_id, similarity in similar_users:
-                if movie.id in self.user_movie_matrix[sim_user_id]:
-                    rating = self.user_movie_matrix[sim_user_id][movie.id]
-                    numerator += similarity * rating
-                    denominator += abs(similarity)
-            
-            if denominator > 0:
-                scores[movie.id] = numerator / denominator
-            else:
-                scores[movie.id] = 0.0
+            return scores
         
+        # Weighted average of the neighbours' ratings: one sparse mat-vec for the
+        # numerator and one over |ratings| for the normaliser
+        with span("scoring"):
+            rows = [self.interactions.user_index[sim_user_id] for sim_user_id, _ in similar_users]
+            similarities = np.array([similarity for _, similarity in similar_users])
+            ratings = self.interactions.submatrix(rows)[:, :len(self.catalog)].astype(np.float64)
+            numerator = ratings.T @ similarities
+            denominator = abs(ratings).T @ np.abs(similarities)
+            np.divide(numerator, denominator, out=scores, where=denominator > 0)
+            
+            scores[self.catalog.rows_for(liked_movies + disliked_movies)] = -1.0  # Exclude already rated movies
         return scores
     
-    def _find_similar_users(self, user_id: str) -> List[tuple]:
+    def _rating(self, user_id: str, movie_id: int) -> int:
+        """A user's rating of a movie: 1 (like), -1 (dislike) or 0 (unrated)."""
+        row = self.interactions.user_index.get(user_id)
+        col = self.interactions.movie_index.get(movie_id)
+        if row is None or col is None:
+            return 0
+        return self.interactions.get(row, col)
+    
+    def _find_similar_users(self, user_id: str, exact: bool = False) -> List[tuple]:
         """Find users similar to the given user."""
-        if user_id in self.user_similarities:
-            return self.user_similarities[user_id]
+        cached = self.user_similarities.get(user_id)
+        if cached is not None:
+            return cached
         
-        if user_id not in self.user_movie_matrix:
+        row = self.interactions.user_index.get(user_id)
+        if row is None:
             return []
         
-        user_profile = self.user_movie_matrix[user_id]
-        similarities = []
+        # Candidate users from the neighbour index (None means everyone)
+        candidates = self.neighbors.candidates(row, opposite=True, exact=exact)
+        if candidates is None:
+            candidates = np.arange(self.interactions.n_users)
+        candidates = np.sort(candidates[candidates != row])
         
-        for other_user_id, other_profile in self.user_movie_matrix.items():
-            if other_user_id == user_id:
-                continue
-            
-            # Calculate Pearson correlation
-            common_movies = set(user_profile.keys()) & set(other_profile.keys())
-            if len(common_movies) < 2:
-                continue
-            
-            # Calculate correlation
-            user_ratings = [user_profile[movie_id] for movie_id in common_movies]
-            other_ratings = [other_profile[movie_id] for movie_id in common_movies]
-            
-            correlation = np.corrcoef(user_ratings, other_ratings)[0, 1]
-            if not np.isnan(correlation):
-                similarities.append((other_user_id, correlation))
+        correlations = self._pearson(row, candidates)
+        valid = ~np.isnan(correlations)
+        candidates, correlations = candidates[valid], correlations[valid]
         
         # Sort by similarity and take top 10
-        similarities.sort(key=lambda x: abs(x[1]), reverse=True)
-        similarities = similarities[:10]
+        top = top_k_indices(np.abs(correlations), 10)
+        similarities = [
+            (self.interactions.user_ids[other], float(correlation))
+            for other, correlation in zip(candidates[top].tolist(), correlations[top].tolist())
+        ]
         
-        self.user_similarities[user_id] = similarities
+        self.user_similarities.put(user_id, similarities)
         return similarities
     
+    def _pearson(self, row: int, candidates: np.ndarray) -> np.ndarray:
+        """
+        Pearson correlation between one user and each candidate over their
+        commonly rated movies; NaN where fewer than 2 movies are shared or a
+        rating vector is constant.
+        """
+        target = self.interactions.row_vector(row)
+        rated = (target != 0).astype(np.float64)
+        
+        # Ratings are +/-1, so sum(x^2) and sum(y^2) both equal the overlap size
+        n = self.interactions.matvec(rated, candidates, absolute=True)
+        sum_x = self.interactions.matvec(rated, candidates)
+        sum_y = self.interactions.matvec(target, candidates, absolute=True)
+        sum_xy = self.interactions.matvec(target, candidates)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlations = (n * sum_xy - sum_x * sum_y) / np.sqrt((n * n - sum_x * sum_x) * (n * n - sum_y * sum_y))
+        correlations[n < 2] = np.nan
+        correlations[~np.isfinite(correlations)] = np.nan
+        return correlations
+    
     def get_recommendations(self, user_id: str, liked_movies: List[int], disliked_movies: List[int], limit: int = 10) -> List[int]:
         """Get hybrid recommendations combining content-based and collaborative filtering."""
         if not self._fitted:
             raise ValueError("Recommender must be fitted before getting recommendations")
         
+        if not liked_movies and not disliked_movies:
+            # Cold start: nothing to score against, fall back to popularity
+            with span("fallback"):
+                return self.popularity.top(limit)
+        
         # Get scores from both methods
-        content_scores = self._get_content_based_scores(liked_movies, disliked_movies)
+        content_scores = self._get_content_based_scores(liked_movies, disliked_movies, user_id)
         collaborative_scores = self._get_collaborative_scores(user_id, liked_movies, disliked_movies)
         
         # Combine scores with weights
-        combined_scores = {}
-        for movie_id in content_scores:
-            if movie_id in collaborative_scores:
-                combined_score = (
-                    self.content_weight * content_scores[movie_id] +
-                    self.collaborative_weight * collaborative_scores[movie_id]
-                )
-                combined_scores[movie_id] = combined_score
-        
-        # Sort by combined score and return top recommendations
-        sorted_movies = sorted(combined_scores.items(), key=lambda x: x[1], reverse=True)
-        recommended_ids = [movie_id for movie_id, score in sorted_movies[:limit]]
-        
-        return recommended_ids
+        with span("blending"):
+            combined_scores = (
+                self.content_weight * content_scores +
+                self.collaborative_weight * collaborative_scores
+            )
+        
+        # Top recommendations among movies the user has not rated yet
+        with span("top_k"):
+            candidates = np.ones(len(combined_scores), dtype=bool)
+            candidates[self.catalog.rows_for(liked_movies + disliked_movies)] = False
+            candidates = np.flatnonzero(candidates)
+            top = top_k_indices(combined_scores[candidates], limit)
+        
+        return self.catalog.ids[candidates[top]].tolist()
+    
+    def get_recommendations_batch(
+        self,
+        user_ids: List[str],
+        liked_lists: List[List[int]],
+        disliked_lists: List[List[int]],
+        limit: int = 10
+    ) -> List[List[int]]:
+        """
+        Hybrid recommendations for many users at once, equal to
+        get_recommendations for each.
+        
+        Content scores are one product of the stacked user profiles with the
+        TF-IDF matrix. Each user's neighbours come from _find_similar_users,
+        as for a single request (the similarity cache, then the neighbour
+        index), and the weighted neighbour averages of the whole block are
+        two more products against the interaction matrix.
+        """
+        if not self._fitted:
+            raise ValueError("Recommender must be fitted before getting recommendations")
+        
+        n_movies = len(self.catalog)
+        rated = self.catalog.indicator([l + d for l, d in zip(liked_lists, disliked_lists)])
+        profiles = sp.vstack([
+            self._user_profile(user_id, liked, disliked)
+            for user_id, liked, disliked in zip(user_ids, liked_lists, disliked_lists)
+        ]).tocsr() if user_ids else sp.csr_matrix((0, self.tfidf_matrix.shape[1]))
+        profile_norms = sp.linalg.norm(profiles, axis=1)
+        
+        matrix = self.interactions.csr().astype(np.float64)
+        indicator = abs(matrix)
+        user_rows = np.array([self.interactions.user_index.get(user_id, -1) for user_id in user_ids], dtype=np.intp)
+        use_collaborative = self.interactions.n_users >= 2
+        
+        results = []
+        for block in row_blocks(len(user_ids), max(n_movies, self.interactions.n_users)):
+            # Content-based: cosine of each profile with every movie
+            with span("scoring"):
+                content_scores = (profiles[block] @ self.tfidf_matrix.T).toarray()
+                norms = profile_norms[block][:, None]
+                np.divide(content_scores, norms, out=content_scores, where=norms > 0)
+            
+            collaborative_scores = np.zeros_like(content_scores)
+            rows = user_rows[block]
+            known = np.flatnonzero(rows >= 0) if use_collaborative else np.empty(0, dtype=np.intp)
+            if len(known):
+                users = [user_ids[block.start + offset] for offset in known.tolist()]
+                collaborative_scores[known] = self._collaborative_scores_block(users, matrix, indicator)[:, :n_movies]
+            
+            with span("blending"):
+                combined_scores = self.content_weight * content_scores + self.collaborative_weight * collaborative_scores
+                combined_scores[rated[block].nonzero()] = -np.inf
+            
+            with span("top_k"):
+                tops = top_k_rows(combined_scores, limit)
+            for offset, top in enumerate(tops):
+                user = block.start + offset
+                if liked_lists[user] or disliked_lists[user]:
+                    results.append(self.catalog.ids[top].tolist())
+                else:
+                    results.append(self.popularity.top(limit))
+        
+        return results
+    
+    def _collaborative_scores_block(self, user_ids: List[str], matrix: sp.csr_matrix, indicator: sp.csr_matrix) -> np.ndarray:
+        """Weighted neighbour ratings for a block of known users, over all interaction columns."""
+        with span("candidates"):
+            neighbors = [self._find_similar_users(user_id) for user_id in user_ids]
+            weight_rows = np.repeat(np.arange(len(user_ids)), [len(similar) for similar in neighbors])
+            weight_cols = [self.interactions.user_index[other] for similar in neighbors for other, _ in similar]
+            weights = sp.csr_matrix(
+                ([similarity for similar in neighbors for _, similarity in similar], (weight_rows, weight_cols)),
+                shape=(len(user_ids), matrix.shape[0])
+            )
+        
+        with span("scoring"):
+            numerator = (weights @ matrix).toarray()
+            denominator = (abs(weights) @ indicator).toarray()
+            scores = np.zeros_like(numerator)
+            np.divide(numerator, denominator, out=scores, where=denominator > 0)
+        return scores
     
     def get_recommendation_explanation(self, user_id: str, movie_id: int, liked_movies: List[int], disliked_movies: List[int]) -> Dict:
         """Get explanation for why a movie was recommended."""
+        explanations = self.explain(user_id, [movie_id], liked_movies, disliked_movies)
+        return explanations[0] if explanations else {}
+    
+    def explain(
+        self,
+        user_id: str,
+        movie_ids: List[int],
+        liked_movies: List[int],
+        disliked_movies: List[int],
+        n_reasons: int = 3
+    ) -> List[Dict]:
+        """
+        Why each movie scores as it does for a user, skipping movies not in the catalogue.
+        
+        Only the targets' own scores are computed: their TF-IDF rows dotted
+        with the user profile and with the liked movies' rows, and the
+        user's (cached) neighbours' ratings of just those columns. Equal to
+        the corresponding entries of the full content and collaborative score
+        vectors, at a cost independent of the catalogue size.
+        
+        Args:
+            n_reasons: Similar liked movies and similar users listed per movie
+        """
         if not self._fitted:
-            return {}
+            return []
         
-        movie = next((m for m in self.movies if m.id == movie_id), None)
-        if not movie:
-            return {}
+        movie_ids = [movie_id for movie_id in movie_ids if self.catalog.row_of(movie_id) is not None]
+        rows = self.catalog.rows_for(movie_ids)
+        targets = self.tfidf_matrix[rows]
+        rated = np.isin(rows, self.catalog.rows_for(liked_movies + disliked_movies))
         
-        content_scores = self._get_content_based_scores(liked_movies, disliked_movies)
-        collaborative_scores = self._get_collaborative_scores(user_id, liked_movies, disliked_movies)
+        # Content: cosine of each target with the user profile
+        content_scores = np.zeros(len(rows))
+        if liked_movies or disliked_movies:
+            profile = self._user_profile(user_id, liked_movies, disliked_movies)
+            norm = sp.linalg.norm(profile)
+            content_scores = (targets @ profile.T).toarray().ravel()
+            if norm > 0:
+                content_scores /= norm
+            content_scores[rated] = -1.0
         
-        content_score = content_scores.get(movie_id, 0)
-        collaborative_score = collaborative_scores.get(movie_id, 0)
+        # Collaborative: weighted average of the neighbours' ratings of the targets
+        collaborative_scores = np.zeros(len(rows))
+        neighbours = []
+        if user_id in self.interactions.user_index and self.interactions.n_users >= 2:
+            neighbours = self._find_similar_users(user_id)
+        if neighbours:
+            neighbour_rows = [self.interactions.user_index[neighbour] for neighbour, _ in neighbours]
+            similarities = np.array([similarity for _, similarity in neighbours])
+            # Catalogue rows are the first interaction columns (see fit)
+            ratings = self.interactions.submatrix(neighbour_rows)[:, rows].toarray().astype(np.float64)
+            numerator = similarities @ ratings
+            denominator = np.abs(similarities) @ np.abs(ratings)
+            np.divide(numerator, denominator, out=collaborative_scores, where=denominator > 0)
+            collaborative_scores[rated] = -1.0
+        else:
+            ratings = np.zeros((0, len(rows)))
         
-        # Find similar movies from user's liked movies
-        similar_liked_movies = []
-        if liked_movies:
-            movie_idx = next(i for i, m in enumerate(self.movies) if m.id == movie_id)
-            movie_vector = self.tfidf_matrix[movie_idx].toarray().flatten()
-            
-            for liked_id in liked_movies:
-                liked_idx = next(i for i, m in enumerate(self.movies) if m.id == liked_id)
-                liked_vector = self.tfidf_matrix[liked_idx].toarray().flatten()
-                similarity = cosine_similarity([movie_vector], [liked_vector])[0][0]
-                similar_liked_movies.append((liked_id, similarity))
-            
-            similar_liked_movies.sort(key=lambda x: x[1], reverse=True)
-            similar_liked_movies = similar_liked_movies[:3]
-        
-        # Find similar users who liked this movie
-        similar_users = []
-        if user_id in self.user_movie_matrix:
-            similar_users_data = self._find_similar_users(user_id)
-            for sim_user_id, similarity in similar_users_data:
-                if movie_id in self.user_movie_matrix[sim_user_id]:
-                    rating = self.user_movie_matrix[sim_user_id][movie_id]
-                    if rating > 0:
-                        similar_users.append((sim_user_id, similarity, rating))
-            similar_users.sort(key=lambda x: x[1], reverse=True)
-            similar_users = similar_users[:3]
+        # Liked movies closest to each target: TF-IDF rows are L2-normalised,
+        # so sparse row dot products are cosine similarities
+        liked_rows = self.catalog.rows_for(liked_movies)
+        liked_similarities = (targets @ self.tfidf_matrix[liked_rows].T).toarray()
         
-        return {
-            "movie_id": movie_id,
-            "movie_title": movie.title,
-            "content_score": round(content_score, 3),
-            "collaborative_score": round(collaborative_score, 3),
-            "combined_score": round(
-                self.content_weight * content_score + self.collaborative_weight * collaborative_score, 3
-            ),
-            "content_weight": self.content_weight,
-            "collaborative_weight": self.collaborative_weight,
-            "similar_liked_movies": [
-                {
-                    "movie_id": movie_id,
-                    "movie_title": next(m.title for m in self.movies if m.id == movie_id),
-                    "similarity": round(similarity, 3)
-                }
-                for movie_id, similarity in similar_liked_movies
-            ],
-            "similar_users": [
-                {
-                    "user_id": user_id,
-                    "similarity": round(similarity, 3),
-                    "rating": rating
-                }
-                for user_id, similarity, rating in similar_users
-            ]
-        }
+        # Neighbours who liked each target, most similar first
+        by_similarity = np.argsort(-similarities, kind='stable').tolist() if neighbours else []
+        
+        explanations = []
+        for i, movie_id in enumerate(movie_ids):
+            closest = top_k_indices(liked_similarities[i], n_reasons)
+            agreeing = [j for j in by_similarity if ratings[j, i] > 0][:n_reasons]
+            content_score = float(content_scores[i])
+            collaborative_score = float(collaborative_scores[i])
+            explanations.append({
+                "movie_id": movie_id,
+                "movie_title": self.catalog.titles[rows[i]],
+                "content_score": round(content_score, 3),
+                "collaborative_score": round(collaborative_score, 3),
+                "combined_score": round(
+                    self.content_weight * content_score + self.collaborative_weight * collaborative_score, 3
+                ),
+                "content_weight": self.content_weight,
+                "collaborative_weight": self.collaborative_weight,
+                "similar_liked_movies": [
+                    {
+                        "movie_id": int(self.catalog.ids[liked_rows[j]]),
+                        "movie_title": self.catalog.titles[liked_rows[j]],
+                        "similarity": round(float(liked_similarities[i, j]), 3)
+                    }
+                    for j in closest.tolist()
+                ],
+                "similar_users": [
+                    {
+                        "user_id": neighbours[j][0],
+                        "similarity": round(neighbours[j][1], 3),
+                        "rating": int(ratings[j, i])
+                    }
+                    for j in agreeing
+                ]
+            })
+        return explanations
@@ -0,0 +1,374 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import scipy.sparse as sp
+from ..artifacts import StringColumn, csr_from_arrays, csr_to_arrays, strings_to_arrays
+
+
+class InteractionMatrix:
+    """
+    Incrementally maintained sparse user x movie interaction matrix.
+
+    Signals are stored as int8 (+1 like, -1 dislike) under stable user and
+    movie index maps. Writes land in a small delta tail in O(1); the tail is
+    merged into a CSR base only once it outgrows a fraction of the base, so
+    reads never rebuild the matrix from scratch. The base costs an int32
+    column and an int8 signal per interaction, plus one indptr entry per user.
+
+    DataService owns the one instance and is its only writer (set, load,
+    add_movie, swap_movies); recommenders share it and only read (user_index,
+    movie_ids, row, column, submatrix, csr, matvec, norms, cosine_to,
+    user_preferences).
+    """
+
+    def __init__(self, compact_ratio: float = 0.25, min_compact: int = 1024):
+        self.compact_ratio = compact_ratio
+        self.min_compact = min_compact
+        self.user_index: Dict[str, int] = {}
+        self.user_ids: List[str] = []
+        self.movie_index: Dict[int, int] = {}
+        self.movie_ids: List[int] = []
+        self._base = sp.csr_matrix((0, 0), dtype=np.int8)
+        self._sq_norms = np.zeros(64, dtype=np.float64)
+        # Delta tail: coordinates, new signal and the base value it overrides
+        self._tail_rows = np.empty(64, dtype=np.int32)
+        self._tail_cols = np.empty(64, dtype=np.int32)
+        self._tail_vals = np.empty(64, dtype=np.int8)
+        self._tail_pos = np.empty(64, dtype=np.int64)
+        self._tail_size = 0
+        self._tail_slots: Dict[Tuple[int, int], int] = {}
+        self._tail_by_user: Dict[int, List[int]] = {}
+        self._writes = 0
+        self._merged: Tuple[int, Optional[sp.csr_matrix]] = (-1, None)
+
+    @property
+    def n_users(self) -> int:
+        return len(self.user_ids)
+
+    @property
+    def n_movies(self) -> int:
+        return len(self.movie_ids)
+
+    @property
+    def nnz(self) -> int:
+        return self._base.nnz + int(np.count_nonzero(self._tail_pos[:self._tail_size] < 0))
+
+    def add_movie(self, movie_id: int) -> int:
+        """Return the column for a movie, assigning the next one if unseen."""
+        col = self.movie_index.get(movie_id)
+        if col is None:
+            col = len(self.movie_ids)
+            self.movie_index[movie_id] = col
+            self.movie_ids.append(movie_id)
+        return col
+
+    def swap_movies(self, a: int, b: int):
+        """
+        Exchange the columns of two movies, O(nnz).
+
+        Lets a movie catalogued after it was first rated take the column
+        matching its catalogue row.
+        """
+        if a == b:
+            return
+        self.compact()
+        base = self._base
+        indices = base.indices.copy()
+        indices[base.indices == a] = b
+        indices[base.indices == b] = a
+        self._base = sp.csr_matrix((base.data.copy(), indices, base.indptr.copy()), shape=base.shape)
+        self._base.sort_indices()
+        movie_a, movie_b = self.movie_ids[a], self.movie_ids[b]
+        self.movie_ids[a], self.movie_ids[b] = movie_b, movie_a
+        self.movie_index[movie_a], self.movie_index[movie_b] = b, a
+        self._writes += 1
+        self._merged = (-1, None)
+
+    def add_user(self, user_id: str) -> int:
+        """Return the row for a user, assigning the next one if unseen."""
+        row = self.user_index.get(user_id)
+        if row is None:
+            row = len(self.user_ids)
+            self.user_index[user_id] = row
+            self.user_ids.append(user_id)
+            if row >= len(self._sq_norms):
+                self._sq_norms = _grow(self._sq_norms, row + 1)
+        return row
+
+    def set(self, user_id: str, movie_id: int, liked: bool) -> Tuple[int, int, int, int]:
+        """
+        Record a like/dislike in O(1).
+
+        Returns:
+            (user row, movie column, previous signal, new signal); the previous
+            signal is 0 when the user had not rated the movie before.
+        """
+        row = self.add_user(user_id)
+        col = self.add_movie(movie_id)
+        value = 1 if liked else -1
+
+        slot = self._tail_slots.get((row, col))
+        if slot is not None:
+            old = int(self._tail_vals[slot])
+            self._tail_vals[slot] = value
+        else:
+            pos, old = self._base_lookup(row, col)
+            slot = self._append_tail(row, col, value, pos)
+            self._tail_slots[(row, col)] = slot
+            self._tail_by_user.setdefault(row, []).append(slot)
+
+        self._sq_norms[row] += value * value - old * old
+        self._writes += 1
+        if self._tail_size > max(self.min_compact, self.compact_ratio * self._base.nnz):
+            self.compact()
+        return row, col, old, value
+
+    def load(self, user_ids: List[str], movie_ids: List[int], signals: np.ndarray):
+        """
+        Bulk-load final signals (one per user/movie pair) into an empty matrix.
+
+        Builds the CSR base in one pass instead of going through the tail.
+        """
+        if self.nnz or self._tail_size:
+            raise ValueError("Bulk load requires an empty interaction matrix")
+        rows = np.fromiter((self.add_user(user_id) for user_id in user_ids), dtype=np.int32, count=len(user_ids))
+        cols = np.fromiter((self.add_movie(movie_id) for movie_id in movie_ids), dtype=np.int32, count=len(movie_ids))
+        signals = np.asarray(signals, dtype=np.int8)
+        self._base = sp.csr_matrix((signals, (rows, cols)), shape=(self.n_users, self.n_movies), dtype=np.int8)
+        self._base.sort_indices()
+        self._sq_norms[:self.n_users] = np.bincount(rows, weights=signals.astype(np.float64) ** 2, minlength=self.n_users)
+        self._writes += 1
+
+    def state_arrays(self) -> Dict[str, np.ndarray]:
+        """The compacted matrix and its index maps as flat arrays."""
+        return {
+            **csr_to_arrays("interactions.matrix", self.csr()),
+            **strings_to_arrays("interactions.user_ids", self.user_ids),
+            "interactions.movie_ids": np.asarray(self.movie_ids, dtype=np.int64),
+            "interactions.sq_norms": self._sq_norms[:self.n_users],
+        }
+
+    def load_state(self, arrays: Dict[str, np.ndarray]):
+        """
+        Replace the contents with a state_arrays snapshot, without copying it.
+
+        Rows and columns are only ever appended, so the index maps are
+        extended with the new entries rather than rebuilt. The CSR base
+        stays a view of the snapshot; later set() calls go to the tail as
+        usual, and compaction builds a new base of its own.
+        """
+        user_ids = StringColumn.from_arrays(arrays, "interactions.user_ids")
+        for user_id in user_ids[self.n_users:]:
+            self.user_index[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        for movie_id in arrays["interactions.movie_ids"][self.n_movies:].tolist():
+            self.movie_index[movie_id] = len(self.movie_ids)
+            self.movie_ids.append(movie_id)
+        self._base = csr_from_arrays(arrays, "interactions.matrix")
+        self._sq_norms = np.array(arrays["interactions.sq_norms"], dtype=np.float64)
+        self._tail_size = 0
+        self._tail_slots.clear()
+        self._tail_by_user.clear()
+        self._writes += 1
+
+    def get(self, row: int, col: int) -> int:
+        """Signal stored at (row, col), 0 if absent."""
+        slot = self._tail_slots.get((row, col))
+        if slot is not None:
+            return int(self._tail_vals[slot])
+        return self._base_lookup(row, col)[1]
+
+    def row(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Columns and signals of one user's row."""
+        if row < self._base.shape[0]:
+            start, end = self._base.indptr[row], self._base.indptr[row + 1]
+            cols = self._base.indices[start:end]
+            vals = self._base.data[start:end].copy()
+        else:
+            cols = np.empty(0, dtype=np.int32)
+            vals = np.empty(0, dtype=np.int8)
+
+        slots = self._tail_by_user.get(row)
+        if slots:
+            slots = np.asarray(slots)
+            pos = self._tail_pos[slots]
+            overridden = pos >= 0
+            if overridden.any():
+                vals[pos[overridden] - self._base.indptr[row]] = self._tail_vals[slots[overridden]]
+            cols = np.concatenate([cols, self._tail_cols[slots[~overridden]]])
+            vals = np.concatenate([vals, self._tail_vals[slots[~overridden]]])
+        return cols, vals
+
+    def column(self, col: int) -> Tuple[np.ndarray, np.ndarray]:
+        """User rows that rated one movie, and their signals; a scan of the stored entries."""
+        ratings: Dict[int, int] = {}
+        base = self._base
+        if col < base.shape[1]:
+            positions = np.flatnonzero(base.indices == col)
+            rows = np.searchsorted(base.indptr, positions, 'right') - 1
+            ratings.update(zip(rows.tolist(), base.data[positions].tolist()))
+        for slot in np.flatnonzero(self._tail_cols[:self._tail_size] == col).tolist():
+            ratings[int(self._tail_rows[slot])] = int(self._tail_vals[slot])
+        rows = np.fromiter(ratings.keys(), dtype=np.int64, count=len(ratings))
+        signals = np.fromiter(ratings.values(), dtype=np.int8, count=len(ratings))
+        return rows, signals
+
+    def row_vector(self, row: int) -> np.ndarray:
+        """Dense float vector of one user's row over all movie columns."""
+        vector = np.zeros(self.n_movies)
+        cols, vals = self.row(row)
+        vector[cols] = vals
+        return vector
+
+    def submatrix(self, rows) -> sp.csr_matrix:
+        """CSR of the given user rows over all movie columns."""
+        rows = np.asarray(rows, dtype=np.intp)
+        if not self._tail_size and (len(rows) == 0 or rows.max() < self._base.shape[0]):
+            sub = self._base[rows]
+            sub.resize(len(rows), self.n_movies)
+            return sub
+
+        pieces = [self.row(row) for row in rows.tolist()]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(cols) for cols, _ in pieces])
+        cols = np.concatenate([cols for cols, _ in pieces]) if pieces else np.empty(0, dtype=np.int32)
+        vals = np.concatenate([vals for _, vals in pieces]) if pieces else np.empty(0, dtype=np.int8)
+        return sp.csr_matrix((vals, cols, indptr), shape=(len(rows), self.n_movies))
+
+    def user_preferences(self, user_id: str) -> Dict[int, bool]:
+        """A user's ratings as {movie_id: liked}, in column order."""
+        row = self.user_index.get(user_id)
+        if row is None:
+            return {}
+        cols, vals = self.row(row)
+        order = np.argsort(cols, kind='stable')
+        cols, vals = cols[order], vals[order]
+        return {self.movie_ids[c]: bool(v > 0) for c, v in zip(cols.tolist(), vals.tolist())}
+
+    def matvec(self, vector: np.ndarray, rows: Optional[np.ndarray] = None, absolute: bool = False) -> np.ndarray:
+        """
+        Dot product of user rows with a dense movie-space vector.
+
+        Args:
+            vector: Dense vector over all movie columns
+            rows: User rows to score; every user when omitted
+            absolute: Use |signal| (the rated-movie indicator) instead of the signal
+        """
+        base_rows, base_cols = self._base.shape
+        if rows is None:
+            result = np.zeros(self.n_users)
+            if self._base.nnz:
+                base = abs(self._base) if absolute else self._base
+                result[:base_rows] = base @ vector[:base_cols]
+            slots = np.arange(self._tail_size)
+            positions = self._tail_rows[:self._tail_size]
+        else:
+            rows = np.asarray(rows, dtype=np.intp)
+            result = np.zeros(len(rows))
+            in_base = rows < base_rows
+            if self._base.nnz and in_base.any():
+                base = self._base[rows[in_base]]
+                if absolute:
+                    base = abs(base)
+                result[in_base] = base @ vector[:base_cols]
+            slots, positions = [], []
+            for i, row in enumerate(rows.tolist()):
+                for slot in self._tail_by_user.get(row, ()):
+                    slots.append(slot)
+                    positions.append(i)
+            slots = np.asarray(slots, dtype=np.intp)
+            positions = np.asarray(positions, dtype=np.intp)
+
+        if len(slots):
+            pos = self._tail_pos[slots]
+            new = self._tail_vals[slots].astype(np.float64)
+            previous = np.where(pos >= 0, self._base.data[np.maximum(pos, 0)], 0) if self._base.nnz else np.zeros_like(new)
+            if absolute:
+                new, previous = np.abs(new), np.abs(previous)
+            delta = (new - previous) * vector[self._tail_cols[slots]]
+            result += np.bincount(positions, weights=delta, minlength=len(result))
+        return result
+
+    def norms(self) -> np.ndarray:
+        """L2 norm of every user row."""
+        return np.sqrt(self._sq_norms[:self.n_users])
+
+    def cosine_to(self, row: int, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity of one user's row against the given user rows (default: all)."""
+        dots = self.matvec(self.row_vector(row), rows)
+        norms = self.norms()
+        denominator = (norms if rows is None else norms[rows]) * norms[row]
+        return np.divide(dots, denominator, out=np.zeros_like(dots), where=denominator > 0)
+
+    def csr(self) -> sp.csr_matrix:
+        """
+        The full matrix as CSR, including pending writes.
+
+        Reads never modify the store (so concurrent readers are safe); the
+        merged matrix is cached until the next write.
+        """
+        if not self._tail_size and self._base.shape == (self.n_users, self.n_movies):
+            return self._base
+        writes, merged = self._merged
+        if writes != self._writes or merged is None:
+            merged = self._merge()
+            self._merged = (self._writes, merged)
+        return merged
+
+    def compact(self):
+        """Merge the delta tail into the CSR base."""
+        self._base = self._merge()
+        self._tail_size = 0
+        self._tail_slots.clear()
+        self._tail_by_user.clear()
+        self._merged = (-1, None)
+
+    def _merge(self) -> sp.csr_matrix:
+        """Base with the delta tail applied, as a new CSR matrix."""
+        n = self._tail_size
+        base = self._base
+        data = base.data.copy()
+        pos = self._tail_pos[:n]
+        overridden = pos >= 0
+        data[pos[overridden]] = self._tail_vals[:n][overridden]
+
+        added = ~overridden
+        base_rows = np.repeat(np.arange(base.shape[0], dtype=np.int32), np.diff(base.indptr))
+        rows = np.concatenate([base_rows, self._tail_rows[:n][added]])
+        cols = np.concatenate([base.indices, self._tail_cols[:n][added]])
+        data = np.concatenate([data, self._tail_vals[:n][added]])
+
+        merged = sp.csr_matrix((data, (rows, cols)), shape=(self.n_users, self.n_movies), dtype=np.int8)
+        merged.sort_indices()
+        return merged
+
+    def _base_lookup(self, row: int, col: int) -> Tuple[int, int]:
+        """Position in the base data array and its signal, or (-1, 0)."""
+        if row >= self._base.shape[0] or col >= self._base.shape[1]:
+            return -1, 0
+        start, end = self._base.indptr[row], self._base.indptr[row + 1]
+        offset = int(np.searchsorted(self._base.indices[start:end], col))
+        if start + offset < end and self._base.indices[start + offset] == col:
+            return start + offset, int(self._base.data[start + offset])
+        return -1, 0
+
+    def _append_tail(self, row: int, col: int, value: int, pos: int) -> int:
+        slot = self._tail_size
+        if slot >= len(self._tail_rows):
+            self._tail_rows = _grow(self._tail_rows, slot + 1)
+            self._tail_cols = _grow(self._tail_cols, slot + 1)
+            self._tail_vals = _grow(self._tail_vals, slot + 1)
+            self._tail_pos = _grow(self._tail_pos, slot + 1)
+        self._tail_rows[slot] = row
+        self._tail_cols[slot] = col
+        self._tail_vals[slot] = value
+        self._tail_pos[slot] = pos
+        self._tail_size += 1
+        return slot
+
+
+def _grow(array: np.ndarray, minimum: int) -> np.ndarray:
+    """Return a copy of `array` with at least `minimum` slots, doubling capacity."""
+    capacity = max(minimum, 2 * len(array))
+    grown = np.zeros(capacity, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
@@ -0,0 +1,181 @@
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from .interactions import InteractionMatrix
+from .topk import top_k_indices
+
+
+class NeighborIndex:
+    """
+    User-user neighbour search over an InteractionMatrix.
+
+    Subclasses narrow the candidate set; scoring of candidates is always
+    exact, so `exact=True` on a query gives the reference answer.
+    """
+
+    def __init__(self, interactions: InteractionMatrix):
+        self.interactions = interactions
+
+    @property
+    def approximate(self) -> bool:
+        """Whether queries may currently miss true neighbours (batch scorers then query per user)."""
+        return False
+
+    def rebuild(self):
+        """Re-index every user after the interaction matrix was bulk-loaded."""
+
+    def update(self, row: int, col: int, old: int, new: int):
+        """Observe one interaction change (as returned by InteractionMatrix.set)."""
+
+    def swap_columns(self, a: int, b: int):
+        """Follow InteractionMatrix.swap_movies(a, b)."""
+
+    def candidates(self, row: int, opposite: bool = False, exact: bool = False) -> Optional[np.ndarray]:
+        """
+        Rows worth scoring against `row`; None means every user.
+
+        Args:
+            opposite: Also return users likely to be negatively correlated
+            exact: Skip any approximation
+        """
+        return None
+
+    def query(self, row: int, k: int, exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k users by cosine similarity to `row`, as (rows, similarities)."""
+        rows = self.candidates(row, exact=exact)
+        if rows is None:
+            similarities = self.interactions.cosine_to(row)
+            similarities[row] = -np.inf
+            rows = np.arange(len(similarities))
+        else:
+            rows = rows[rows != row]
+            similarities = self.interactions.cosine_to(row, rows)
+
+        top = top_k_indices(similarities, k)
+        top = top[np.isfinite(similarities[top])]
+        return rows[top], similarities[top]
+
+
+class ExactNeighborIndex(NeighborIndex):
+    """Brute-force search: every user is a candidate."""
+
+
+class LSHNeighborIndex(NeighborIndex):
+    """
+    Random-projection LSH over user rows.
+
+    Every movie column gets a random Gaussian vector; a user's projection is
+    the signal-weighted sum of those vectors, so each like/dislike updates it
+    in O(tables x bits) and moves the user between buckets only if a sign
+    flips. Candidates are the users sharing a bucket in any table.
+    """
+
+    def __init__(
+        self,
+        interactions: InteractionMatrix,
+        n_tables: int = 8,
+        n_bits: int = 12,
+        exact_below: int = 2000,
+        seed: int = 0
+    ):
+        """
+        Args:
+            n_tables: Number of independent hash tables (more = higher recall)
+            n_bits: Hyperplanes per table (more = smaller buckets)
+            exact_below: Answer exactly while there are at most this many users
+            seed: Seed for the random hyperplanes
+        """
+        super().__init__(interactions)
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.exact_below = exact_below
+        self._rng = np.random.default_rng(seed)
+        self._weights = (1 << np.arange(n_bits)).astype(np.int64)
+        self._mask = (1 << n_bits) - 1
+        self._planes = np.zeros((0, n_tables * n_bits), dtype=np.float32)
+        self._projections = np.zeros((0, n_tables * n_bits), dtype=np.float32)
+        self._keys = np.zeros((0, n_tables), dtype=np.int64)
+        self._buckets: List[Dict[int, Set[int]]] = [{} for _ in range(n_tables)]
+        self.rebuild()
+
+    @property
+    def approximate(self) -> bool:
+        return self.interactions.n_users > self.exact_below
+
+    def rebuild(self):
+        """Rehash every user from the current interaction matrix."""
+        matrix = self.interactions.csr()
+        self._ensure_columns(matrix.shape[1])
+        self._projections = np.zeros((0, self.n_tables * self.n_bits), dtype=np.float32)
+        self._keys = np.zeros((0, self.n_tables), dtype=np.int64)
+        self._buckets = [{} for _ in range(self.n_tables)]
+        self._ensure_rows(matrix.shape[0])
+        if matrix.shape[0]:
+            self._projections[:matrix.shape[0]] = matrix.astype(np.float32) @ self._planes[:matrix.shape[1]]
+            for row in range(matrix.shape[0]):
+                self._rehash(row)
+
+    def update(self, row: int, col: int, old: int, new: int):
+        self._ensure_columns(col + 1)
+        self._ensure_rows(row + 1)
+        if new != old:
+            self._projections[row] += (new - old) * self._planes[col]
+        self._rehash(row)
+
+    def swap_columns(self, a: int, b: int):
+        # The hyperplanes move with their movies, so no projection changes
+        self._ensure_columns(max(a, b) + 1)
+        self._planes[[a, b]] = self._planes[[b, a]]
+
+    def candidates(self, row: int, opposite: bool = False, exact: bool = False) -> Optional[np.ndarray]:
+        if exact or self.interactions.n_users <= self.exact_below or row >= len(self._keys):
+            return None
+
+        found: Set[int] = set()
+        for table, key in enumerate(self._keys[row].tolist()):
+            found.update(self._buckets[table].get(key, ()))
+            if opposite:
+                found.update(self._buckets[table].get(~key & self._mask, ()))
+        found.discard(row)
+        return np.fromiter(found, dtype=np.intp, count=len(found))
+
+    def _rehash(self, row: int):
+        bits = self._projections[row].reshape(self.n_tables, self.n_bits) > 0
+        keys = bits @ self._weights
+        for table, (old_key, key) in enumerate(zip(self._keys[row].tolist(), keys.tolist())):
+            if old_key == key:
+                continue
+            bucket = self._buckets[table].get(old_key)
+            if bucket is not None:
+                bucket.discard(row)
+                if not bucket:
+                    del self._buckets[table][old_key]
+            self._buckets[table].setdefault(key, set()).add(row)
+        self._keys[row] = keys
+
+    def _ensure_columns(self, n: int):
+        if n > len(self._planes):
+            extra = self._rng.standard_normal((max(n, 2 * len(self._planes)) - len(self._planes), self._planes.shape[1]))
+            self._planes = np.vstack([self._planes, extra.astype(np.float32)])
+
+    def _ensure_rows(self, n: int):
+        if n > len(self._projections):
+            capacity = max(n, 2 * len(self._projections))
+            projections = np.zeros((capacity, self._projections.shape[1]), dtype=np.float32)
+            projections[:len(self._projections)] = self._projections
+            # -1 never matches a real key, so new rows are always (re)bucketed
+            keys = np.full((capacity, self.n_tables), -1, dtype=np.int64)
+            keys[:len(self._keys)] = self._keys
+            self._projections, self._keys = projections, keys
+
+
+NEIGHBOR_INDEXES = {
+    "exact": ExactNeighborIndex,
+    "lsh": LSHNeighborIndex,
+}
+
+
+def make_neighbor_index(interactions: InteractionMatrix, kind: str = "lsh", **kwargs) -> NeighborIndex:
+    """Build a neighbour index by name ("exact" or "lsh")."""
+    if kind not in NEIGHBOR_INDEXES:
+        raise ValueError(f"Unknown neighbor index '{kind}'")
+    return NEIGHBOR_INDEXES[kind](interactions, **kwargs)
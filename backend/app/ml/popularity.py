@@ -0,0 +1,132 @@
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from ..catalog import MovieCatalog
+
+
+class PopularityRanking:
+    """
+    Pre-sorted popularity order over the catalogue for cold-start fallbacks.
+
+    A movie's score is its rating plus `like_weight` per net like (likes
+    minus dislikes) from live preferences. The order is kept sorted as
+    preferences arrive, so "top N excluding these IDs" only walks the first
+    N + len(excluded) entries. A change only shifts the entries between a
+    movie's old and new place, inside buffers that double when full, so
+    neither copies the whole order.
+    """
+
+    def __init__(self, catalog: MovieCatalog, like_weight: float = 0.1):
+        self.catalog = catalog
+        self.like_weight = like_weight
+        self.net_likes = np.zeros(len(catalog), dtype=np.int64)
+        self.scores = catalog.ratings.astype(np.float64)
+        # Rows by descending score, ties in catalogue order
+        self._order = np.lexsort((np.arange(len(catalog)), -self.scores))
+        self._keys = -self.scores[self._order]
+        self._buffers: Dict[str, np.ndarray] = {}  # attribute -> buffer it is a prefix of
+
+    def update(self, movie_id: int, old_signal: int, new_signal: int):
+        """
+        Apply one preference change.
+
+        Args:
+            old_signal: Previous rating of the movie by that user (1, -1 or 0 if unrated)
+            new_signal: New rating (1 or -1)
+        """
+        row = self.catalog.row_of(movie_id)
+        if row is None or new_signal == old_signal:
+            return
+
+        self.net_likes[row] += new_signal - old_signal
+        old_key = -self.scores[row]
+        self.scores[row] = self.catalog.ratings[row] + self.like_weight * self.net_likes[row]
+        self._place(row, self._position(old_key, row))
+
+    def upsert(self, row: int, net_likes: int = 0):
+        """
+        Follow MovieCatalog.upsert: rank a new last row (with `net_likes`
+        from ratings it got before it was catalogued), or re-rank a row
+        whose rating changed.
+        """
+        if row < len(self.scores):
+            position = self._position(-self.scores[row], row)
+        else:
+            self._writable('net_likes', row + 1)[row] = net_likes
+            self._writable('scores', row + 1)
+            position = None
+        self.scores[row] = self.catalog.ratings[row] + self.like_weight * self.net_likes[row]
+        self._place(row, position)
+
+    def load(self, movie_ids: Iterable[int], signals: Iterable[int]):
+        """Bulk-apply replayed final signals (one per user/movie pair) and re-sort once."""
+        rows = self.catalog.lookup_rows(movie_ids)
+        signals = np.fromiter(signals, dtype=np.int64, count=len(rows))
+        signals, rows = signals[rows >= 0], rows[rows >= 0]
+        self.net_likes += np.bincount(rows, weights=signals, minlength=len(self.catalog)).astype(np.int64)
+        self.scores = self.catalog.ratings + self.like_weight * self.net_likes
+        self._order = np.lexsort((np.arange(len(self.catalog)), -self.scores))
+        self._keys = -self.scores[self._order]
+
+    def state_arrays(self) -> Dict[str, np.ndarray]:
+        """Live counts and the sorted order as flat arrays."""
+        return {
+            "popularity.net_likes": self.net_likes,
+            "popularity.scores": self.scores,
+            "popularity.order": self._order,
+            "popularity.keys": self._keys,
+        }
+
+    def load_state(self, arrays: Dict[str, np.ndarray]):
+        """Adopt a state_arrays snapshot without re-sorting; the per-movie counts are copied so update() still works."""
+        self.net_likes = np.array(arrays["popularity.net_likes"])
+        self.scores = np.array(arrays["popularity.scores"])
+        self._order = arrays["popularity.order"]
+        self._keys = arrays["popularity.keys"]
+
+    def top(self, limit: int, excluded_movies: Iterable[int] = ()) -> List[int]:
+        """IDs of the `limit` most popular movies, skipping `excluded_movies`."""
+        excluded_set = set(excluded_movies)
+        head = self.catalog.ids[self._order[:limit + len(excluded_set)]].tolist()
+        return [movie_id for movie_id in head if movie_id not in excluded_set][:limit]
+
+    def _place(self, row: int, position: Optional[int]):
+        """Move `row` from `position` in the sorted order (None if absent) to where its score belongs."""
+        if position is None:
+            # Append with a key past every score, then move it up like any other row
+            position = len(self._order)
+            self._writable('_order', position + 1)[position] = row
+            self._writable('_keys', position + 1)[position] = np.inf
+        order, keys = self._writable('_order', len(self._order)), self._writable('_keys', len(self._keys))
+        new_key = -self.scores[row]
+        # Entries before (new_key, row); the row's own entry is among them if its key rose
+        lo, hi = np.searchsorted(keys, new_key, 'left'), np.searchsorted(keys, new_key, 'right')
+        target = lo + int(np.searchsorted(order[lo:hi], row))
+        if position < target:
+            target -= 1
+            order[position:target] = order[position + 1:target + 1]
+            keys[position:target] = keys[position + 1:target + 1]
+        elif target < position:
+            order[target + 1:position + 1] = order[target:position]
+            keys[target + 1:position + 1] = keys[target:position]
+        order[target] = row
+        keys[target] = new_key
+
+    def _position(self, key: float, row: int) -> int:
+        """Index of `row` in the sorted order, given its current key."""
+        lo, hi = np.searchsorted(self._keys, key, 'left'), np.searchsorted(self._keys, key, 'right')
+        return lo + int(np.searchsorted(self._order[lo:hi], row))
+
+    def _writable(self, name: str, length: int) -> np.ndarray:
+        """
+        Array `name` resized to `length`, as a writeable view of a buffer that
+        doubles when full (loaded or snapshot arrays may be read-only or shared).
+        """
+        array = getattr(self, name)
+        buffer = self._buffers.get(name)
+        if buffer is None or array.base is not buffer or length > len(buffer):
+            grown = np.empty(max(16, length, 2 * len(array)), dtype=array.dtype)
+            grown[:len(array)] = array
+            self._buffers[name] = buffer = grown
+        array = buffer[:length]
+        setattr(self, name, array)
+        return array
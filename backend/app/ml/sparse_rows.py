@@ -0,0 +1,81 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+class GrowableCSR:
+    """
+    CSR matrix that takes new rows in amortised O(row) time.
+
+    The data/indices/indptr arrays keep spare capacity and `matrix` is a CSR
+    view of their filled part, so appending a row copies only that row (and
+    now and then doubles the capacity). Replacing a row moves the rows
+    after it once, O(nnz) but a single memmove. The arrays are only copied out of the wrapped matrix
+    on the first change, so a memory-mapped matrix stays shared until then.
+    """
+
+    def __init__(self, matrix: sp.csr_matrix):
+        self.matrix = matrix
+        self._data = None  # backing arrays, allocated on the first change
+        self._indices = None
+        self._indptr = None
+
+    def set_row(self, row: int, vector: sp.csr_matrix):
+        """Replace row `row`, or append it when row == number of rows; `vector` is 1 x n_cols."""
+        vector = sp.csr_matrix(vector)
+        n_rows, n_cols = self.matrix.shape
+        if row > n_rows:
+            raise ValueError(f"Row {row} is past the end of a {n_rows}-row matrix")
+        if self._data is None:
+            self._adopt(self.matrix)
+
+        nnz = int(self._indptr[n_rows])
+        appended = row == n_rows
+        if appended:
+            start = end = nnz
+        else:
+            start, end = int(self._indptr[row]), int(self._indptr[row + 1])
+        shift = vector.nnz - (end - start)
+        # Grow before writing anything, so a full buffer never leaves a half-applied row
+        self._reserve(nnz + shift, n_rows + 1 + appended)
+        if appended:
+            self._indptr[n_rows + 1] = nnz
+            n_rows += 1
+        if shift and end < nnz:
+            # Move the rows after this one (numpy copes with the overlap)
+            self._data[end + shift:nnz + shift] = self._data[end:nnz]
+            self._indices[end + shift:nnz + shift] = self._indices[end:nnz]
+        self._data[start:start + vector.nnz] = vector.data
+        self._indices[start:start + vector.nnz] = vector.indices
+        self._indptr[row + 1:n_rows + 1] += shift
+        self._view(n_rows, n_cols)
+
+    def _adopt(self, matrix: sp.csr_matrix):
+        """Copy `matrix` into fresh backing arrays with room to grow."""
+        n_rows, n_cols = matrix.shape
+        self._data = np.empty(max(16, 2 * matrix.nnz), dtype=matrix.dtype)
+        self._indices = np.empty(len(self._data), dtype=matrix.indices.dtype)
+        self._indptr = np.zeros(max(16, 2 * (n_rows + 1)), dtype=matrix.indptr.dtype)
+        self._data[:matrix.nnz] = matrix.data
+        self._indices[:matrix.nnz] = matrix.indices
+        self._indptr[:n_rows + 1] = matrix.indptr
+        self._view(n_rows, n_cols)
+
+    def _reserve(self, nnz: int, indptr: int):
+        if nnz > len(self._data):
+            capacity = max(nnz, 2 * len(self._data))
+            self._data = _resized(self._data, capacity)
+            self._indices = _resized(self._indices, capacity)
+        if indptr > len(self._indptr):
+            self._indptr = _resized(self._indptr, max(indptr, 2 * len(self._indptr)))
+
+    def _view(self, n_rows: int, n_cols: int):
+        nnz = self._indptr[n_rows]
+        self.matrix = sp.csr_matrix(
+            (self._data[:nnz], self._indices[:nnz], self._indptr[:n_rows + 1]), shape=(n_rows, n_cols)
+        )
+
+
+def _resized(array: np.ndarray, capacity: int) -> np.ndarray:
+    grown = np.empty(capacity, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
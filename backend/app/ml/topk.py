@@ -0,0 +1,112 @@
+from typing import Iterator, List
+import numpy as np
+import scipy.sparse as sp
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first.
+
+    Ties are broken by ascending index, so the result is identical to a
+    stable descending sort truncated to k, without sorting every score.
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= n:
+        return np.argsort(-scores, kind='stable')
+
+    part = np.argpartition(-scores, k - 1)[:k]
+    threshold = scores[part].min()
+    candidates = np.flatnonzero(scores >= threshold)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order[:k]]
+
+
+def top_k_neighbors(matrix: sp.spmatrix, k: int, chunk_size: int = 1024) -> sp.csr_matrix:
+    """
+    Sparse table of each row's k most similar rows by dot product.
+
+    Rows of `matrix` are expected to be L2-normalised (as TF-IDF output is),
+    so dot products are cosine similarities. Similarities are computed one
+    block of `chunk_size` rows at a time, so peak memory is
+    chunk_size x n_rows instead of n_rows x n_rows. Only positive
+    similarities are kept.
+    """
+    matrix = sp.csr_matrix(matrix)
+    n = matrix.shape[0]
+    k = min(k, n)
+    transposed = matrix.T.tocsr()
+    rows, cols, vals = [], [], []
+    if k <= 0:
+        return sp.csr_matrix((n, n))
+
+    for start in range(0, n, chunk_size):
+        block = (matrix[start:start + chunk_size] @ transposed).toarray()
+        if k < n:
+            idx = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(n), block.shape)
+        block_vals = np.take_along_axis(block, idx, axis=1)
+        keep = block_vals > 0
+        rows.append(np.nonzero(keep)[0] + start)
+        cols.append(idx[keep])
+        vals.append(block_vals[keep])
+
+    if not rows:
+        return sp.csr_matrix((n, n))
+
+    return sp.csr_matrix(
+        (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(n, n)
+    )
+
+
+def top_k_sparse_rows(matrix: sp.spmatrix, k: int) -> sp.csr_matrix:
+    """
+    Keep the k largest positive entries of each row of a sparse matrix.
+
+    One lexsort over all stored entries (row, then value descending, then
+    column ascending, as top_k_indices breaks ties); no dense rows are built.
+    """
+    matrix = sp.csr_matrix(matrix)
+    matrix.sum_duplicates()
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    order = np.lexsort((matrix.indices, -matrix.data, rows))
+    rank = np.arange(len(order)) - matrix.indptr[rows[order]]
+    keep = order[(rank < k) & (matrix.data[order] > 0)]
+    keep.sort()
+    return sp.csr_matrix((matrix.data[keep], (rows[keep], matrix.indices[keep])), shape=matrix.shape)
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> List[np.ndarray]:
+    """
+    Row-wise top_k_indices for a 2-D score block.
+
+    Selection is one argpartition over the whole block; only rows with a tie
+    straddling the k-th place fall back to the exact per-row path, so every
+    row matches top_k_indices. Entries scored -inf are never returned.
+    """
+    n_rows, n_cols = scores.shape
+    k = min(k, n_cols)
+    if k <= 0:
+        return [np.empty(0, dtype=np.intp) for _ in range(n_rows)]
+
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < n_cols else np.broadcast_to(np.arange(n_cols), scores.shape)
+    vals = np.take_along_axis(scores, idx, axis=1)
+    order = np.lexsort((idx, -vals), axis=1)
+    idx = np.take_along_axis(idx, order, axis=1)
+    vals = np.take_along_axis(vals, order, axis=1)
+    tied = (scores >= vals[:, -1:]).sum(axis=1) > k
+
+    result = []
+    for row in range(n_rows):
+        top = top_k_indices(scores[row], k) if tied[row] else idx[row]
+        result.append(top[np.isfinite(scores[row, top])])
+    return result
+
+
+def row_blocks(n_rows: int, n_cols: int, max_cells: int = 1 << 24) -> Iterator[slice]:
+    """Slices of rows so that each block of a dense n_rows x n_cols product stays under max_cells."""
+    step = max(1, max_cells // max(n_cols, 1))
+    for start in range(0, n_rows, step):
+        yield slice(start, min(start + step, n_rows))
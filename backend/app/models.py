@@ -1,16 +1,26 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Optional
 from enum import Enum
 
+# Bounds on client-supplied IDs, well inside what the preference stores
+# can hold
+MAX_MOVIE_ID = 2**31 - 1
+MAX_USER_ID_LENGTH = 256
+
+MovieId = Annotated[int, Field(ge=0, le=MAX_MOVIE_ID)]
+UserId = Annotated[str, Field(max_length=MAX_USER_ID_LENGTH)]
+
 
 class RecommendationMode(str, Enum):
     COLLABORATIVE = "collaborative"
     CONTENT_BASED = "content_based"
     HYBRID = "hybrid"
+    MATRIX_FACTORIZATION = "matrix_factorization"
+    ITEM_BASED = "item_based"
 
 
 class Movie(BaseModel):
-    id: int
+    id: MovieId
     title: str
     genre: str
     year: int
@@ -22,13 +32,19 @@ class Movie(BaseModel):
 
 
 class UserPreference(BaseModel):
-    user_id: str
-    movie_id: int
+    user_id: UserId
+    movie_id: MovieId
     liked: bool  # True for like, False for dislike
 
 
 class RecommendationRequest(BaseModel):
-    user_id: str
+    user_id: UserId
+    mode: RecommendationMode = RecommendationMode.CONTENT_BASED
+    limit: int = 10
+
+
+class BatchRecommendationRequest(BaseModel):
+    user_ids: List[UserId]
     mode: RecommendationMode = RecommendationMode.CONTENT_BASED
     limit: int = 10
 
@@ -47,3 +63,38 @@ class UserPreferencesResponse(BaseModel):
     user_id: str
     liked_movies: List[int]
     disliked_movies: List[int]
+
+
+class ExplanationRequest(BaseModel):
+    user_id: UserId
+    movie_ids: Optional[List[MovieId]] = None  # None explains the user's current hybrid recommendations
+    limit: int = 10
+
+
+class SimilarLikedMovie(BaseModel):
+    movie_id: int
+    movie_title: str
+    similarity: float
+
+
+class SimilarUser(BaseModel):
+    user_id: str
+    similarity: float
+    rating: int
+
+
+class MovieExplanation(BaseModel):
+    movie_id: int
+    movie_title: str
+    content_score: float
+    collaborative_score: float
+    combined_score: float
+    content_weight: float
+    collaborative_weight: float
+    similar_liked_movies: List[SimilarLikedMovie]
+    similar_users: List[SimilarUser]
+
+
+class ExplanationResponse(BaseModel):
+    user_id: str
+    explanations: List[MovieExplanation]
@@ -0,0 +1,488 @@
+import abc
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (user_id, movie_id, liked)
+Preference = Tuple[str, int, bool]
+
+# Longest user ID, in UTF-8 bytes, that a log record's length field holds
+MAX_USER_BYTES = 0xFFFF
+
+
+class StoreUnavailable(RuntimeError):
+    """A batch failed to commit recently; the store refuses writes until its retry interval passes."""
+
+
+class PreferenceStore(abc.ABC):
+    """
+    Durable record of like/dislike events, replayed on startup.
+
+    Writers call `append`; records are queued and a background committer
+    persists everything queued so far in one batch (group commit), so a
+    burst of N likes costs one fsync instead of N. `wait_for` blocks until
+    a given append is durable.
+
+    If a batch fails to commit, whatever it wrote is rolled back and it is
+    dropped together with the records queued behind it; their waiters get
+    the error. Appends then raise StoreUnavailable for `retry_interval`
+    seconds, after which the next batch tries the storage again.
+    """
+
+    def __init__(self, commit_interval: float = 0.002, max_batch: int = 4096, retry_interval: float = 1.0):
+        """
+        Args:
+            commit_interval: Seconds the committer waits for more records before a batch
+            max_batch: Records written per batch at most
+            retry_interval: Seconds appends are refused after a failed batch
+        """
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self.retry_interval = retry_interval
+        self._pending: List[Preference] = []
+        self._queued = 0
+        self._done = 0  # Sequence numbers committed or dropped
+        self._failures: List[Tuple[int, int, BaseException]] = []  # (first, last) dropped sequence, error
+        self._error: Optional[BaseException] = None
+        self._failed_at = 0.0
+        self._needs_rollback = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._committer: Optional[threading.Thread] = None
+
+    def append(self, user_id: str, movie_id: int, liked: bool) -> int:
+        """
+        Queue one preference and return its sequence number for wait_for.
+
+        Raises:
+            ValueError: The store cannot hold this record (nothing is queued)
+            StoreUnavailable: A batch failed within the last retry_interval
+                seconds (nothing is queued)
+        """
+        # Validate on the caller's thread, so a bad record fails its own
+        # request instead of the committer and every batch after it
+        record = self._prepare(user_id, movie_id, liked)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Preference store is closed")
+            if self._error is not None:
+                if time.monotonic() - self._failed_at < self.retry_interval:
+                    raise StoreUnavailable(f"Preference store is unavailable: {self._error}") from self._error
+                # Let this record's batch find out whether the storage has recovered
+                self._error = None
+            if self._committer is None:
+                self._committer = threading.Thread(target=self._commit_loop, name="preference-commit", daemon=True)
+                self._committer.start()
+            self._pending.append(record)
+            self._queued += 1
+            self._condition.notify_all()
+            return self._queued
+
+    def wait_for(self, sequence: int):
+        """
+        Block until the append with this sequence number (and all before it) is committed.
+
+        Raises:
+            The error of the failed batch that dropped it
+        """
+        with self._condition:
+            self._wait_for(sequence)
+
+    def flush(self):
+        """Block until everything appended so far is committed."""
+        with self._condition:
+            self._wait_for(self._queued)
+
+    def close(self):
+        """Commit outstanding records and stop the committer."""
+        with self._condition:
+            if self._closed:
+                return
+            while self._done < self._queued:
+                self._condition.wait()
+            self._closed = True
+            self._condition.notify_all()
+        if self._committer is not None:
+            self._committer.join()
+        self._close()
+
+    @abc.abstractmethod
+    def replay(self) -> Iterator[Preference]:
+        """Every stored preference, oldest first; later records win."""
+
+    def _prepare(self, user_id: str, movie_id: int, liked: bool) -> Any:
+        """Check one preference and turn it into the record `_write` takes."""
+        return user_id, _check_movie_id(movie_id), bool(liked)
+
+    @abc.abstractmethod
+    def _write(self, batch: List[Any]):
+        """Persist one batch of `_prepare`d records durably."""
+
+    def _rollback(self):
+        """Undo whatever a failed `_write` left behind, back to the last committed batch."""
+
+    def _close(self):
+        pass
+
+    def _wait_for(self, sequence: int):
+        while self._done < sequence:
+            self._condition.wait()
+        for first, last, error in self._failures:
+            if first <= sequence <= last:
+                raise error
+
+    def _commit_loop(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+            # Let concurrent writers join the batch
+            if self.commit_interval:
+                time.sleep(self.commit_interval)
+            with self._condition:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:len(batch)]
+            try:
+                if self._needs_rollback:
+                    self._rollback()
+                    self._needs_rollback = False
+                self._write(batch)
+            except BaseException as e:
+                # Records were checked by append, so this is the storage
+                # itself failing: undo the batch and drop everything queued
+                # behind it rather than write it after a gap
+                self._needs_rollback = True
+                try:
+                    self._rollback()
+                    self._needs_rollback = False
+                except BaseException as rollback_error:
+                    logger.warning("Could not roll back a failed preference batch: %s", rollback_error)
+                with self._condition:
+                    first = self._done + 1
+                    self._pending.clear()
+                    self._done = self._queued
+                    self._failures.append((first, self._done, e))
+                    self._error = e
+                    self._failed_at = time.monotonic()
+                    self._condition.notify_all()
+                continue
+            with self._condition:
+                self._done += len(batch)
+                self._condition.notify_all()
+
+
+class MemoryPreferenceStore(PreferenceStore):
+    """Non-durable store for tests and throwaway instances."""
+
+    def __init__(self):
+        super().__init__()
+        self._records: List[Preference] = []
+
+    def append(self, user_id: str, movie_id: int, liked: bool) -> int:
+        self._write([self._prepare(user_id, movie_id, liked)])
+        return len(self._records)
+
+    def wait_for(self, sequence: int):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def replay(self) -> Iterator[Preference]:
+        return iter(list(self._records))
+
+    def _write(self, batch: List[Preference]):
+        self._records.extend(batch)
+
+
+class LogPreferenceStore(PreferenceStore):
+    """
+    Append-only binary log plus a compacted snapshot, in one directory.
+
+    Each record is crc32 | movie_id | signal | user length | user bytes.
+    Replay reads the snapshot, then a rotated log awaiting compaction, then
+    the log; a torn record at the end of the log (crash mid-write) is
+    detected by its checksum and cut off. Once the log outgrows
+    `snapshot_bytes`, the committer renames it aside and starts a new one,
+    and a background thread writes the latest preference per (user, movie)
+    to a new snapshot and deletes the rotated log, so commits never wait
+    for a compaction. Replaying a rotated log over a snapshot that already
+    contains it is harmless, so a crash between those two steps loses
+    nothing.
+    """
+
+    MAGIC = b"PREFLOG1"
+    HEADER = struct.Struct('<IqbH')
+
+    def __init__(self, path: Path, snapshot_bytes: int = 64 << 20, **kwargs):
+        """
+        Args:
+            path: Directory holding snapshot.bin, log.bin and while it is
+                being compacted, log.old
+            snapshot_bytes: Log size that triggers compaction into the snapshot
+        """
+        super().__init__(**kwargs)
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.snapshot_bytes = snapshot_bytes
+        self.log_path = self.path / "log.bin"
+        self.rotated_path = self.path / "log.old"
+        self.snapshot_path = self.path / "snapshot.bin"
+        self._compactor: Optional[threading.Thread] = None
+
+        # Drop any torn tail so new records follow the last valid one
+        valid = self._valid_length(self.log_path)
+        self._log = open(self.log_path, 'a+b')
+        if valid < len(self.MAGIC):
+            self._log.truncate(0)
+            self._log.write(self.MAGIC)
+            valid = len(self.MAGIC)
+        else:
+            self._log.truncate(valid)
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._length = valid  # Bytes of the log up to the last committed batch
+
+    def replay(self) -> Iterator[Preference]:
+        # Runs before the first append, so no compaction moves files meanwhile
+        yield from self._read(self.snapshot_path)
+        yield from self._read(self.rotated_path)
+        yield from self._read(self.log_path)
+
+    def compact(self):
+        """Fold every log into the snapshot now; call only when no batch is being written."""
+        if self._compactor is not None:
+            self._compactor.join()
+        if self.rotated_path.exists():
+            self._fold_rotated()
+        if self._length > len(self.MAGIC):
+            self._rotate()
+            self._fold_rotated()
+
+    def _prepare(self, user_id: str, movie_id: int, liked: bool) -> bytes:
+        return self._encode(user_id, movie_id, liked)
+
+    def _write(self, batch: List[bytes]):
+        self._log.write(b''.join(batch))
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._length = self._log.tell()
+        if self._length > self.snapshot_bytes:
+            self._start_compaction()
+
+    def _rollback(self):
+        # Reopen rather than reuse the handle: its buffer may still hold
+        # bytes of the failed batch, which closing writes and the cut drops
+        try:
+            self._log.close()
+        except OSError:
+            pass
+        self._log = open(self.log_path, 'a+b')
+        self._log.truncate(self._length)
+        self._log.flush()
+        os.fsync(self._log.fileno())
+
+    def _close(self):
+        if self._length > len(self.MAGIC) or self.rotated_path.exists():
+            self.compact()
+        self._log.close()
+
+    def _start_compaction(self):
+        """Rotate the log and fold it into the snapshot on a background thread (committer only)."""
+        if self._compactor is not None and self._compactor.is_alive():
+            return  # Still folding the last rotation; this log waits for the next batch
+        try:
+            # A log.old left by a failed compaction is folded before the log is rotated again
+            if not self.rotated_path.exists():
+                self._rotate()
+        except OSError as e:
+            # The batch itself is committed; keep appending and retry next batch
+            logger.warning("Could not rotate %s: %s", self.log_path, e)
+            return
+        self._compactor = threading.Thread(target=self._compact_in_background, name="preference-compact", daemon=True)
+        self._compactor.start()
+
+    def _compact_in_background(self):
+        try:
+            self._fold_rotated()
+        except OSError as e:
+            logger.warning("Could not compact %s into %s: %s", self.rotated_path, self.snapshot_path, e)
+
+    def _rotate(self):
+        """Rename the log to log.old and continue in a new, empty log."""
+        os.replace(self.log_path, self.rotated_path)
+        try:
+            log = open(self.log_path, 'w+b')
+            log.write(self.MAGIC)
+            log.flush()
+            os.fsync(log.fileno())
+        except BaseException:
+            os.replace(self.rotated_path, self.log_path)
+            raise
+        _fsync_dir(self.path)
+        self._log.close()
+        self._log = log
+        self._length = len(self.MAGIC)
+
+    def _fold_rotated(self):
+        """Write the snapshot with log.old folded in, then delete log.old."""
+        latest: Dict[Tuple[str, int], bool] = {}
+        for path in (self.snapshot_path, self.rotated_path):
+            for user_id, movie_id, liked in self._read(path):
+                latest[(user_id, movie_id)] = liked
+
+        staging = self.snapshot_path.with_suffix('.tmp')
+        with open(staging, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(b''.join(self._encode(user_id, movie_id, liked) for (user_id, movie_id), liked in latest.items()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(staging, self.snapshot_path)
+        _fsync_dir(self.path)
+        os.unlink(self.rotated_path)
+        _fsync_dir(self.path)
+
+    @classmethod
+    def _encode(cls, user_id: str, movie_id: int, liked: bool) -> bytes:
+        """One log record; raises ValueError for a user ID or movie ID the header cannot hold."""
+        user = user_id.encode('utf-8')
+        if len(user) > MAX_USER_BYTES:
+            raise ValueError(f"user_id is longer than {MAX_USER_BYTES} bytes")
+        movie_id = _check_movie_id(movie_id)
+        body = cls.HEADER.pack(0, movie_id, 1 if liked else -1, len(user))[4:] + user
+        return struct.pack('<I', zlib.crc32(body)) + body
+
+    @classmethod
+    def _records(cls, data: bytes) -> Iterator[Tuple[int, Preference]]:
+        """(end offset, record) for each valid record, stopping at the first bad one."""
+        if data[:len(cls.MAGIC)] != cls.MAGIC:
+            return
+        offset = len(cls.MAGIC)
+        while offset + cls.HEADER.size <= len(data):
+            crc, movie_id, signal, length = cls.HEADER.unpack_from(data, offset)
+            end = offset + cls.HEADER.size + length
+            if end > len(data) or zlib.crc32(data[offset + 4:end]) != crc:
+                return
+            user_id = data[offset + cls.HEADER.size:end].decode('utf-8')
+            yield end, (user_id, movie_id, signal > 0)
+            offset = end
+
+    @classmethod
+    def _read(cls, path: Path) -> Iterator[Preference]:
+        if not path.exists():
+            return
+        data = path.read_bytes()
+        for _, record in cls._records(data):
+            yield record
+
+    @classmethod
+    def _valid_length(cls, path: Path) -> int:
+        if not path.exists():
+            return 0
+        data = path.read_bytes()
+        if data[:len(cls.MAGIC)] != cls.MAGIC:
+            return 0
+        end = len(cls.MAGIC)
+        for end, _ in cls._records(data):
+            pass
+        return end
+
+
+class SQLitePreferenceStore(PreferenceStore):
+    """
+    Preferences in an SQLite table keyed by (user_id, movie_id).
+
+    Each group-commit batch is one transaction. The table only ever holds
+    the latest preference per pair, so it needs no separate compaction;
+    upserts keep a pair's rowid, so replay sees pairs in first-rated order.
+    """
+
+    def __init__(self, path: Path, **kwargs):
+        """
+        Args:
+            path: Database file
+        """
+        super().__init__(**kwargs)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=FULL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS preferences ("
+                "user_id TEXT NOT NULL, movie_id INTEGER NOT NULL, liked INTEGER NOT NULL, "
+                "UNIQUE (user_id, movie_id))"
+            )
+            self._connection.commit()
+
+    def replay(self) -> Iterator[Preference]:
+        with self._lock:
+            rows = self._connection.execute("SELECT user_id, movie_id, liked FROM preferences ORDER BY rowid").fetchall()
+        return ((user_id, movie_id, bool(liked)) for user_id, movie_id, liked in rows)
+
+    def _prepare(self, user_id: str, movie_id: int, liked: bool) -> Tuple[str, int, int]:
+        # Text must encode as UTF-8 to be stored
+        user_id.encode('utf-8')
+        return user_id, _check_movie_id(movie_id), int(bool(liked))
+
+    def _write(self, batch: List[Tuple[str, int, int]]):
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT INTO preferences (user_id, movie_id, liked) VALUES (?, ?, ?) "
+                    "ON CONFLICT (user_id, movie_id) DO UPDATE SET liked = excluded.liked",
+                    batch
+                )
+
+    def _close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def _check_movie_id(movie_id: int) -> int:
+    """`movie_id` as an int, if it fits the stores' signed 64-bit column."""
+    movie_id = int(movie_id)
+    if not -(1 << 63) <= movie_id < 1 << 63:
+        raise ValueError(f"movie_id {movie_id} does not fit in 64 bits")
+    return movie_id
+
+
+def _fsync_dir(path: Path):
+    """Make a rename inside `path` durable (no-op where directories can't be opened)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+PREFERENCE_STORES = {
+    "log": lambda path, **kwargs: LogPreferenceStore(path, **kwargs),
+    "sqlite": lambda path, **kwargs: SQLitePreferenceStore(Path(path) / "preferences.sqlite3", **kwargs),
+    "memory": lambda path, **kwargs: MemoryPreferenceStore(),
+}
+
+
+def make_preference_store(kind: str, path: Path, **kwargs) -> PreferenceStore:
+    """Build a preference store by name ("log", "sqlite" or "memory") rooted at `path`."""
+    if kind not in PREFERENCE_STORES:
+        raise ValueError(f"Unknown preference store '{kind}'")
+    return PREFERENCE_STORES[kind](path, **kwargs)
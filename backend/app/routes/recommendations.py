@@ -1,38 +1,135 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+import json
+import os
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from ..models import (
     Movie, 
     UserPreference, 
     RecommendationRequest, 
+    BatchRecommendationRequest,
     RecommendationResponse,
     ModeUpdateRequest,
     RecommendationMode,
-    UserPreferencesResponse
+    UserPreferencesResponse,
+    ExplanationRequest,
+    ExplanationResponse
 )
+from ..batching import RecommendationCoalescer
+from ..catalog_pages import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..concurrency import BoundedExecutor, ExecutorError
 from ..data_service import DataService
+from ..metrics import current_profile
+from ..serving import worker_service
 
 router = APIRouter(prefix="/api", tags=["recommendations"])
 
 # Global data service instance
-data_service = DataService()
+# Under app.serving each API worker gets a DataService over shared memory
+data_service = worker_service() or DataService(preference_store=os.environ.get("PREFERENCE_STORE", "log"))
 
+# Blocking DataService calls run on bounded pools, never on the event loop;
+# writes get their own pool so slow scoring cannot hold up likes
+scoring_executor = BoundedExecutor(
+    "scoring",
+    max_workers=int(os.environ.get("SCORING_WORKERS", os.cpu_count() or 4)),
+    max_queue=int(os.environ.get("SCORING_QUEUE", 64)),
+    timeout=float(os.environ.get("SCORING_TIMEOUT", 5.0))
+)
+write_executor = BoundedExecutor(
+    "writes",
+    max_workers=int(os.environ.get("WRITE_WORKERS", 4)),
+    max_queue=int(os.environ.get("WRITE_QUEUE", 256)),
+    timeout=float(os.environ.get("WRITE_TIMEOUT", 5.0))
+)
+
+# Concurrent /recommend calls are scored together in small batches
+recommendation_coalescer = RecommendationCoalescer(
+    data_service,
+    scoring_executor,
+    window=float(os.environ.get("RECOMMEND_BATCH_WINDOW_MS", 2.0)) / 1000,
+    max_batch=int(os.environ.get("RECOMMEND_BATCH_SIZE", 64))
+)
+
+
+@router.get("/items", responses={200: {"model": List[Movie]}})
+async def get_all_movies(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated Movie fields to return"),
+    genre: List[str] = Query([], description="Only these genres (repeatable, case-insensitive)"),
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None
+):
+    """
+    Get a page of movies.
+    
+    The body is a JSON array. When more movies match, the X-Next-Cursor
+    header (and a rel="next" Link) gives the cursor for the next page.
+    Pages carry an ETag; send it back in If-None-Match to get a 304.
+    """
+    try:
+        page = await scoring_executor.run(
+            data_service.get_movie_page,
+            cursor,
+            limit,
+            [name.strip() for name in fields.split(',') if name.strip()] if fields else None,
+            genre,
+            year_from,
+            year_to
+        )
+    except ExecutorError:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    headers = {"ETag": page.etag, "Cache-Control": "no-cache"}
+    if page.next_cursor is not None:
+        headers["X-Next-Cursor"] = page.next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=page.next_cursor)}>; rel="next"'
+    if _etag_matches(request.headers.get("if-none-match"), page.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=page.body, media_type="application/json", headers=headers)
 
-@router.get("/items", response_model=List[Movie])
-async def get_all_movies():
-    """Get all available movies."""
-    return data_service.get_all_movies()
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names `etag` (weak comparison, as RFC 9110 asks)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in (tag[2:] if tag.startswith('W/') else tag for tag in tags)
+
+
+@router.post("/items", response_model=Movie)
+async def upsert_movie(movie: Movie):
+    """
+    Add a movie to the catalogue, or replace the one with the same ID.
+    
+    The movie is recommendable as soon as this returns; nothing is
+    refitted and no restart is needed.
+    """
+    try:
+        return await write_executor.run(data_service.upsert_movie, movie)
+    except ExecutorError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/like")
 async def like_movie(preference: UserPreference):
     """Mark a movie as liked by user."""
     try:
-        data_service.add_user_preference(
+        await write_executor.run(
+            data_service.add_user_preference,
             preference.user_id, 
             preference.movie_id, 
             True
         )
         return {"message": "Movie liked successfully", "user_id": preference.user_id, "movie_id": preference.movie_id}
+    except ExecutorError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -41,12 +138,15 @@ async def like_movie(preference: UserPreference):
 async def dislike_movie(preference: UserPreference):
     """Mark a movie as disliked by user."""
     try:
-        data_service.add_user_preference(
+        await write_executor.run(
+            data_service.add_user_preference,
             preference.user_id, 
             preference.movie_id, 
             False
         )
         return {"message": "Movie disliked successfully", "user_id": preference.user_id, "movie_id": preference.movie_id}
+    except ExecutorError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -55,31 +155,112 @@ async def dislike_movie(preference: UserPreference):
 async def get_recommendations(request: RecommendationRequest):
     """Get movie recommendations for a user."""
     try:
-        recommendations = data_service.get_recommendations(
-            request.user_id,
-            request.mode,
-            request.limit
-        )
+        if current_profile() is None:
+            recommendations = await recommendation_coalescer.get_recommendations(
+                request.user_id,
+                request.mode,
+                request.limit
+            )
+        else:
+            # Profiled requests are scored alone so the breakdown is their own
+            recommendations = await scoring_executor.run(
+                data_service.get_recommendations,
+                request.user_id,
+                request.mode,
+                request.limit
+            )
         
         return RecommendationResponse(
             recommendations=recommendations,
             mode=request.mode,
             user_id=request.user_id
         )
+    except ExecutorError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/explain", response_model=ExplanationResponse)
+async def explain_recommendations(request: ExplanationRequest):
+    """Explain hybrid scores for the given movies, or for the user's current recommendations."""
+    try:
+        explanations = await scoring_executor.run(
+            data_service.explain_recommendations,
+            request.user_id,
+            request.movie_ids,
+            request.limit
+        )
+        return ExplanationResponse(user_id=request.user_id, explanations=explanations)
+    except ExecutorError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/recommend/batch")
+async def get_recommendations_batch(request: BatchRecommendationRequest):
+    """Stream recommendations for many users as NDJSON, one line per user."""
+    results = data_service.get_recommendations_batch(
+        request.user_ids,
+        request.mode,
+        request.limit
+    )
+    
+    # Shed before the 200 goes out; later blocks wait for a slot like any call
+    scoring_executor.check()
+    
+    async def lines():
+        while True:
+            item = await scoring_executor.run(next, results, None)
+            if item is None:
+                return
+            user_id, recommendations = item
+            yield json.dumps({
+                "user_id": user_id,
+                "mode": request.mode.value,
+                "recommendations": [movie.dict() for movie in recommendations]
+            }) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Get recommendation cache hit/miss counters."""
+    return data_service.get_cache_stats()
+
+
+@router.get("/cache/similarity/stats")
+async def get_similarity_cache_stats():
+    """Get hit rate, evictions, invalidations and memory use of the hybrid neighbour cache."""
+    return data_service.get_similarity_cache_stats()
+
+
+@router.get("/executor/stats")
+async def get_executor_stats():
+    """Get queue depth, shed and expired counts of the request executors."""
+    return {"scoring": scoring_executor.stats(), "writes": write_executor.stats()}
+
+
+@router.get("/recommend/stats")
+async def get_batching_stats():
+    """Get batch size and queueing delay of coalesced /recommend calls."""
+    return recommendation_coalescer.stats()
+
+
 @router.get("/user/{user_id}/preferences", response_model=UserPreferencesResponse)
 async def get_user_preferences(user_id: str):
     """Get user's current preferences."""
     try:
-        prefs = data_service.get_user_preferences(user_id)
+        prefs = await scoring_executor.run(data_service.get_user_preferences, user_id)
         return UserPreferencesResponse(
             user_id=user_id,
             liked_movies=prefs["liked_movies"],
             disliked_movies=prefs["disliked_movies"]
         )
+    except ExecutorError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -0,0 +1,608 @@
+"""
+Multi-process serving: one writer process, N API workers sharing model state.
+
+The launcher process loads (or fits) the models once and places the
+catalogue, TF-IDF and neighbour arrays in a shared-memory segment that every
+worker maps without copying. It is also the single writer of preferences
+and of the catalogue: workers forward likes/dislikes and movie upserts over
+a queue, the writer applies a batch of them, commits them to the stores and
+publishes the batch as a new versioned segment. Workers compare a shared
+version counter on each request and, when it has moved, apply the batches
+they have not seen yet to their own copy of the catalogue and preference
+state; a periodic full snapshot (a base) lets late or lagging workers start
+over.
+
+Run with `python -m app.serving --workers 4` from the backend directory.
+"""
+import argparse
+import importlib
+import itertools
+import json
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from .artifacts import StringColumn, strings_to_arrays
+from .data_service import DataService
+from .models import Movie, RecommendationMode
+
+logger = logging.getLogger(__name__)
+
+# Set in API worker processes before the routes module is imported
+_worker_service: Optional[DataService] = None
+
+
+def worker_service() -> Optional[DataService]:
+    """This process's DataService when running as a serve() worker, else None."""
+    return _worker_service
+
+
+class SharedArrays:
+    """
+    A dict of NumPy arrays in one named shared-memory segment.
+
+    The segment starts with a JSON manifest of (dtype, shape, offset) per
+    array, so attaching only needs the name.
+    """
+
+    ALIGN = 64
+
+    def __init__(self, segment: shared_memory.SharedMemory, arrays: Dict[str, np.ndarray]):
+        self.segment = segment
+        self.arrays = arrays
+
+    @property
+    def name(self) -> str:
+        return self.segment.name
+
+    @classmethod
+    def create(cls, name: str, arrays: Dict[str, np.ndarray]) -> "SharedArrays":
+        manifest, offset = {}, 0
+        for key, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            manifest[key] = [array.dtype.str, list(array.shape), offset]
+            offset += -(-array.nbytes // cls.ALIGN) * cls.ALIGN
+        header = json.dumps(manifest).encode()
+        start = -(-(8 + len(header)) // cls.ALIGN) * cls.ALIGN
+
+        segment = shared_memory.SharedMemory(name=name, create=True, size=max(start + offset, 1))
+        segment.buf[:8] = len(header).to_bytes(8, 'little')
+        segment.buf[8:8 + len(header)] = header
+        views = cls._views(segment, manifest, start)
+        for key, array in arrays.items():
+            views[key][...] = array
+            views[key].flags.writeable = False
+        return cls(segment, views)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedArrays":
+        """Map an existing segment read-only; raises FileNotFoundError once it is unlinked."""
+        segment = _attach_segment(name)
+        length = int.from_bytes(segment.buf[:8], 'little')
+        manifest = json.loads(bytes(segment.buf[8:8 + length]))
+        views = cls._views(segment, manifest, -(-(8 + length) // cls.ALIGN) * cls.ALIGN)
+        for view in views.values():
+            view.flags.writeable = False
+        return cls(segment, views)
+
+    def release(self):
+        """Drop this process's mapping (views must no longer be in use)."""
+        self.arrays = {}
+        try:
+            self.segment.close()
+        except BufferError:
+            # A view is still referenced somewhere; the mapping goes with the process
+            pass
+
+    def unlink(self):
+        """Remove the segment name; processes that mapped it keep their mapping."""
+        try:
+            self.segment.unlink()
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _views(segment: shared_memory.SharedMemory, manifest: Dict[str, list], start: int) -> Dict[str, np.ndarray]:
+        return {
+            key: np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=segment.buf, offset=start + offset)
+            for key, (dtype, shape, offset) in manifest.items()
+        }
+
+
+def _attach_segment(name: str) -> shared_memory.SharedMemory:
+    """Attach without tracking where supported; before Python 3.13 workers
+    share the launcher's resource tracker, which only cleans up after it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class StateWriter:
+    """
+    The single writer: applies forwarded preferences and movie upserts and
+    publishes them.
+
+    Each drained batch of writes is committed with one group commit and
+    becomes visible as one new version. A version's segment holds only that
+    batch (a delta), plus the item factors and similar-items table when a
+    background retrain installed new ones since the last version. Every
+    `base_interval` versions the whole preference state is also published
+    as a base, with every movie upserted since the shared model segment was
+    made; workers start from a base and fall back to one when the deltas
+    they need are gone. Bases older than the last `keep` are unlinked along
+    with the deltas they include.
+    """
+
+    def __init__(
+        self,
+        service: DataService,
+        prefix: str,
+        version,
+        base_version,
+        keep: int = 2,
+        max_batch: int = 1024,
+        base_interval: int = 1024,
+        poll_interval: float = 1.0
+    ):
+        """
+        Args:
+            service: The writer's DataService (owns the preference store)
+            prefix: Shared-memory name prefix for published segments
+            version: Shared integer (multiprocessing.Value) holding the latest version
+            base_version: Shared integer holding the version of the latest base
+            keep: Published bases kept linked, with every delta after the oldest
+            max_batch: Forwarded writes applied per published version at most
+            base_interval: Versions between published bases
+            poll_interval: Seconds between checks for retrained models while idle
+        """
+        self.service = service
+        self.prefix = prefix
+        self.version = version
+        self.base_version = base_version
+        self.keep = keep
+        self.max_batch = max_batch
+        self.base_interval = base_interval
+        self.poll_interval = poll_interval
+        self._trained_version = service.trained_version
+        self._movies: Dict[int, str] = {}  # movie ID -> JSON of its latest upsert, in first-upsert order
+        self._deltas: deque = deque()  # (version, SharedArrays), oldest first
+        self._bases: deque = deque()
+
+    def publish(
+        self,
+        preferences: Sequence[Tuple[str, int, bool]] = (),
+        movies: Sequence[Movie] = (),
+        rebase: bool = False
+    ) -> int:
+        """
+        Publish `movies` and `preferences` (already applied to the service,
+        in that order) as the next version; with `rebase`, or when a base is
+        due, also publish a base.
+        """
+        version = self.version.value + 1
+        arrays = {
+            **strings_to_arrays("delta.movies", [_movie_json(movie) for movie in movies]),
+            **strings_to_arrays("delta.user_ids", [user_id for user_id, _, _ in preferences]),
+            "delta.movie_ids": np.array([movie_id for _, movie_id, _ in preferences], dtype=np.int64),
+            "delta.signals": np.array([1 if liked else -1 for _, _, liked in preferences], dtype=np.int8),
+        }
+        trained_version = self.service.trained_version
+        if trained_version != self._trained_version:
+            arrays.update(self.service.trained_arrays())
+            self._trained_version = trained_version
+        self._deltas.append((version, self._create(f"{self.prefix}-{version}", arrays)))
+
+        if rebase or not self._bases or version - self._bases[-1][0] >= self.base_interval:
+            base = self._create(f"{self.prefix}-base-{version}", {
+                **self.service.preference_arrays(),
+                **strings_to_arrays("base.movies", list(self._movies.values()))
+            })
+            self._bases.append((version, base))
+            self.base_version.value = version
+        self.version.value = version
+
+        while len(self._bases) > self.keep:
+            self._bases.popleft()[1].unlink()
+        while self._deltas and self._deltas[0][0] <= self._bases[0][0]:
+            self._deltas.popleft()[1].unlink()
+        return version
+
+    def serve(self, requests, replies: List[Any]):
+        """Apply forwarded writes until a None message arrives."""
+        while True:
+            try:
+                message = requests.get(timeout=self.poll_interval)
+            except queue.Empty:
+                # No writes to carry them: publish retrained models on their own
+                if self.service.trained_version != self._trained_version:
+                    self.publish()
+                continue
+            if message is None:
+                return
+            batch = [message]
+            while len(batch) < self.max_batch:
+                try:
+                    message = requests.get_nowait()
+                except queue.Empty:
+                    break
+                if message is None:
+                    requests.put(None)
+                    break
+                batch.append(message)
+
+            try:
+                version, errors = self._apply(batch)
+            except Exception as e:
+                logger.exception("Failed to apply %d preference writes", len(batch))
+                version, errors = None, [str(e)] * len(batch)
+                # Part of the batch may have been applied: resynchronise the workers
+                try:
+                    self.publish(rebase=True)
+                except Exception:
+                    logger.exception("Failed to publish a base")
+            for (worker, request_id, *_), error in zip(batch, errors):
+                replies[worker].put((request_id, version, error))
+
+    def _apply(self, batch: List[tuple]) -> Tuple[int, List[Optional[str]]]:
+        """Apply a batch of forwarded writes, movies first, and publish it; per write, None or why it was rejected."""
+        errors: List[Optional[str]] = [None] * len(batch)
+        movies = []
+        for i, (_, _, kind, payload) in enumerate(batch):
+            if kind == "movie":
+                try:
+                    movie = self.service.upsert_movie(Movie(**payload))
+                except ValueError as e:
+                    errors[i] = str(e)
+                    continue
+                # Recorded at once: should the batch fail later, the base
+                # that resynchronises the workers still carries it
+                self._movies[movie.id] = _movie_json(movie)
+                movies.append(movie)
+        positions = [i for i, (_, _, kind, _) in enumerate(batch) if kind == "preference"]
+        preferences = [batch[i][3] for i in positions]
+        applied = []
+        for i, preference, error in zip(positions, preferences, self.service.add_user_preferences(preferences)):
+            if error is None:
+                applied.append(preference)
+            else:
+                errors[i] = str(error)
+        return self.publish(applied, movies), errors
+
+    def close(self):
+        for _, segment in itertools.chain(self._deltas, self._bases):
+            segment.unlink()
+        self._deltas.clear()
+        self._bases.clear()
+
+    @staticmethod
+    def _create(name: str, arrays: Dict[str, np.ndarray]) -> SharedArrays:
+        """Publish a segment without keeping it mapped here; only its name is needed to unlink it."""
+        segment = SharedArrays.create(name, arrays)
+        segment.release()
+        return segment
+
+
+class WriterClient:
+    """
+    Worker side of the write queue: forwards writes and waits for the writer's ack.
+
+    A message is (worker, request_id, kind, payload): kind "preference" with
+    a (user_id, movie_id, liked) payload, or "movie" with a Movie's fields.
+    """
+
+    def __init__(self, worker: int, requests, replies):
+        self.worker = worker
+        self._requests = requests
+        self._replies = replies
+        self._ids = itertools.count()
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        threading.Thread(target=self._receive, name="writer-replies", daemon=True).start()
+
+    def submit(self, user_id: str, movie_id: int, liked: bool) -> Future:
+        """
+        Forward one preference. The future resolves to the version that made
+        it visible, or fails with ValueError if the writer rejected it
+        (RuntimeError if the whole batch failed).
+        """
+        return self._send("preference", (user_id, int(movie_id), bool(liked)))
+
+    def submit_movie(self, movie: Movie) -> Future:
+        """Forward one movie upsert; the future resolves or fails as for submit."""
+        return self._send("movie", movie.dict())
+
+    def _send(self, kind: str, payload: Any) -> Future:
+        future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+        self._requests.put((self.worker, request_id, kind, payload))
+        return future
+
+    def _receive(self):
+        while True:
+            request_id, version, error = self._replies.get()
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(RuntimeError(error) if version is None else ValueError(error))
+            else:
+                future.set_result(version)
+
+
+class WorkerDataService(DataService):
+    """
+    DataService of an API worker: models and preferences come from shared
+    memory, writes (preferences and movie upserts) go to the writer process.
+
+    The worker starts from the latest published base and then applies each
+    version's delta through the same incremental updates the writer made,
+    so only the users a write touched lose their cached results, profiles
+    and neighbour lists. Applying a delta takes the service's write lock
+    for its duration; requests score concurrently under the read lock.
+    """
+
+    def __init__(self, model_segment: str, state_prefix: str, version, base_version, writer: WriterClient, **kwargs):
+        """
+        Args:
+            model_segment: Name of the shared catalogue/model segment
+            state_prefix: Name prefix of the published delta and base segments
+            version: Shared integer holding the latest published version
+            base_version: Shared integer holding the version of the latest base
+            writer: Client for forwarding preference writes
+        """
+        self._model_segment_name = model_segment
+        self._state_prefix = state_prefix
+        self._published_version = version
+        self._base_version = base_version
+        self._writer = writer
+        self._refresh_lock = threading.Lock()
+        self._state_version = 0
+        self._held: Dict[str, SharedArrays] = {}  # role -> segment its arrays are in use from
+        self._upserted: Dict[int, Movie] = {}  # movie ID -> latest upsert applied since the model segment
+        # The writer process retrains and refreshes; workers read what it publishes
+        kwargs.setdefault("retrain_interval", 0)
+        kwargs.setdefault("similarity_refresh_interval", 0)
+        # The shared model segment already includes the writer's catalogue log
+        kwargs.setdefault("catalog_log", None)
+        kwargs.setdefault("catalog_refit_interval", 0)
+        super().__init__(artifact_dir=None, preference_store="memory", durable_writes=False, **kwargs)
+
+    def _load_models(self):
+        self._models = SharedArrays.attach(self._model_segment_name)
+        self._load_model_arrays(self._models.arrays)
+
+    def _replay_preferences(self):
+        self._load_base()
+
+    def _refresh(self):
+        """Catch up with the latest published version."""
+        if self._state_version == self._published_version.value:
+            return
+        with self._refresh_lock:
+            target = self._published_version.value
+            while self._state_version < target:
+                try:
+                    delta = SharedArrays.attach(f"{self._state_prefix}-{self._state_version + 1}")
+                except FileNotFoundError:
+                    # Pruned: this worker fell behind the oldest kept base
+                    self._load_base()
+                    continue
+                self._apply_delta(delta)
+
+    def _load_base(self):
+        """Replace the preference state with the latest published base."""
+        for attempt in itertools.count():
+            version = self._base_version.value
+            try:
+                base = SharedArrays.attach(f"{self._state_prefix}-base-{version}")
+                break
+            except FileNotFoundError:
+                # Superseded and unlinked meanwhile; back off, then read the counter again
+                time.sleep(min(0.001 * 2 ** attempt, 0.1))
+        arrays = base.arrays
+        movies = _movies_from_arrays(arrays, "base.movies")
+        with self._lock.write():
+            # Catalogue rows follow first-upsert order, and the ones applied
+            # here are a prefix of the base's: applying the missing and
+            # changed ones in order gives the writer's rows
+            for movie in movies:
+                if self._upserted.get(movie.id) != movie:
+                    self._apply_movie(movie)
+            self.interactions.load_state(arrays)
+            self.neighbors.rebuild()
+            self.popularity.load_state(arrays)
+            self.factorization_recommender.load_state(arrays)
+            self.item_recommender.load_state(arrays)
+            self.preference_versions = dict(zip(self.interactions.user_ids, arrays["preference_versions"].tolist()))
+            # Derived per-user state is recomputed on demand from the base
+            self.hybrid_recommender.user_profiles.clear()
+            self.hybrid_recommender.user_similarities.clear()
+            self._state_version = version
+            self._hold("base", base)
+            self._hold("trained", base)
+
+    def _apply_delta(self, delta: SharedArrays):
+        """Apply one version's writes (and retrained models, if it carries them)."""
+        movies = _movies_from_arrays(delta.arrays, "delta.movies")
+        user_ids = StringColumn.from_arrays(delta.arrays, "delta.user_ids").tolist()
+        movie_ids = delta.arrays["delta.movie_ids"].tolist()
+        signals = delta.arrays["delta.signals"].tolist()
+        trained = "factorization.item_factors" in delta.arrays
+        with self._lock.write():
+            # In the writer's order: the batch's movies, then its preferences
+            for movie in movies:
+                self._apply_movie(movie)
+            for user_id, movie_id, signal in zip(user_ids, movie_ids, signals):
+                self._apply_preference(user_id, movie_id, signal > 0)
+            if trained:
+                self.factorization_recommender.load_state(delta.arrays)
+                self.item_recommender.load_state(delta.arrays)
+                self._hold("trained", delta)
+            self._state_version += 1
+        if not trained:
+            delta.release()
+
+    def _hold(self, role: str, segment: SharedArrays):
+        """Keep `segment` mapped for `role`, unmapping the one it replaces once nothing else uses it."""
+        previous = self._held.get(role)
+        self._held[role] = segment
+        if previous is not None and all(held is not previous for held in self._held.values()):
+            previous.release()
+
+    def add_user_preferences(self, preferences) -> List[Optional[Exception]]:
+        futures = [self._writer.submit(user_id, movie_id, liked) for user_id, movie_id, liked in preferences]
+        errors = [future.exception() for future in futures]
+        # Read-your-writes: the acks arrive after their version is published
+        self._refresh()
+        return errors
+
+    def upsert_movie(self, movie: Movie) -> Movie:
+        self._writer.submit_movie(movie).result()
+        # Visible here once its version is published, as for preferences
+        self._refresh()
+        return self.get_movie_by_id(movie.id)
+
+    def _apply_movie(self, movie: Movie) -> Movie:
+        movie = super()._apply_movie(movie)
+        self._upserted[movie.id] = movie
+        return movie
+
+    def get_user_preferences(self, user_id: str) -> Dict[str, List[int]]:
+        self._refresh()
+        return super().get_user_preferences(user_id)
+
+    def get_recommendations(self, user_id: str, mode: RecommendationMode, limit: int = 10) -> List[Movie]:
+        self._refresh()
+        return super().get_recommendations(user_id, mode, limit)
+
+    def get_recommendations_many(self, user_ids: List[str], mode: RecommendationMode, limit: int = 10) -> List[List[Movie]]:
+        self._refresh()
+        return super().get_recommendations_many(user_ids, mode, limit)
+
+    def explain_recommendations(self, user_id: str, movie_ids: Optional[List[int]] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        self._refresh()
+        return super().explain_recommendations(user_id, movie_ids, limit)
+
+    def get_recommendations_batch(
+        self,
+        user_ids: List[str],
+        mode: RecommendationMode,
+        limit: int = 10,
+        block_size: int = 256
+    ) -> Iterator[Tuple[str, List[Movie]]]:
+        for start in range(0, len(user_ids), block_size):
+            self._refresh()
+            yield from super().get_recommendations_batch(user_ids[start:start + block_size], mode, limit, block_size)
+
+    def close(self):
+        """Nothing to commit: the writer process owns the preference store."""
+
+
+def _movie_json(movie: Movie) -> str:
+    return json.dumps(movie.dict(), ensure_ascii=False)
+
+
+def _movies_from_arrays(arrays: Dict[str, np.ndarray], prefix: str) -> List[Movie]:
+    return [Movie(**json.loads(text)) for text in StringColumn.from_arrays(arrays, prefix).tolist()]
+
+
+def _run_worker(
+    index: int,
+    sock: socket.socket,
+    model_segment: str,
+    state_prefix: str,
+    version,
+    base_version,
+    requests,
+    replies,
+    log_level: str
+):
+    global _worker_service
+    import uvicorn
+
+    writer = WriterClient(index, requests, replies)
+    _worker_service = WorkerDataService(model_segment, state_prefix, version, base_version, writer)
+    app = importlib.import_module("main").app
+    config = uvicorn.Config(app, log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host: str = "0.0.0.0", port: int = 8000, workers: int = 2, log_level: str = "info", **service_kwargs):
+    """
+    Run `workers` API processes on one listening socket, with this process
+    as model loader and single preference writer.
+    """
+    service = DataService(**service_kwargs)
+    ctx = mp.get_context("spawn")
+    prefix = f"recommender-{os.getpid()}"
+    models = SharedArrays.create(f"{prefix}-models", service.model_arrays())
+    version = ctx.Value('q', 0)
+    base_version = ctx.Value('q', 0)
+    writer = StateWriter(service, prefix, version, base_version)
+    writer.publish()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+
+    requests = ctx.Queue()
+    replies = [ctx.Queue() for _ in range(workers)]
+    processes = [
+        ctx.Process(
+            target=_run_worker,
+            args=(i, sock, models.name, prefix, version, base_version, requests, replies[i], log_level),
+            name=f"api-worker-{i}"
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    # Clean up shared memory on SIGTERM as well as Ctrl-C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        writer.serve(requests, replies)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        writer.close()
+        models.unlink()
+        models.release()
+        service.close()
+        sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the recommender API from several worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.log_level)
+
+
+if __name__ == "__main__":
+    # Run the imported module, not __main__: spawned workers must set
+    # app.serving._worker_service, which the routes module reads
+    from app.serving import main as _main
+    _main()
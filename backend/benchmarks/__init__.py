@@ -0,0 +1,11 @@
+"""
+Benchmarks for the recommenders and the HTTP API.
+
+    python -m benchmarks recommenders --movies 100000 --users 50000
+    python -m benchmarks generate-requests --count 10000 --output requests.jsonl
+    python -m benchmarks replay requests.jsonl --concurrency 32
+    python -m benchmarks compare baseline.json current.json
+
+Run from backend/. Every command prints (or writes with --output) one
+JSON document, so results can be stored and compared between revisions.
+"""
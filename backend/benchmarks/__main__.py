@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+from app.models import RecommendationMode
+from . import __doc__ as USAGE
+
+
+def flatten(results: Any, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    """(dotted path, value) for every numeric leaf of a results document."""
+    if isinstance(results, dict):
+        for key, value in results.items():
+            yield from flatten(value, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(results, (int, float)) and not isinstance(results, bool):
+        yield prefix, float(results)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Metrics that got worse by more than `threshold` (a fraction).
+
+    Throughput metrics (`*_per_second`) should go up; timings, latencies
+    and memory should go down. Parameters and counts are not compared.
+    """
+    base = dict(flatten(baseline))
+    regressions = []
+    for name, value in flatten(current):
+        if name.startswith("params.") or name.endswith(".count") or name not in base or not base[name]:
+            continue
+        change = (value - base[name]) / abs(base[name])
+        if name.endswith("_per_second"):
+            change = -change
+        elif not any(part in name for part in ("seconds", "latency_ms", "_mb")):
+            continue
+        if change > threshold:
+            regressions.append({"metric": name, "baseline": base[name], "current": value, "change": round(change, 4)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description=USAGE, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--output", type=Path, help="Write the JSON results here instead of stdout")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    recommenders = commands.add_parser("recommenders", help="Fit and query every mode on synthetic data")
+    recommenders.add_argument("--movies", type=int, default=10000)
+    recommenders.add_argument("--users", type=int, default=10000)
+    recommenders.add_argument("--mean-per-user", type=float, default=20.0, help="Mean ratings per user")
+    recommenders.add_argument("--requests", type=int, default=1000, help="Users queried per mode")
+    recommenders.add_argument("--cold-fraction", type=float, default=0.05, help="Share of queries for unknown users")
+    recommenders.add_argument("--limit", type=int, default=10)
+    recommenders.add_argument("--batch-size", type=int, default=256)
+    recommenders.add_argument("--mode", action="append", choices=[mode.value for mode in RecommendationMode])
+    recommenders.add_argument("--neighbor-index", default="lsh", choices=["lsh", "exact"])
+    recommenders.add_argument("--no-trace-memory", action="store_true", help="Skip tracemalloc (faster, no peak_mb)")
+    recommenders.add_argument("--seed", type=int, default=0)
+
+    generate = commands.add_parser("generate-requests", help="Write a synthetic request capture (JSONL)")
+    generate.add_argument("--count", type=int, default=10000)
+    generate.add_argument("--users", type=int, default=1000)
+    generate.add_argument("--rate", type=float, default=0.0, help="Arrival rate for `at` offsets (requests/second)")
+    generate.add_argument("--seed", type=int, default=0)
+
+    replay = commands.add_parser("replay", help="Replay a request capture against the app in-process")
+    replay.add_argument("file", type=Path)
+    replay.add_argument("--app", default="main:app", help="ASGI app as module:attribute")
+    replay.add_argument("--concurrency", type=int, default=16)
+    replay.add_argument("--timed", action="store_true", help="Honour the `at` offsets of the capture")
+    replay.add_argument("--durable", action="store_true",
+                        help="Keep the app's configured preference store instead of an in-memory one")
+
+    comparison = commands.add_parser("compare", help="Compare two result files; exit 1 on regressions")
+    comparison.add_argument("baseline", type=Path)
+    comparison.add_argument("current", type=Path)
+    comparison.add_argument("--threshold", type=float, default=0.1, help="Tolerated relative slowdown")
+
+    args = parser.parse_args(argv)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    status = 0
+    try:
+        if args.command == "recommenders":
+            from .recommenders import run
+            results = run(
+                n_movies=args.movies,
+                n_users=args.users,
+                mean_per_user=args.mean_per_user,
+                requests=args.requests,
+                cold_fraction=args.cold_fraction,
+                limit=args.limit,
+                batch_size=args.batch_size,
+                modes=[RecommendationMode(mode) for mode in args.mode] if args.mode else None,
+                neighbor_index=args.neighbor_index,
+                trace_memory=not args.no_trace_memory,
+                seed=args.seed
+            )
+        elif args.command == "generate-requests":
+            from .replay import generate_requests
+            for request in generate_requests(args.count, args.users, rate=args.rate, seed=args.seed):
+                output.write(json.dumps(request) + "\n")
+            return 0
+        elif args.command == "replay":
+            if not args.durable:
+                # Read by the API module when it builds its DataService
+                os.environ.setdefault("PREFERENCE_STORE", "memory")
+            from .replay import run
+            results = run(args.file, args.app, args.concurrency, args.timed)
+        else:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            with open(args.current) as f:
+                current = json.load(f)
+            regressions = compare(baseline, current, args.threshold)
+            results = {"benchmark": "compare", "threshold": args.threshold, "regressions": regressions}
+            status = 1 if regressions else 0
+        json.dump(results, output, indent=2)
+        output.write("\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
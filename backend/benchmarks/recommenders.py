@@ -0,0 +1,186 @@
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from app.catalog import MovieCatalog
+from app.data_service import DataService
+from app.ml.popularity import PopularityRanking
+from app.models import RecommendationMode
+from .synthetic import synthetic_catalog, synthetic_interactions
+
+
+class BenchmarkDataService(DataService):
+    """
+    DataService over an in-memory catalogue and interaction set.
+
+    Records the wall time (and, with trace_memory, the traced peak memory)
+    of every model fit and of the bulk preference load in `timings`.
+    """
+
+    def __init__(
+        self,
+        catalog: MovieCatalog,
+        interactions: Tuple[List[str], List[int], np.ndarray],
+        trace_memory: bool = True,
+        **kwargs
+    ):
+        self.trace_memory = trace_memory
+        self._synthetic_catalog = catalog
+        self._synthetic_interactions = interactions
+        self.timings: Dict[str, Dict[str, float]] = {}
+        kwargs.setdefault("preference_store", "memory")
+        kwargs.setdefault("retrain_interval", 0)
+        kwargs.setdefault("similarity_refresh_interval", 0)
+        kwargs.setdefault("catalog_log", None)
+        kwargs.setdefault("catalog_refit_interval", 0)
+        super().__init__(artifact_dir=None, durable_writes=False, **kwargs)
+
+    def _load_movies(self):
+        self.catalog = self._synthetic_catalog
+        self.popularity = PopularityRanking(self.catalog)
+
+    def _initialize_recommenders(self):
+        with measure(self.timings, "fit.content_based", self.trace_memory):
+            self.content_recommender.fit(self.catalog, self.popularity)
+        with measure(self.timings, "fit.collaborative", self.trace_memory):
+            self.collaborative_recommender.fit(self.catalog, self.popularity)
+        with measure(self.timings, "fit.hybrid", self.trace_memory):
+            self.hybrid_recommender.fit(self.catalog, self.popularity)
+        self.factorization_recommender.fit(self.catalog, self.popularity)
+        self.item_recommender.fit(self.catalog, self.popularity)
+
+    def _replay_preferences(self):
+        user_ids, movie_ids, signals = self._synthetic_interactions
+        if not user_ids:
+            return
+        with measure(self.timings, "load.interactions", self.trace_memory):
+            self.interactions.load(user_ids, movie_ids, signals)
+        with measure(self.timings, "load.neighbor_index", self.trace_memory):
+            self.neighbors.rebuild()
+        with measure(self.timings, "load.popularity", self.trace_memory):
+            self.popularity.load(movie_ids, signals)
+        with measure(self.timings, "load.hybrid_profiles", self.trace_memory):
+            self.hybrid_recommender.rebuild_profiles()
+        with measure(self.timings, "load.factorization", self.trace_memory):
+            self.factorization_recommender.rebuild()
+        with measure(self.timings, "load.item_cooccurrence", self.trace_memory):
+            self.item_recommender.rebuild()
+
+
+@contextmanager
+def measure(results: Dict[str, Dict[str, float]], name: str, trace_memory: bool = True) -> Iterator[None]:
+    """
+    Store the block's wall time as results[name]["seconds"] and, if
+    trace_memory, its peak traced allocation as results[name]["peak_mb"].
+    Tracing slows allocation-heavy Python code, so turn it off for timing runs.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        results[name] = {"seconds": round(time.perf_counter() - started, 6)}
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[name]["peak_mb"] = round(peak / 2**20, 3)
+
+
+def percentiles(samples: Iterable[float], points: Tuple[float, ...] = (50, 90, 95, 99, 99.9)) -> Dict[str, float]:
+    """Latency summary in milliseconds."""
+    samples = np.asarray(list(samples), dtype=np.float64) * 1000
+    if not len(samples):
+        return {}
+    summary = {f"p{point:g}": round(float(np.percentile(samples, point)), 4) for point in points}
+    summary.update(mean=round(float(samples.mean()), 4), max=round(float(samples.max()), 4), count=len(samples))
+    return summary
+
+
+def peak_rss_mb() -> float:
+    """Process high-water resident set size."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+
+def benchmark_mode(
+    service: DataService,
+    mode: RecommendationMode,
+    user_ids: List[str],
+    limit: int,
+    batch_size: int
+) -> Dict[str, Any]:
+    """Per-request latency and batch throughput of one mode, bypassing the result cache."""
+    latencies = []
+    for user_id in user_ids:
+        started = time.perf_counter()
+        service._compute_recommendations(user_id, mode, limit)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for _ in service.get_recommendations_batch(user_ids, mode, limit, block_size=batch_size):
+        pass
+    batch_seconds = time.perf_counter() - started
+
+    return {
+        "latency_ms": percentiles(latencies),
+        "single_users_per_second": round(len(user_ids) / sum(latencies), 2) if latencies else 0.0,
+        "batch_users_per_second": round(len(user_ids) / batch_seconds, 2) if batch_seconds else 0.0,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def run(
+    n_movies: int = 10000,
+    n_users: int = 10000,
+    mean_per_user: float = 20.0,
+    requests: int = 1000,
+    cold_fraction: float = 0.05,
+    limit: int = 10,
+    batch_size: int = 256,
+    modes: Optional[List[RecommendationMode]] = None,
+    neighbor_index: str = "lsh",
+    trace_memory: bool = True,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Fit every recommender on a synthetic catalogue and interaction set, then
+    time each mode on a sample of users (a `cold_fraction` of them unknown).
+    """
+    setup: Dict[str, Dict[str, float]] = {}
+    with measure(setup, "synthesise", trace_memory):
+        catalog = synthetic_catalog(n_movies, seed=seed)
+        interactions = synthetic_interactions(catalog, n_users, mean_per_user, seed=seed)
+
+    service = BenchmarkDataService(catalog, interactions, trace_memory, neighbor_index=neighbor_index)
+    rng = np.random.default_rng(seed)
+    known = rng.choice(n_users, size=requests, replace=True)
+    user_ids = [f"user{u}" if rng.random() >= cold_fraction else f"cold{i}" for i, u in enumerate(known.tolist())]
+
+    results = {}
+    for mode in modes or list(RecommendationMode):
+        results[mode.value] = benchmark_mode(service, mode, user_ids, limit, batch_size)
+
+    return {
+        "benchmark": "recommenders",
+        "params": {
+            "movies": n_movies,
+            "users": n_users,
+            "interactions": len(interactions[0]),
+            "mean_per_user": mean_per_user,
+            "requests": requests,
+            "cold_fraction": cold_fraction,
+            "limit": limit,
+            "batch_size": batch_size,
+            "neighbor_index": neighbor_index,
+            "trace_memory": trace_memory,
+            "seed": seed
+        },
+        "setup": {**setup, **service.timings},
+        "modes": results,
+        "peak_rss_mb": peak_rss_mb()
+    }
@@ -0,0 +1,185 @@
+"""
+Replay of captured HTTP requests against the FastAPI app, in-process.
+
+The request file is JSON Lines, one request per line:
+
+    {"method": "POST", "path": "/api/recommend", "body": {"user_id": "u1", "mode": "hybrid", "limit": 10}}
+    {"method": "GET", "path": "/api/items", "at": 0.25}
+
+`body` (JSON) and `at` (seconds since the start of the capture) are
+optional. Requests are sent straight to the ASGI app, without sockets or
+an HTTP client, so the numbers cover routing, validation, serialisation
+and the DataService, but not the network.
+"""
+import asyncio
+import importlib
+import json
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .recommenders import peak_rss_mb, percentiles
+from .synthetic import zipf_weights
+
+DEFAULT_CSV = Path(__file__).parent.parent / "data" / "movies.csv"
+
+
+def read_requests(path: Path) -> List[Dict[str, Any]]:
+    """Requests from a JSONL capture, skipping blank lines."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def generate_requests(
+    count: int,
+    n_users: int = 1000,
+    csv_path: Path = DEFAULT_CSV,
+    rate: float = 0.0,
+    seed: int = 0
+) -> Iterator[Dict[str, Any]]:
+    """
+    Synthetic capture over the catalogue in `csv_path`: power-law user
+    activity and movie popularity, mostly recommend calls with likes,
+    dislikes and catalogue reads mixed in. With `rate` (requests/second)
+    each request carries a Poisson arrival time in `at`.
+    """
+    rng = np.random.default_rng(seed)
+    movie_ids = pd.read_csv(csv_path, usecols=['id'])['id'].to_numpy()
+    users = rng.choice(n_users, size=count, p=zipf_weights(n_users, 1.0))
+    movies = movie_ids[rng.choice(len(movie_ids), size=count, p=zipf_weights(len(movie_ids), 0.9))]
+    kinds = rng.choice(4, size=count, p=[0.6, 0.2, 0.05, 0.15])
+    modes = rng.choice(['content_based', 'collaborative', 'hybrid'], size=count)
+    at = np.cumsum(rng.exponential(1 / rate, size=count)) if rate else None
+
+    for i in range(count):
+        user_id = f"user{users[i]}"
+        if kinds[i] == 0:
+            request = {"method": "POST", "path": "/api/recommend",
+                       "body": {"user_id": user_id, "mode": str(modes[i]), "limit": 10}}
+        elif kinds[i] in (1, 2):
+            liked = bool(kinds[i] == 1)
+            request = {"method": "POST", "path": "/api/like" if liked else "/api/dislike",
+                       "body": {"user_id": user_id, "movie_id": int(movies[i]), "liked": liked}}
+        else:
+            request = {"method": "GET", "path": f"/api/user/{user_id}/preferences"}
+        if at is not None:
+            request["at"] = round(float(at[i]), 6)
+        yield request
+
+
+def load_app(spec: str):
+    """ASGI app from "module:attribute"."""
+    module, _, attribute = spec.partition(':')
+    return getattr(importlib.import_module(module), attribute or 'app')
+
+
+async def send_request(app, method: str, path: str, body: Optional[Any] = None) -> Tuple[int, bytes]:
+    """Call an ASGI app once; returns (status, response body)."""
+    path, _, query = path.partition('?')
+    payload = b'' if body is None else json.dumps(body).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method.upper(),
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [
+            (b"host", b"benchmark"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode())
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    finished = asyncio.Event()
+    received = False
+    status = 0
+    chunks = []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        # Streaming responses listen for a disconnect; only send it once done
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        finished.set()
+    return status, b''.join(chunks)
+
+
+async def _replay(app, requests: List[Dict[str, Any]], concurrency: int, timed: bool) -> Dict[str, Any]:
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Counter] = defaultdict(Counter)
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+
+    def route(request: Dict[str, Any]) -> str:
+        # Group /api/user/<id>/preferences and friends under one name
+        parts = [part if not any(c.isdigit() for c in part) else '{id}' for part in request["path"].split('?')[0].split('/')]
+        return f"{request['method'].upper()} {'/'.join(parts)}"
+
+    async def one(request: Dict[str, Any]):
+        if timed and "at" in request:
+            delay = started + request["at"] - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        async with semaphore:
+            sent = time.perf_counter()
+            try:
+                status, _ = await send_request(app, request["method"], request["path"], request.get("body"))
+            except Exception as e:
+                status = type(e).__name__
+            name = route(request)
+            latencies[name].append(time.perf_counter() - sent)
+            statuses[name][str(status)] += 1
+
+    async with app.router.lifespan_context(app):
+        await asyncio.gather(*(one(request) for request in requests))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(requests),
+        "seconds": round(elapsed, 6),
+        "requests_per_second": round(len(requests) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": percentiles(sample for samples in latencies.values() for sample in samples),
+        "routes": {
+            name: {"latency_ms": percentiles(latencies[name]), "status": dict(statuses[name])}
+            for name in sorted(latencies)
+        },
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def run(path: Path, app_spec: str = "main:app", concurrency: int = 16, timed: bool = False) -> Dict[str, Any]:
+    """
+    Replay a capture against the app; `concurrency` caps requests in flight,
+    `timed` honours each request's `at` offset instead of sending flat out.
+    """
+    requests = read_requests(path)
+    app = load_app(app_spec)
+    results = asyncio.run(_replay(app, requests, concurrency, timed))
+    return {
+        "benchmark": "replay",
+        "params": {"file": str(path), "app": app_spec, "concurrency": concurrency, "timed": timed},
+        **results
+    }
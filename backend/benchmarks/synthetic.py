@@ -0,0 +1,92 @@
+from typing import List, Tuple
+import numpy as np
+from app.catalog import MovieCatalog
+
+GENRES = ('Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary', 'Drama', 'Family',
+          'Fantasy', 'History', 'Horror', 'Music', 'Mystery', 'Romance', 'Sci-Fi', 'Thriller', 'War', 'Western')
+
+
+def zipf_weights(n: int, exponent: float) -> np.ndarray:
+    """Normalised power-law weights 1 / rank**exponent for ranks 1..n."""
+    weights = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** exponent
+    return weights / weights.sum()
+
+
+def _words(n: int) -> np.ndarray:
+    """n distinct pronounceable tokens ("kalo", "bemiru", ...) for synthetic text."""
+    syllables = np.array([c + v for c in 'bdfgklmnprstvz' for v in 'aeiou'])
+    words, length = [], 2
+    while len(words) < n:
+        grid = np.array(np.meshgrid(*[syllables] * length)).reshape(length, -1)
+        words.extend(''.join(parts) for parts in zip(*grid))
+        length += 1
+    return np.array(words[:n])
+
+
+def synthetic_catalog(
+    n_movies: int,
+    vocabulary: int = 20000,
+    description_words: int = 20,
+    n_directors: int = 0,
+    seed: int = 0
+) -> MovieCatalog:
+    """
+    Catalogue of `n_movies` with TF-IDF-friendly text.
+
+    Description words, genres and directors are drawn from power-law
+    distributions, so the term statistics and neighbour structure look
+    like a real catalogue's rather than uniform noise.
+    """
+    rng = np.random.default_rng(seed)
+    words = _words(vocabulary)
+    n_directors = n_directors or max(n_movies // 8, 1)
+    directors = np.array([f"{first.title()} {last.title()}" for first, last in
+                          zip(_words(n_directors), rng.permutation(_words(n_directors)))])
+
+    word_ids = rng.choice(vocabulary, size=(n_movies, description_words), p=zipf_weights(vocabulary, 1.0))
+    descriptions = [' '.join(row) for row in words[word_ids]]
+    titles = [' '.join(row).title() for row in words[word_ids[:, :3]]]
+    genres = np.array(GENRES)[rng.choice(len(GENRES), size=n_movies, p=zipf_weights(len(GENRES), 0.8))]
+    return MovieCatalog(
+        ids=np.arange(1, n_movies + 1),
+        titles=titles,
+        genres=genres.tolist(),
+        years=rng.integers(1920, 2025, size=n_movies),
+        directors=directors[rng.choice(n_directors, size=n_movies, p=zipf_weights(n_directors, 1.0))].tolist(),
+        descriptions=descriptions,
+        ratings=np.round(np.clip(rng.normal(6.5, 1.2, size=n_movies), 1.0, 10.0), 1)
+    )
+
+
+def synthetic_interactions(
+    catalog: MovieCatalog,
+    n_users: int,
+    mean_per_user: float = 20.0,
+    user_exponent: float = 1.1,
+    item_exponent: float = 0.9,
+    like_ratio: float = 0.8,
+    seed: int = 0
+) -> Tuple[List[str], List[int], np.ndarray]:
+    """
+    Final (user_ids, movie_ids, signals) for `n_users` users, one entry per pair.
+
+    Activity per user and popularity per movie both follow power laws
+    (a few heavy raters, a long tail of rarely rated movies), in the
+    shape InteractionMatrix.load and PopularityRanking.load take.
+    """
+    rng = np.random.default_rng(seed)
+    n_movies = len(catalog)
+    activity = rng.permutation(zipf_weights(n_users, user_exponent))
+    counts = np.maximum(1, np.round(activity * mean_per_user * n_users)).astype(np.int64)
+    counts = np.minimum(counts, n_movies)
+
+    users = np.repeat(np.arange(n_users), counts)
+    popularity = rng.permutation(zipf_weights(n_movies, item_exponent))
+    rows = rng.choice(n_movies, size=len(users), p=popularity)
+
+    # Keep one rating per (user, movie), in first-drawn order
+    _, first = np.unique(users * n_movies + rows, return_index=True)
+    first.sort()
+    users, rows = users[first], rows[first]
+    signals = np.where(rng.random(len(users)) < like_ratio, 1, -1).astype(np.int8)
+    return [f"user{u}" for u in users.tolist()], catalog.ids[rows].tolist(), signals
@@ -1,6 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes.recommendations import router as recommendations_router
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app import metrics
+from app.concurrency import DeadlineExceeded, Overloaded
+from app.routes.recommendations import (
+    router as recommendations_router,
+    data_service,
+    recommendation_coalescer,
+    scoring_executor,
+    write_executor
+)
 
 # Create FastAPI app
 app = FastAPI(
@@ -16,8 +25,13 @@ app.add_middleware(
     allow_credentials=False,  # Must be False when allow_origins=["*"]
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the browser read the /api/items pagination and caching headers
+    expose_headers=["ETag", "Link", "X-Next-Cursor"],
 )
 
+# Send an X-Profile header to get a per-stage Server-Timing breakdown back
+app.add_middleware(metrics.ProfilingMiddleware)
+
 # Include routers
 app.include_router(recommendations_router)
 
@@ -34,11 +48,70 @@ async def root():
             "like": "/api/like",
             "dislike": "/api/dislike", 
             "recommend": "/api/recommend",
-            "mode": "/api/mode"
+            "explain": "/api/explain",
+            "mode": "/api/mode",
+            "metrics": "/metrics"
         }
     }
 
 
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """Shed load: tell clients to back off instead of queueing without bound."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_after))}
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
+@app.on_event("shutdown")
+def shutdown():
+    """Commit pending preference writes and snapshot the preference log."""
+    data_service.close()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage timing histograms and cache, executor and batching gauges in Prometheus text format."""
+    executors = {"scoring": scoring_executor.stats(), "writes": write_executor.stats()}
+    return PlainTextResponse(
+        metrics.render(
+            metrics.gauges(
+                "recommendation_cache",
+                "Recommendation cache counters and size.",
+                (({"stat": key}, value) for key, value in data_service.get_cache_stats().items())
+            ),
+            metrics.gauges(
+                "similarity_cache",
+                "Hybrid neighbour-list cache counters, size and bytes.",
+                (({"stat": key}, value) for key, value in data_service.get_similarity_cache_stats().items())
+            ),
+            metrics.gauges(
+                "executor",
+                "Request executor occupancy and shed/expired counts.",
+                (({"executor": name, "stat": key}, value) for name, stats in executors.items() for key, value in stats.items())
+            ),
+            metrics.gauges(
+                "recommend_batching",
+                "Coalesced /recommend batching counters.",
+                (({"stat": key}, value) for key, value in recommendation_coalescer.stats().items())
+            ),
+            metrics.gauges(
+                "catalog_pages",
+                "Encoded /api/items page cache counters and size.",
+                (({"stat": key}, value) for key, value in data_service.catalog_pages.stats().items())
+            )
+        ),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
@@ -0,0 +1,45 @@
+import pytest
+from app import serving
+from app.data_service import DATA_DIR, DataService
+
+MOVIES_CSV = DATA_DIR / "movies.csv"
+
+
+def make_service(**kwargs) -> DataService:
+    """DataService over the bundled catalogue that writes nothing under data/ and runs no background tasks."""
+    options = dict(
+        csv_path=MOVIES_CSV,
+        artifact_dir=None,
+        preference_store="memory",
+        catalog_log=None,
+        retrain_interval=0,
+        similarity_refresh_interval=0,
+        catalog_refit_interval=0
+    )
+    options.update(kwargs)
+    return DataService(**options)
+
+
+# Importing the routes builds their global DataService: hand it a throwaway
+# one through the hook API workers use, so tests never touch data/
+serving._worker_service = make_service()
+
+
+@pytest.fixture
+def service():
+    service = make_service()
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def client(service, monkeypatch):
+    """TestClient for the app, serving from the `service` fixture."""
+    from fastapi.testclient import TestClient
+    from app.routes import recommendations as routes
+    import main
+
+    monkeypatch.setattr(routes, "data_service", service)
+    monkeypatch.setattr(main, "data_service", service)
+    monkeypatch.setattr(routes.recommendation_coalescer, "service", service)
+    return TestClient(main.app)
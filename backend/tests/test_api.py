@@ -0,0 +1,80 @@
+import json
+from .test_catalog import movie
+
+
+def test_like_dislike_and_preferences(client):
+    assert client.post("/api/like", json={"user_id": "alice", "movie_id": 2, "liked": True}).status_code == 200
+    assert client.post("/api/dislike", json={"user_id": "alice", "movie_id": 8, "liked": False}).status_code == 200
+    response = client.get("/api/user/alice/preferences")
+    assert response.json() == {"user_id": "alice", "liked_movies": [2], "disliked_movies": [8]}
+
+
+def test_recommend_excludes_rated_movies(client):
+    client.post("/api/like", json={"user_id": "alice", "movie_id": 2, "liked": True})
+    for mode in ("content_based", "collaborative", "hybrid", "matrix_factorization", "item_based"):
+        response = client.post("/api/recommend", json={"user_id": "alice", "mode": mode, "limit": 5})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["mode"] == mode and len(body["recommendations"]) == 5
+        assert 2 not in [m["id"] for m in body["recommendations"]]
+
+
+def test_profiled_recommend_gets_server_timing(client):
+    response = client.post("/api/recommend", json={"user_id": "alice"}, headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert "total;dur=" in response.headers["server-timing"]
+
+
+def test_items_pages_and_etags(client):
+    first = client.get("/api/items", params={"limit": 10})
+    assert first.status_code == 200 and len(first.json()) == 10
+    cursor = first.headers["x-next-cursor"]
+    second = client.get("/api/items", params={"limit": 10, "cursor": cursor})
+    assert first.json()[-1]["id"] < second.json()[0]["id"]
+    cached = client.get("/api/items", params={"limit": 10}, headers={"If-None-Match": first.headers["etag"]})
+    assert cached.status_code == 304
+    assert client.get("/api/items", params={"fields": "budget"}).status_code == 400
+    assert client.get("/api/items", params={"cursor": "%%%"}).status_code == 400
+
+
+def test_upserted_movie_is_listed(client):
+    etag = client.get("/api/items").headers["etag"]
+    created = movie(100, genre="Crime")
+    assert client.post("/api/items", json=created.dict()).json()["id"] == 100
+    listed = client.get("/api/items", params={"genre": "crime"}, headers={"If-None-Match": etag})
+    assert listed.status_code == 200 and 100 in [m["id"] for m in listed.json()]
+
+
+def test_batch_streams_one_line_per_user(client):
+    response = client.post("/api/recommend/batch", json={"user_ids": ["a", "b", "c"], "limit": 3})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["user_id"] for line in lines] == ["a", "b", "c"]
+    assert all(len(line["recommendations"]) == 3 for line in lines)
+
+
+def test_metrics_and_health(client):
+    client.post("/api/recommend", json={"user_id": "alice"})
+    text = client.get("/metrics").text
+    assert "recommendation_stage_seconds_bucket" in text and "executor{" in text
+    assert client.get("/health").json() == {"status": "healthy"}
+
+
+def test_ids_are_bounded(client, service):
+    assert client.post("/api/like", json={"user_id": "a" * 257, "movie_id": 2, "liked": True}).status_code == 422
+    assert client.post("/api/like", json={"user_id": "alice", "movie_id": 10**20, "liked": True}).status_code == 422
+    assert client.post("/api/items", json={**movie(1).dict(), "id": 10**10}).status_code == 422
+    assert service.get_user_preferences("alice") == {"liked_movies": [], "disliked_movies": []}
+
+
+def test_items_pages_are_built_off_the_event_loop(client):
+    completed = client.get("/api/executor/stats").json()["scoring"]["completed"]
+    assert client.get("/api/items", params={"limit": 5}).status_code == 200
+    assert client.get("/api/executor/stats").json()["scoring"]["completed"] == completed + 1
+
+
+def test_explain(client):
+    client.post("/api/like", json={"user_id": "alice", "movie_id": 2, "liked": True})
+    response = client.post("/api/explain", json={"user_id": "alice", "movie_ids": [3, 4]})
+    assert [e["movie_id"] for e in response.json()["explanations"]] == [3, 4]
+    assert client.post("/api/explain", json={"user_id": "alice", "movie_ids": [404]}).status_code == 400
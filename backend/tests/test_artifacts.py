@@ -0,0 +1,72 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+from app.artifacts import (
+    ModelArtifacts,
+    StringColumn,
+    content_hash,
+    csr_from_arrays,
+    csr_to_arrays,
+    strings_to_arrays,
+    vectorizer_from_arrays,
+    vectorizer_to_arrays
+)
+from .conftest import MOVIES_CSV, make_service
+
+
+def test_arrays_are_saved_and_memory_mapped(tmp_path):
+    artifacts = ModelArtifacts(tmp_path, "k" * 64)
+    assert not artifacts.exists()
+    artifacts.save({"a": np.arange(5), "b": np.ones((2, 3))}, {"note": "x"})
+    assert artifacts.exists()
+    arrays, meta = artifacts.load()
+    assert isinstance(arrays["a"], np.memmap) and arrays["a"].tolist() == [0, 1, 2, 3, 4]
+    assert meta["note"] == "x"
+    assert not ModelArtifacts(tmp_path, "k" * 16 + "z" * 48).exists()
+
+
+def test_replace_swaps_a_published_artifact(tmp_path):
+    artifacts = ModelArtifacts(tmp_path, "k" * 64)
+    artifacts.save({"a": np.arange(3)})
+    mapped, _ = artifacts.load()
+    artifacts.save({"a": np.arange(5)})
+    assert artifacts.load()[0]["a"].tolist() == [0, 1, 2]
+    artifacts.save({"a": np.arange(5)}, replace=True)
+    assert artifacts.load()[0]["a"].tolist() == [0, 1, 2, 3, 4]
+    assert mapped["a"].tolist() == [0, 1, 2]
+    assert [p.name for p in tmp_path.iterdir()] == ["k" * 16]
+
+
+def test_content_hash_covers_the_model_parameters():
+    assert content_hash(MOVIES_CSV, {"k": 1}) == content_hash(MOVIES_CSV, {"k": 1})
+    assert content_hash(MOVIES_CSV, {"k": 1}) != content_hash(MOVIES_CSV, {"k": 2})
+
+
+def test_string_column_round_trip():
+    values = ["plain", None, "ünïcode", ""]
+    column = StringColumn.from_arrays(strings_to_arrays("s", values), "s")
+    assert len(column) == 4 and column.tolist() == values and column[2] == "ünïcode" and column[-1] == ""
+    ascii_column = StringColumn.from_arrays(strings_to_arrays("s", ["a", None, "bc"]), "s")
+    assert ascii_column.tolist() == ["a", None, "bc"]
+
+
+def test_csr_and_vectorizer_round_trip():
+    matrix = sp.random(5, 7, density=0.3, random_state=0, format='csr')
+    assert (csr_from_arrays(csr_to_arrays("m", matrix), "m") != matrix).nnz == 0
+    vectorizer = TfidfVectorizer().fit(["crime family saga", "space opera", "family drama"])
+    restored = vectorizer_from_arrays(vectorizer_to_arrays("v", vectorizer), "v")
+    assert (restored.transform(["family space"]) != vectorizer.transform(["family space"])).nnz == 0
+
+
+def test_service_starts_from_saved_artifacts(tmp_path):
+    fitted = make_service(artifact_dir=tmp_path)
+    assert len(list(tmp_path.iterdir())) == 1
+    mapped = make_service(artifact_dir=tmp_path)
+    # Read-only views of the mapped files, not copies
+    assert not mapped.content_recommender.neighbors.data.flags.writeable
+    for user_id, liked in [("a", [2, 4]), ("b", [6])]:
+        for movie_id in liked:
+            fitted.add_user_preference(user_id, movie_id, True)
+            mapped.add_user_preference(user_id, movie_id, True)
+        for mode in ("content_based", "hybrid"):
+            assert mapped.get_recommendations(user_id, mode) == fitted.get_recommendations(user_id, mode)
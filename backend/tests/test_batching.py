@@ -0,0 +1,65 @@
+import asyncio
+from app.batching import RecommendationCoalescer
+from app.concurrency import BoundedExecutor
+from app.models import RecommendationMode
+
+
+class RecordingService:
+    def __init__(self):
+        self.calls = []
+
+    def get_recommendations_many(self, user_ids, mode, limit):
+        self.calls.append((list(user_ids), mode, limit))
+        return [[f"{user_id}:{limit}"] for user_id in user_ids]
+
+
+def test_concurrent_requests_share_one_scoring_call():
+    service = RecordingService()
+    executor = BoundedExecutor("test", max_workers=2, max_queue=8, timeout=5.0)
+    coalescer = RecommendationCoalescer(service, executor, window=0.02, max_batch=64)
+
+    async def scenario():
+        return await asyncio.gather(*(
+            coalescer.get_recommendations(user_id, RecommendationMode.HYBRID, 5)
+            for user_id in ["a", "b", "a", "c"]
+        ))
+
+    assert asyncio.run(scenario()) == [["a:5"], ["b:5"], ["a:5"], ["c:5"]]
+    assert service.calls == [(["a", "b", "c"], RecommendationMode.HYBRID, 5)]
+    assert coalescer.stats()["batches"] == 1 and coalescer.stats()["requests"] == 4
+
+
+def test_batches_are_keyed_by_mode_and_limit_and_capped():
+    service = RecordingService()
+    executor = BoundedExecutor("test", max_workers=2, max_queue=8, timeout=5.0)
+    coalescer = RecommendationCoalescer(service, executor, window=0.02, max_batch=2)
+
+    async def scenario():
+        await asyncio.gather(
+            coalescer.get_recommendations("a", RecommendationMode.HYBRID, 5),
+            coalescer.get_recommendations("b", RecommendationMode.HYBRID, 10),
+            coalescer.get_recommendations("c", RecommendationMode.CONTENT_BASED, 5),
+            coalescer.get_recommendations("d", RecommendationMode.CONTENT_BASED, 5),
+            coalescer.get_recommendations("e", RecommendationMode.CONTENT_BASED, 5),
+        )
+
+    asyncio.run(scenario())
+    assert sorted(len(user_ids) for user_ids, _, _ in service.calls) == [1, 1, 1, 2]
+    assert coalescer.stats()["max_batch_size"] == 2
+
+
+def test_errors_reach_every_waiting_request():
+    class Failing:
+        def get_recommendations_many(self, user_ids, mode, limit):
+            raise RuntimeError("boom")
+
+    coalescer = RecommendationCoalescer(Failing(), BoundedExecutor("test", 1, 4, 5.0), window=0.01)
+
+    async def scenario():
+        return await asyncio.gather(
+            coalescer.get_recommendations("a", RecommendationMode.HYBRID),
+            coalescer.get_recommendations("b", RecommendationMode.HYBRID),
+            return_exceptions=True
+        )
+
+    assert [str(result) for result in asyncio.run(scenario())] == ["boom", "boom"]
@@ -0,0 +1,32 @@
+from app.models import RecommendationMode
+from benchmarks import recommenders
+from benchmarks.__main__ import compare
+from benchmarks.replay import generate_requests
+from benchmarks.synthetic import synthetic_catalog, synthetic_interactions
+
+
+def test_synthetic_interactions_have_one_entry_per_pair():
+    catalog = synthetic_catalog(200, vocabulary=500)
+    user_ids, movie_ids, signals = synthetic_interactions(catalog, 50, mean_per_user=8)
+    assert len(set(zip(user_ids, movie_ids))) == len(user_ids) == len(signals)
+    assert set(movie_ids) <= set(catalog.ids.tolist())
+
+
+def test_recommenders_benchmark_runs_every_mode():
+    results = recommenders.run(
+        n_movies=200, n_users=100, mean_per_user=5, requests=20, limit=5, batch_size=8,
+        neighbor_index="exact", trace_memory=False
+    )
+    assert set(results["modes"]) == {mode.value for mode in RecommendationMode}
+
+
+def test_compare_flags_regressions_by_direction():
+    baseline = {"params": {"users": 10}, "hybrid": {"seconds": 1.0, "requests_per_second": 100.0}}
+    current = {"params": {"users": 20}, "hybrid": {"seconds": 1.05, "requests_per_second": 50.0}}
+    assert [r["metric"] for r in compare(baseline, current, 0.1)] == ["hybrid.requests_per_second"]
+
+
+def test_generated_requests_are_valid_api_calls():
+    requests = list(generate_requests(50, n_users=10, rate=100.0))
+    assert len(requests) == 50 and all("at" in request for request in requests)
+    assert {request["path"].split("/")[2] for request in requests} <= {"recommend", "like", "dislike", "user"}
@@ -0,0 +1,96 @@
+from app.cache import RecommendationCache, SimilarityCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_recommendation_cache_expires_by_lookup_ttl():
+    clock = Clock()
+    cache = RecommendationCache(clock=clock)
+    cache.put(("alice", "content_based", 10, 0), ["a"])
+    clock.now = 4.0
+    assert cache.get(("alice", "content_based", 10, 0), ttl=5.0) == ["a"]
+    assert cache.get(("alice", "content_based", 10, 0), ttl=3.0) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_recommendation_cache_evicts_least_recently_used():
+    cache = RecommendationCache(max_entries=2)
+    cache.put(("a", 1), 1)
+    cache.put(("b", 1), 2)
+    cache.get(("a", 1), ttl=60)
+    cache.put(("c", 1), 3)
+    assert cache.get(("b", 1), ttl=60) is None
+    assert cache.get(("a", 1), ttl=60) == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_recommendation_cache_invalidates_every_entry_of_a_user():
+    cache = RecommendationCache()
+    cache.put(("alice", "hybrid", 10, 0), 1)
+    cache.put(("alice", "content_based", 5, 0), 2)
+    cache.put(("bob", "hybrid", 10, 0), 3)
+    cache.invalidate_user("alice")
+    assert cache.get(("alice", "hybrid", 10, 0), ttl=60) is None
+    assert cache.get(("alice", "content_based", 5, 0), ttl=60) is None
+    assert cache.get(("bob", "hybrid", 10, 0), ttl=60) == 3
+
+
+def test_similarity_cache_invalidates_dependents():
+    cache = SimilarityCache()
+    cache.put("alice", [("bob", 0.9), ("carol", 0.5)])
+    cache.put("dave", [("erin", 0.7)])
+    cache.put("bob", [("dave", 0.2)])
+
+    cache.invalidate("carol")  # listed by alice only
+    assert cache.get("alice") is None
+    assert cache.get("dave") == [("erin", 0.7)]
+    assert cache.get("bob") == [("dave", 0.2)]
+
+    cache.invalidate("dave")  # own entry plus bob's, which lists dave
+    assert cache.get("dave") is None and cache.get("bob") is None
+    cache.put("bob", [("erin", 0.1)])
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_similarity_cache_respects_its_byte_bound():
+    neighbours = [(f"user{i}", 0.5) for i in range(10)]
+    cache = SimilarityCache(max_bytes=3 * 1000)
+    for i in range(20):
+        cache.put(f"user{i}", list(neighbours))
+    stats = cache.stats()
+    assert stats["bytes"] <= 3 * 1000 and stats["evictions"] > 0
+    assert len(cache) == stats["size"] < 20
+    # Every remaining entry lists user0; evicted ones are no longer tracked
+    cache.invalidate("user0")
+    assert len(cache) == 0 and cache.stats()["bytes"] == 0
+    assert cache.stats()["invalidations"] == stats["size"]
+
+
+def test_similarity_cache_expires_entries_by_age():
+    clock = Clock()
+    cache = SimilarityCache(max_age=5.0, clock=clock)
+    cache.put("alice", [("bob", 0.9)])
+    clock.now = 4.0
+    assert cache.get("alice") == [("bob", 0.9)]
+    clock.now = 6.0
+    assert cache.get("alice") is None and len(cache) == 0
+    cache.put("alice", [("carol", 0.8)])
+    stats = cache.stats()
+    assert stats["expirations"] == 1 and stats["refreshes"] == 1
+
+
+def test_similarity_cache_forgets_the_oldest_stale_users():
+    cache = SimilarityCache(max_entries=2)
+    for user_id in ["a", "b", "c"]:
+        cache.put(user_id, [("x", 0.5)])
+        cache.invalidate(user_id)
+    for user_id in ["a", "b", "c"]:
+        cache.put(user_id, [])
+    # "a" was forgotten when "c" went stale
+    assert cache.stats()["refreshes"] == 2
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.catalog import MovieCatalog
+from app.models import Movie
+from .conftest import MOVIES_CSV
+
+
+def small_catalog() -> MovieCatalog:
+    return MovieCatalog(
+        ids=[5, 2, 9],
+        titles=["Five", "Two", "Nine"],
+        genres=["Drama", "Crime", "Drama"],
+        years=[2001, 1999, 2010],
+        directors=["A", "B", "A"],
+        descriptions=["five", "two", "nine"],
+        ratings=[7.0, 8.0, 6.5]
+    )
+
+
+def movie(movie_id: int, **fields) -> Movie:
+    values = dict(title=f"Movie {movie_id}", genre="Drama", year=2000, director="D", description="text", rating=5.0)
+    values.update(fields)
+    return Movie(id=movie_id, **values)
+
+
+def test_lookups_by_id():
+    catalog = small_catalog()
+    assert catalog.row_of(2) == 1
+    assert catalog.row_of(3) is None
+    assert catalog.row_of(-1) is None
+    assert catalog.rows_for([9, 4, 5]).tolist() == [2, 0]
+    assert catalog.lookup_rows([9, 4, 5]).tolist() == [2, -1, 0]
+    assert catalog.get(9).title == "Nine"
+    assert catalog.get(9) is catalog.get(9)
+
+
+def test_rejects_duplicate_and_negative_ids():
+    with pytest.raises(ValueError):
+        MovieCatalog([1, 1], ["a", "b"], ["g", "g"], [1, 2], ["d", "d"], ["x", "y"], [1.0, 2.0])
+    with pytest.raises(ValueError):
+        MovieCatalog([-1], ["a"], ["g"], [1], ["d"], ["x"], [1.0])
+
+
+def test_from_csv_matches_the_dataframe_loader():
+    streamed = MovieCatalog.from_csv(MOVIES_CSV, chunk_size=7)
+    loaded = MovieCatalog.from_dataframe(pd.read_csv(MOVIES_CSV))
+    assert streamed.movies() == loaded.movies()
+    assert len(streamed) == 25
+
+
+def test_from_csv_reports_every_invalid_line(tmp_path):
+    path = tmp_path / "movies.csv"
+    path.write_text(
+        "id,title,genre,year,director,description,rating\n"
+        "1,A,Drama,2000,D,x,7.0\n"
+        "2,,Drama,2000,D,x,7.0\n"
+        "3.5,C,Drama,2000,D,x,7.0\n"
+        "4,D,Drama,2000,D,x,\n"
+    )
+    with pytest.raises(ValueError, match=r"3 invalid rows.*lines 3, 4, 5"):
+        MovieCatalog.from_csv(path, chunk_size=2)
+
+
+def test_from_csv_rejects_out_of_range_ids_and_years(tmp_path):
+    path = tmp_path / "movies.csv"
+    path.write_text(
+        "id,title,genre,year,director,description,rating\n"
+        "2147483647,A,Drama,2000,D,x,7.0\n"
+        "2147483648,B,Drama,2000,D,x,7.0\n"
+        "-1,C,Drama,2000,D,x,7.0\n"
+        "4,D,Drama,2147483648,D,x,7.0\n"
+        "5,E,Drama,-2147483649,D,x,7.0\n"
+    )
+    with pytest.raises(ValueError, match=r"4 invalid rows.*lines 3, 4, 5, 6"):
+        MovieCatalog.from_csv(path)
+
+
+def test_from_csv_validates_read_only_columns(tmp_path, monkeypatch):
+    # Copy-on-write pandas hands out read-only views from to_numpy()
+    to_numpy = pd.Series.to_numpy
+
+    def read_only(self, *args, **kwargs):
+        values = to_numpy(self, *args, **kwargs)
+        values.flags.writeable = False
+        return values
+
+    monkeypatch.setattr(pd.Series, "to_numpy", read_only)
+    path = tmp_path / "movies.csv"
+    path.write_text(
+        "id,title,genre,year,director,description,rating\n"
+        "1,,Drama,2000,D,x,7.0\n"
+        "2,B,Drama,2000.5,D,x,7.0\n"
+    )
+    with pytest.raises(ValueError, match=r"2 invalid rows.*lines 2, 3"):
+        MovieCatalog.from_csv(path)
+
+
+def test_from_csv_requires_columns(tmp_path):
+    path = tmp_path / "movies.csv"
+    path.write_text("id,title\n1,A\n")
+    with pytest.raises(ValueError, match="missing columns"):
+        MovieCatalog.from_csv(path)
+
+
+def test_arrays_round_trip():
+    catalog = MovieCatalog.from_csv(MOVIES_CSV)
+    restored = MovieCatalog.from_arrays(catalog.to_arrays())
+    assert restored.movies() == catalog.movies()
+    assert restored.feature_text(include_title=True) == catalog.feature_text(include_title=True)
+
+
+def test_upsert_appends_and_replaces():
+    catalog = MovieCatalog.from_arrays(small_catalog().to_arrays())
+    assert catalog.upsert(movie(40, title="Forty")) == (3, True)
+    assert catalog.get(40).title == "Forty"
+    assert catalog.upsert(movie(2, title="Two again", rating=1.0)) == (1, False)
+    assert catalog.get(2).title == "Two again" and catalog.ratings[1] == 1.0
+    assert [m.id for m in catalog.movies()] == [5, 2, 9, 40]
+    assert catalog.feature_text(rows=[3]) == ["Drama D text"]
+    with pytest.raises(ValueError):
+        catalog.upsert(movie(-3))
+
+
+def test_upserts_keep_blobs_and_size_lookups_by_movie_count():
+    catalog = MovieCatalog.from_arrays(small_catalog().to_arrays())
+    blob = catalog.titles.blob
+    catalog.upsert(movie(2**31 - 1, title="Largest"))
+    for movie_id in range(100, 140):
+        catalog.upsert(movie(movie_id))
+    catalog.upsert(movie(9, title="Nine again"))
+    assert catalog.titles.base.blob is blob
+    assert catalog.row_of(2**31 - 1) == 3 and catalog.row_of(139) == 43 and catalog.row_of(7) is None
+    assert catalog.lookup_rows([9, 2**31 - 1, 139, 7, -1]).tolist() == [2, 3, 43, -1, -1]
+    assert catalog.titles[2] == "Nine again" and catalog.titles[-1] == "Movie 139"
+    assert len(catalog.ids) == len(catalog.years) == len(catalog.ratings) == len(catalog.titles) == 44
+
+    restored = MovieCatalog.from_arrays(catalog.to_arrays())
+    assert restored.movies() == catalog.movies()
+    assert restored.row_of(139) == 43
+
+
+def test_indicator_marks_each_lists_movies():
+    catalog = small_catalog()
+    assert np.array_equal(catalog.indicator([[9, 5], [], [2, 77]]).toarray(), [[1, 0, 1], [0, 0, 0], [0, 1, 0]])
@@ -0,0 +1,51 @@
+import json
+import pytest
+from app.catalog_pages import CatalogPages
+from .test_catalog import small_catalog
+
+
+def movies(page) -> list:
+    return json.loads(page.body)
+
+
+def test_cursor_walks_the_whole_catalogue(service):
+    pages, seen, cursor = CatalogPages(), [], None
+    while True:
+        page = pages.page(service.catalog, 0, cursor, limit=7)
+        seen.extend(movie["id"] for movie in movies(page))
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert seen == service.catalog.ids.tolist()
+
+
+def test_pages_match_the_movie_models():
+    catalog = small_catalog()
+    page = CatalogPages().page(catalog, 0)
+    assert movies(page) == [movie.dict() for movie in catalog.movies()]
+
+
+def test_projection_and_filters():
+    catalog = small_catalog()
+    page = CatalogPages().page(catalog, 0, fields=["title", "id"], genres=[catalog.genres[1].upper()])
+    assert movies(page) == [{"id": int(catalog.ids[1]), "title": catalog.titles[1]}]
+    years = sorted(catalog.years.tolist())
+    page = CatalogPages().page(catalog, 0, year_from=years[1], year_to=years[1])
+    assert [movie["year"] for movie in movies(page)] == [years[1]]
+
+
+def test_pages_are_cached_per_version_with_stable_etags():
+    catalog = small_catalog()
+    pages = CatalogPages()
+    first = pages.page(catalog, 0)
+    assert pages.page(catalog, 0) is first and pages.stats()["hits"] == 1
+    other = CatalogPages().page(catalog, 0)
+    assert other.etag == first.etag
+    pages.page(catalog, 1)
+    assert pages.stats()["pages"] == 1
+
+
+@pytest.mark.parametrize("arguments", [{"limit": 0}, {"fields": ["budget"]}, {"cursor": "not a cursor"}])
+def test_bad_requests(arguments):
+    with pytest.raises(ValueError):
+        CatalogPages().page(small_catalog(), 0, **arguments)
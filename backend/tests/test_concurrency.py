@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.concurrency import BoundedExecutor, DeadlineExceeded, Overloaded, ReadWriteLock
+
+
+def test_executor_sheds_beyond_its_queue():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=1, timeout=5.0)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(Overloaded):
+            await executor.run(lambda: "shed")
+        release.set()
+        return await running, await queued
+
+    assert asyncio.run(scenario()) == (True, "queued")
+    stats = executor.stats()
+    assert stats["shed"] == 1 and stats["completed"] == 2
+
+
+def test_executor_deadline():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=4, timeout=5.0)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(executor.run(time.sleep, 0.5, timeout=0.05))
+    assert executor.stats()["expired"] == 1
+
+
+def test_executor_propagates_errors():
+    executor = BoundedExecutor("test", max_workers=2, max_queue=2, timeout=5.0)
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(executor.run(lambda: 1 / 0))
+
+
+def test_read_write_lock_excludes_writers_from_readers():
+    lock = ReadWriteLock()
+    events = []
+    reading = threading.Event()
+    release = threading.Event()
+
+    def reader():
+        with lock.read():
+            reading.set()
+            release.wait()
+            events.append("read done")
+
+    def writer():
+        with lock.write():
+            events.append("write")
+
+    threads = [threading.Thread(target=reader), threading.Thread(target=writer)]
+    threads[0].start()
+    reading.wait()
+    threads[1].start()
+    time.sleep(0.05)
+    # A second reader shares the lock with the first... unless a writer waits
+    assert events == []
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert events == ["read done", "write"]
@@ -0,0 +1,99 @@
+import numpy as np
+import scipy.sparse as sp
+from app.catalog import MovieCatalog
+from app.ml.content_based import ContentBasedRecommender
+from app.ml.popularity import PopularityRanking
+from app.ml.topk import top_k_neighbors
+from .conftest import MOVIES_CSV
+from .test_catalog import movie
+
+
+def fitted(n_neighbors: int = 5, **kwargs) -> ContentBasedRecommender:
+    catalog = MovieCatalog.from_csv(MOVIES_CSV)
+    recommender = ContentBasedRecommender(n_neighbors=n_neighbors, **kwargs)
+    recommender.fit(catalog, PopularityRanking(catalog))
+    return recommender
+
+
+def dense_recommendations(recommender: ContentBasedRecommender, liked, disliked, limit) -> list:
+    """Reference: average full cosine similarity to the liked movies, as before the neighbour table."""
+    catalog = recommender.catalog
+    table = recommender.neighbors.toarray()
+    scores = table[catalog.rows_for(liked)].mean(axis=0)
+    candidates = np.setdiff1d(np.arange(len(catalog)), catalog.rows_for(liked + disliked))
+    order = candidates[np.lexsort((candidates, -scores[candidates]))]
+    return catalog.ids[order[:limit]].tolist()
+
+
+def test_table_keeps_each_movies_top_k_cosine_neighbours():
+    recommender = fitted(n_neighbors=5)
+    assert np.allclose(recommender.neighbors.toarray(), top_k_neighbors(recommender.tfidf_matrix, 5).toarray())
+    assert recommender.neighbors.getnnz(axis=1).max() <= 5
+
+
+def test_recommendations_exclude_rated_and_fall_back_to_popularity():
+    recommender = fitted()
+    result = recommender.get_recommendations([2, 4], [8], limit=5)
+    assert result == dense_recommendations(recommender, [2, 4], [8], 5)
+    assert not {2, 4, 8} & set(result)
+    assert recommender.get_recommendations([], [1], limit=3) == recommender.popularity.top(3, [1])
+
+
+def test_batch_matches_single_user_calls():
+    recommender = fitted()
+    liked = [[2, 4], [6], [], [999]]
+    disliked = [[8], [], [1], []]
+    batch = recommender.get_recommendations_batch(liked, disliked, limit=6)
+    assert batch == [recommender.get_recommendations(l, d, 6) for l, d in zip(liked, disliked)]
+
+
+def test_added_movies_patch_the_table_like_a_refit_in_the_frozen_space():
+    recommender = fitted(n_neighbors=4, min_compact=10 ** 6)
+    catalog = recommender.catalog
+    additions = [
+        movie(100, genre="Crime", director="Francis Ford Coppola", description="mafia family crime dynasty"),
+        movie(101, genre="Sci-Fi", director="Christopher Nolan", description="space time dream heist"),
+    ]
+    for new in additions:
+        recommender.upsert(catalog.upsert(new)[0])
+
+    reference = recommender.tfidf_vectorizer.transform(catalog.feature_text())
+    assert np.allclose(recommender.tfidf_matrix.toarray(), reference.toarray())
+    assert np.allclose(recommender._patched_table().toarray(), top_k_neighbors(reference, 4).toarray())
+    assert 100 in recommender.get_recommendations([2, 17], [], limit=3)
+
+
+def test_changed_movie_keeps_rows_consistent_until_the_next_refit():
+    recommender = fitted(n_neighbors=4, min_compact=10 ** 6)
+    catalog = recommender.catalog
+    row, added = catalog.upsert(movie(3, genre="Drama", director="Frank Darabont", description="prison hope"))
+    assert not added
+    recommender.upsert(row)
+
+    reference = recommender.tfidf_vectorizer.transform(catalog.feature_text())
+    patched = recommender._patched_table().toarray()
+    expected = top_k_neighbors(reference, 4).toarray()
+    assert np.allclose(patched[row], expected[row])
+    # Rows the movie left are one neighbour short (the table never held
+    # their k+1-th); everything they do hold is a true top-k similarity
+    kept = patched != 0
+    assert np.allclose(patched[kept], expected[kept])
+    assert not (kept & (expected == 0)).any()
+
+
+def test_patch_is_folded_into_the_table_once_large():
+    recommender = fitted(n_neighbors=4, min_compact=0, compact_ratio=0.0)
+    row, _ = recommender.catalog.upsert(movie(100, genre="Crime", description="mafia crime family"))
+    recommender.upsert(row)
+    assert recommender._patch.nnz == 0 and recommender.neighbors.shape == (26, 26)
+    assert recommender.neighbors[row].nnz > 0
+
+
+def test_state_arrays_round_trip():
+    recommender = fitted()
+    restored = ContentBasedRecommender(n_neighbors=5)
+    restored.load_state(recommender.catalog, recommender.popularity, recommender.state_arrays())
+    assert abs(restored.neighbors - recommender.neighbors).max() == 0
+    assert (restored.tfidf_vectorizer.transform(["crime family"]) != recommender.tfidf_vectorizer.transform(["crime family"])).nnz == 0
+    assert restored.get_recommendations([2], [], 5) == recommender.get_recommendations([2], [], 5)
+    assert sp.issparse(restored.tfidf_matrix)
@@ -0,0 +1,61 @@
+import numpy as np
+from app.ml.cooccurrence import ItemCooccurrenceRecommender
+from app.ml.interactions import InteractionMatrix
+from .test_catalog import small_catalog
+
+
+def recommender_with(preferences) -> ItemCooccurrenceRecommender:
+    recommender = ItemCooccurrenceRecommender(interactions=InteractionMatrix())
+    recommender.fit(small_catalog())
+    for user_id, movie_id, liked in preferences:
+        recommender.update(*recommender.interactions.set(user_id, movie_id, liked))
+    return recommender
+
+
+def cosine(recommender: ItemCooccurrenceRecommender) -> np.ndarray:
+    """Positive cosine similarities of the movie columns (the table keeps only those)."""
+    columns = recommender.interactions.csr().toarray().astype(np.float64)
+    norms = np.linalg.norm(columns, axis=0)
+    similarities = columns.T @ columns / np.maximum(np.outer(norms, norms), 1e-12)
+    np.fill_diagonal(similarities, 0)
+    return np.maximum(similarities, 0)
+
+
+def test_pending_changes_merge_into_the_exact_counts():
+    rng = np.random.default_rng(0)
+    preferences = [(f"u{rng.integers(8)}", int(rng.choice([5, 2, 9])), bool(rng.random() < 0.6)) for _ in range(60)]
+    recommender = recommender_with(preferences)
+    assert recommender.pending_changes
+    recommender.install(recommender.refresh(*recommender.snapshot()))
+    assert recommender.pending_changes == 0
+    n = recommender.interactions.n_movies
+    assert np.allclose(recommender.similar.toarray()[:n, :n], cosine(recommender), atol=1e-6)
+
+
+def test_changes_during_a_refresh_stay_pending():
+    recommender = recommender_with([("a", 5, True), ("a", 2, True)])
+    snapshot = recommender.snapshot()
+    recommender.update(*recommender.interactions.set("b", 5, True))
+    recommender.update(*recommender.interactions.set("b", 9, True))
+    recommender.install(recommender.refresh(*snapshot))
+    assert recommender.pending_changes == 1
+    recommender.install(recommender.refresh(*recommender.snapshot()))
+    n = recommender.interactions.n_movies
+    assert np.allclose(recommender.similar.toarray()[:n, :n], cosine(recommender), atol=1e-6)
+
+
+def test_recommends_co_liked_movies():
+    recommender = recommender_with([("a", 5, True), ("a", 9, True), ("b", 5, True)])
+    recommender.rebuild()
+    assert recommender.get_recommendations("b", [5], [], limit=2) == [9]
+    assert recommender.get_recommendations("nobody", [], [], limit=2) == recommender.popularity.top(2)
+
+
+def test_swap_columns_permutes_counts():
+    recommender = recommender_with([("a", 5, True), ("a", 404, True), ("b", 404, True), ("b", 2, False)])
+    recommender.rebuild()
+    before = recommender.similar.toarray()
+    recommender.interactions.swap_movies(1, 3)
+    recommender.swap_columns(1, 3)
+    order = [0, 3, 2, 1]
+    assert np.allclose(recommender.similar.toarray()[:4, :4], before[np.ix_(order, order)])
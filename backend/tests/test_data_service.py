@@ -0,0 +1,252 @@
+import json
+import threading
+import pytest
+from app.ml.cooccurrence import ItemCooccurrenceRecommender
+from app.ml.factorization import FactorizationRecommender
+from app.models import RecommendationMode
+from .conftest import make_service
+from .test_catalog import movie
+from .test_hybrid import seed_preferences
+
+MODES = list(RecommendationMode)
+
+
+def ids(movies) -> list:
+    return [m.id for m in movies]
+
+
+def test_preferences_are_applied_everywhere(service):
+    service.add_user_preference("alice", 2, True)
+    service.add_user_preference("alice", 8, False)
+    assert service.get_user_preferences("alice") == {"liked_movies": [2], "disliked_movies": [8]}
+    assert service.popularity.net_likes[service.catalog.row_of(2)] == 1
+    for mode in MODES:
+        assert not {2, 8} & set(ids(service.get_recommendations("alice", mode, 10)))
+
+
+def test_recommenders_share_one_interaction_store(service):
+    for recommender in (service.collaborative_recommender, service.hybrid_recommender):
+        assert recommender.interactions is service.interactions
+        assert recommender.neighbors is service.neighbors
+    service.add_user_preference("alice", 2, True)
+    assert service.interactions.user_preferences("alice") == {2: True}
+
+
+def test_cached_results_are_invalidated_by_a_preference(service):
+    service.add_user_preference("alice", 2, True)
+    first = service.get_recommendations("alice", RecommendationMode.CONTENT_BASED, 5)
+    assert service.get_recommendations("alice", RecommendationMode.CONTENT_BASED, 5) == first
+    assert service.get_cache_stats()["hits"] == 1
+    service.add_user_preference("alice", first[0].id, False)
+    assert first[0].id not in ids(service.get_recommendations("alice", RecommendationMode.CONTENT_BASED, 5))
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_batch_matches_single_user_calls(service, mode):
+    seed_preferences(service)
+    service.retrain_factorization()
+    service.refresh_item_similarities()
+    user_ids = ["user0", "user4", "user9", "stranger"]
+    single = [ids(service.get_recommendations(user_id, mode, 6)) for user_id in user_ids]
+    service.recommendation_cache.clear()
+    assert [ids(movies) for movies in service.get_recommendations_many(user_ids, mode, 6)] == single
+    batch = dict(service.get_recommendations_batch(user_ids, mode, 6, block_size=3))
+    assert [ids(batch[user_id]) for user_id in user_ids] == single
+
+
+def test_batch_reads_movies_under_the_read_lock(service, monkeypatch):
+    seed_preferences(service)
+    get = service.catalog.get
+    held = []
+    
+    def checked(movie_id):
+        held.append(service._lock._readers > 0)
+        return get(movie_id)
+    
+    monkeypatch.setattr(service.catalog, "get", checked)
+    list(service.get_recommendations_batch(["user0", "user4"], RecommendationMode.HYBRID, 3))
+    assert held and all(held)
+
+
+def test_preferences_are_replayed_on_restart(tmp_path):
+    first = make_service(preference_store="log", preference_dir=tmp_path)
+    seed_preferences(first)
+    first.add_user_preference("user0", 1, False)
+    expected = {mode: ids(first.get_recommendations("user0", mode, 8)) for mode in (RecommendationMode.CONTENT_BASED, RecommendationMode.HYBRID)}
+    preferences = first.get_user_preferences("user0")
+    first.close()
+
+    second = make_service(preference_store="log", preference_dir=tmp_path)
+    assert second.get_user_preferences("user0") == preferences
+    for mode, recommended in expected.items():
+        assert ids(second.get_recommendations("user0", mode, 8)) == recommended
+    second.close()
+
+
+def test_item_similarities_refresh_from_pending_changes(service):
+    seed_preferences(service)
+    service.refresh_item_similarities()
+    service.add_user_preference("user0", 3, True)
+    service.add_user_preference("user1", 3, True)
+    assert service.item_recommender.pending_changes
+    service.refresh_item_similarities()
+    n = service.interactions.n_movies
+    refreshed = service.item_recommender.similar.toarray()[:n, :n]
+    service.item_recommender.rebuild()
+    assert service.item_recommender.pending_changes == 0
+    assert abs(refreshed - service.item_recommender.similar.toarray()[:n, :n]).max() < 1e-6
+
+
+def test_upserted_movies_are_recommendable_and_replayed(tmp_path):
+    log = tmp_path / "catalog.jsonl"
+    first = make_service(catalog_log=log)
+    first.add_user_preference("alice", 2, True)
+    first.add_user_preference("alice", 17, True)
+    first.upsert_movie(movie(100, genre="Crime", director="Francis Ford Coppola", description="mafia family crime dynasty"))
+    assert first.get_movie_by_id(100).genre == "Crime"
+    assert 100 in ids(first.get_recommendations("alice", RecommendationMode.CONTENT_BASED, 3))
+    assert len(log.read_text().splitlines()) == 1
+
+    log.write_text(log.read_text() + '{"id": 101, "title": "torn')
+    second = make_service(catalog_log=log)
+    assert second.get_movie_by_id(100).title == "Movie 100"
+    with pytest.raises(ValueError):
+        second.get_movie_by_id(101)
+
+
+def test_movie_rated_before_it_was_catalogued_takes_its_row(service):
+    service.add_user_preference("alice", 500, True)
+    service.add_user_preference("bob", 500, True)
+    service.add_user_preference("bob", 2, True)
+    service.upsert_movie(movie(500, genre="Crime", description="mafia family"))
+    row = service.catalog.row_of(500)
+    assert service.interactions.movie_index[500] == row
+    assert service.popularity.net_likes[row] == 2
+    for mode in MODES:
+        assert 500 not in ids(service.get_recommendations("alice", mode, 26))
+
+
+def test_models_built_across_a_catalogue_change_are_dropped(service, monkeypatch):
+    seed_preferences(service)
+    service.add_user_preferences([("alice", 500, True), ("alice", 501, True)])
+    version = service.trained_version
+
+    def upserting(build, movie_id):
+        # The movie was rated before it was catalogued, so adding it swaps interaction columns
+        return lambda self, *args: (service.upsert_movie(movie(movie_id)), build(self, *args))[1]
+
+    monkeypatch.setattr(FactorizationRecommender, "train", upserting(FactorizationRecommender.train, 500))
+    monkeypatch.setattr(ItemCooccurrenceRecommender, "refresh", upserting(ItemCooccurrenceRecommender.refresh, 501))
+    service.retrain_factorization()
+    service.refresh_item_similarities()
+    assert service.trained_version == version and not service.factorization_recommender.trained
+    assert service.item_recommender.pending_changes
+
+    monkeypatch.undo()
+    service.retrain_factorization()
+    service.refresh_item_similarities()
+    assert service.trained_version == version + 2 and not service.item_recommender.pending_changes
+
+
+def test_refit_learns_new_terms(service):
+    service.upsert_movie(movie(100, description="zeppelin zeppelin"))
+    assert "zeppelin" not in service.content_recommender.tfidf_vectorizer.vocabulary_
+    service.refit_content_models()
+    assert "zeppelin" in service.content_recommender.tfidf_vectorizer.vocabulary_
+    assert service.content_recommender.tfidf_matrix.shape[0] == 26
+
+
+def test_explain_rejects_unknown_movies(service):
+    seed_preferences(service)
+    with pytest.raises(ValueError):
+        service.explain_recommendations("user0", [404])
+    explained = service.explain_recommendations("user0")
+    assert [e["movie_id"] for e in explained] == ids(service.get_recommendations("user0", RecommendationMode.HYBRID, 10))
+
+
+def test_catalog_log_lines_are_movie_json(tmp_path):
+    log = tmp_path / "catalog.jsonl"
+    service = make_service(catalog_log=log)
+    service.upsert_movie(movie(7, title="Renamed"))
+    assert json.loads(log.read_text())["title"] == "Renamed"
+    assert len(service.catalog) == 25
+
+
+def test_refit_compacts_the_catalog_log_into_the_artifacts(tmp_path):
+    log = tmp_path / "catalog.jsonl"
+    options = dict(artifact_dir=tmp_path / "artifacts", catalog_log=log)
+    service = make_service(**options)
+    service.upsert_movie(movie(100, description="zeppelin zeppelin"))
+    service.upsert_movie(movie(7, title="Renamed"))
+    service.refit_content_models()
+    assert log.read_text() == ""
+    service.upsert_movie(movie(101, title="After"))
+    assert len(log.read_text().splitlines()) == 1
+    
+    restarted = make_service(**options)
+    assert len(restarted.catalog) == 27 and restarted.catalog_version == 1
+    assert restarted.get_movie_by_id(7).title == "Renamed"
+    assert restarted.get_movie_by_id(101).title == "After"
+    assert "zeppelin" in restarted.content_recommender.tfidf_vectorizer.vocabulary_
+
+
+@pytest.mark.parametrize("mode", [RecommendationMode.COLLABORATIVE, RecommendationMode.HYBRID])
+def test_batches_use_the_approximate_index_and_similarity_cache(service, mode):
+    seed_preferences(service, n_users=40)
+    service.neighbors.exact_below = 10
+    assert service.neighbors.approximate
+    user_ids = ["user0", "user4", "user9", "stranger"]
+    single = [ids(service.get_recommendations(user_id, mode, 6)) for user_id in user_ids]
+    service.recommendation_cache.clear()
+    hits = service.hybrid_recommender.user_similarities.hits
+    assert [ids(movies) for movies in service.get_recommendations_many(user_ids, mode, 6)] == single
+    if mode == RecommendationMode.HYBRID:
+        assert service.hybrid_recommender.user_similarities.hits == hits + 3
+
+
+def test_replayed_models_are_trained_in_the_background(tmp_path, monkeypatch):
+    first = make_service(preference_store="log", preference_dir=tmp_path)
+    seed_preferences(first)
+    first.close()
+
+    release = threading.Event()
+    train = FactorizationRecommender.train
+    monkeypatch.setattr(FactorizationRecommender, "train", lambda self, *args: (release.wait(5), train(self, *args))[1])
+    second = make_service(preference_store="log", preference_dir=tmp_path)
+    # Serving starts before ALS finishes, from the popularity fallback
+    assert not second.factorization_recommender.trained and not second.item_recommender.counted
+    rated = second.get_user_preferences("user0")
+    fallback = second.popularity.top(5, rated["liked_movies"] + rated["disliked_movies"])
+    assert ids(second.get_recommendations("user0", RecommendationMode.MATRIX_FACTORIZATION, 5)) == fallback
+    second.add_user_preference("user0", 1, True)
+    release.set()
+    second._replay_training.join(5)
+    assert second.factorization_recommender.trained and second.trained_version == 2
+
+    # The background recount plus the change made meanwhile equals a full recount
+    table = second.item_recommender.similar.toarray()
+    second.refresh_item_similarities()
+    merged = second.item_recommender.similar.toarray()
+    second.item_recommender.rebuild()
+    assert abs(merged - second.item_recommender.similar.toarray()).max() < 1e-6
+    assert table.any()
+    second.close()
+
+
+def test_factorization_is_first_trained_after_enough_changes():
+    service = make_service(retrain_interval=3600, first_training_preferences=10)
+    service.add_user_preferences([("alice", movie_id, True) for movie_id in range(1, 10)])
+    assert service._first_training is None
+    service.add_user_preference("bob", 2, True)
+    service._first_training.join(5)
+    assert service.factorization_recommender.trained and service.trained_version == 1
+    service.close()
+
+
+def test_many_upserts_keep_every_structure_in_step(service):
+    for movie_id in range(100, 140):
+        service.upsert_movie(movie(movie_id, description=f"film number {movie_id}"))
+    assert len(service.catalog) == 65
+    assert service.content_recommender.tfidf_matrix.shape[0] == 65
+    service.add_user_preference("alice", 139, True)
+    assert 139 not in ids(service.get_recommendations("alice", RecommendationMode.CONTENT_BASED, 64))
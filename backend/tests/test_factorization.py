@@ -0,0 +1,67 @@
+import numpy as np
+from app.ml.factorization import FactorizationRecommender
+from app.ml.interactions import InteractionMatrix
+from .test_catalog import small_catalog
+
+
+def block_preferences() -> InteractionMatrix:
+    """Two taste groups: users 0-9 like movies 5 and 2, users 10-19 like movie 9."""
+    matrix = InteractionMatrix()
+    for movie_id in (5, 2, 9):
+        matrix.add_movie(movie_id)
+    for user in range(20):
+        liked = (5, 2) if user < 10 else (9,)
+        for movie_id in liked:
+            matrix.set(f"u{user}", movie_id, True)
+    return matrix
+
+
+def trained() -> FactorizationRecommender:
+    recommender = FactorizationRecommender(factors=4, iterations=15, interactions=block_preferences())
+    recommender.fit(small_catalog())
+    recommender.rebuild()
+    return recommender
+
+
+def test_training_separates_taste_groups():
+    recommender = trained()
+    recommender.update(*recommender.interactions.set("new", 5, True))
+    assert recommender.get_recommendations("new", [5], [], limit=1) == [2]
+
+
+def test_fold_in_solves_the_user_least_squares_problem():
+    recommender = trained()
+    row = recommender.interactions.user_index["u3"]
+    vector = recommender._fold_in(row).astype(np.float64)
+    y = recommender.item_factors.astype(np.float64)
+    signals = recommender.interactions.row_vector(row)
+    confidence = 1 + recommender.alpha * np.abs(signals)
+    preference = (signals > 0).astype(np.float64)
+    system = (y.T * confidence) @ y + recommender.regularization * np.eye(recommender.factors)
+    assert np.allclose(vector, np.linalg.solve(system, (y.T * confidence) @ preference), atol=1e-4)
+
+
+def test_untrained_model_falls_back_to_popularity():
+    recommender = FactorizationRecommender(interactions=block_preferences())
+    recommender.fit(small_catalog())
+    assert not recommender.trained
+    assert recommender.get_recommendations("u0", [5], [], limit=2) == recommender.popularity.top(2, [5])
+
+
+def test_install_keeps_changes_made_during_training():
+    recommender = trained()
+    snapshot = recommender.snapshot()
+    matrix = recommender.interactions
+    recommender.update(*matrix.set("u15", 5, True))
+    recommender.install(recommender.train(*snapshot))
+    assert recommender.changes_since_training == 1
+    row = matrix.user_index["u15"]
+    assert np.allclose(recommender._user_vector(row), recommender._fold_in(row))
+
+
+def test_batch_matches_single_user_calls():
+    recommender = trained()
+    users = ["u1", "u12", "nobody"]
+    lists = [[5], [9], []]
+    batch = recommender.get_recommendations_batch(users, lists, [[], [], []], limit=2)
+    assert batch == [recommender.get_recommendations(u, l, [], 2) for u, l in zip(users, lists)]
@@ -0,0 +1,76 @@
+import numpy as np
+import scipy.sparse as sp
+import pytest
+from .test_catalog import movie
+
+
+def seed_preferences(service, n_users: int = 12, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    ids = service.catalog.ids
+    for user in range(n_users):
+        for movie_id in rng.choice(ids, size=6, replace=False).tolist():
+            service.add_user_preference(f"user{user}", int(movie_id), bool(rng.random() < 0.7))
+
+
+def test_folded_profiles_equal_rebuilt_ones(service):
+    seed_preferences(service)
+    service.add_user_preference("user0", 1, False)
+    hybrid = service.hybrid_recommender
+    for user_id, folded in hybrid.user_profiles.items():
+        prefs = service.get_user_preferences(user_id)
+        rebuilt = hybrid._user_profile(None, prefs["liked_movies"], prefs["disliked_movies"])
+        assert abs(folded - rebuilt).max() == pytest.approx(0, abs=1e-12)
+
+
+def test_batch_matches_single_user_calls(service):
+    seed_preferences(service)
+    hybrid = service.hybrid_recommender
+    user_ids = ["user0", "user3", "user7", "stranger"]
+    prefs = [service.get_user_preferences(user_id) for user_id in user_ids]
+    liked = [p["liked_movies"] for p in prefs]
+    disliked = [p["disliked_movies"] for p in prefs]
+    batch = hybrid.get_recommendations_batch(user_ids, liked, disliked, limit=8)
+    single = [hybrid.get_recommendations(u, l, d, 8) for u, l, d in zip(user_ids, liked, disliked)]
+    assert batch == single
+
+
+def test_blend_ranks_unrated_movies_only(service):
+    seed_preferences(service)
+    hybrid = service.hybrid_recommender
+    prefs = service.get_user_preferences("user5")
+    liked, disliked = prefs["liked_movies"], prefs["disliked_movies"]
+    blended = (
+        hybrid.content_weight * hybrid._get_content_based_scores(liked, disliked, "user5") +
+        hybrid.collaborative_weight * hybrid._get_collaborative_scores("user5", liked, disliked)
+    )
+    unrated = np.setdiff1d(np.arange(len(service.catalog)), service.catalog.rows_for(liked + disliked))
+    expected = service.catalog.ids[unrated[np.lexsort((unrated, -blended[unrated]))]].tolist()
+    assert hybrid.get_recommendations("user5", liked, disliked, limit=100) == expected
+
+
+def test_explain_matches_the_full_score_vectors(service):
+    seed_preferences(service)
+    hybrid = service.hybrid_recommender
+    prefs = service.get_user_preferences("user2")
+    liked, disliked = prefs["liked_movies"], prefs["disliked_movies"]
+    content = hybrid._get_content_based_scores(liked, disliked, "user2")
+    collaborative = hybrid._get_collaborative_scores("user2", liked, disliked)
+    movie_ids = [1, 5, 12, 404]
+
+    explanations = hybrid.explain("user2", movie_ids, liked, disliked)
+    assert [e["movie_id"] for e in explanations] == [1, 5, 12]
+    for explanation in explanations:
+        row = service.catalog.row_of(explanation["movie_id"])
+        assert explanation["content_score"] == round(float(content[row]), 3)
+        assert explanation["collaborative_score"] == round(float(collaborative[row]), 3)
+
+
+def test_upsert_moves_the_profiles_of_raters(service):
+    seed_preferences(service)
+    service.add_user_preference("user1", 7, True)
+    hybrid = service.hybrid_recommender
+    service.upsert_movie(movie(7, genre="Sci-Fi", description="a heist inside dreams"))
+    folded = hybrid.user_profiles["user1"].copy()
+    hybrid.rebuild_profiles()
+    assert abs(folded - hybrid.user_profiles["user1"]).max() == pytest.approx(0, abs=1e-12)
+    assert sp.issparse(folded)
@@ -0,0 +1,80 @@
+import numpy as np
+from app.ml.interactions import InteractionMatrix
+
+
+def dense(matrix: InteractionMatrix) -> np.ndarray:
+    return matrix.csr().toarray()
+
+
+def test_set_returns_previous_and_new_signal():
+    matrix = InteractionMatrix()
+    assert matrix.set("alice", 7, True) == (0, 0, 0, 1)
+    assert matrix.set("alice", 7, False) == (0, 0, 1, -1)
+    assert matrix.set("bob", 7, True) == (1, 0, 0, 1)
+    assert matrix.get(0, 0) == -1
+    assert matrix.user_preferences("alice") == {7: False}
+
+
+def test_tail_and_compacted_base_agree_with_a_dense_replay():
+    rng = np.random.default_rng(0)
+    matrix = InteractionMatrix(min_compact=8)
+    expected = np.zeros((20, 30), dtype=np.int8)
+    for _ in range(400):
+        user, movie, liked = int(rng.integers(20)), int(rng.integers(30)), bool(rng.random() < 0.7)
+        matrix.set(f"u{user}", movie, liked)
+        expected[matrix.user_index[f"u{user}"], matrix.movie_index[movie]] = 1 if liked else -1
+
+    assert np.array_equal(dense(matrix), expected)
+    assert np.allclose(matrix.norms(), np.sqrt((expected.astype(float) ** 2).sum(axis=1)))
+    for row in range(matrix.n_users):
+        cols, vals = matrix.row(row)
+        assert dict(zip(cols.tolist(), vals.tolist())) == {c: v for c, v in enumerate(expected[row].tolist()) if v}
+
+
+def test_matvec_and_cosine_match_dense_products():
+    rng = np.random.default_rng(1)
+    matrix = InteractionMatrix(min_compact=4)
+    for _ in range(150):
+        matrix.set(f"u{rng.integers(12)}", int(rng.integers(15)), bool(rng.random() < 0.6))
+    full = dense(matrix).astype(np.float64)
+    vector = rng.normal(size=matrix.n_movies)
+
+    assert np.allclose(matrix.matvec(vector), full @ vector)
+    assert np.allclose(matrix.matvec(vector, np.array([3, 0, 5]), absolute=True), np.abs(full[[3, 0, 5]]) @ vector)
+    norms = np.linalg.norm(full, axis=1)
+    expected = full @ full[2] / np.where(norms * norms[2] > 0, norms * norms[2], 1)
+    assert np.allclose(matrix.cosine_to(2), expected)
+
+
+def test_bulk_load_matches_incremental_sets():
+    users, movies, signals = ["a", "b", "a", "c"], [1, 1, 2, 3], np.array([1, -1, 1, 1], dtype=np.int8)
+    loaded = InteractionMatrix()
+    loaded.load(users, movies, signals)
+    incremental = InteractionMatrix()
+    for user, movie, signal in zip(users, movies, signals.tolist()):
+        incremental.set(user, movie, signal > 0)
+    assert np.array_equal(dense(loaded), dense(incremental))
+
+
+def test_state_arrays_round_trip():
+    matrix = InteractionMatrix()
+    matrix.set("a", 1, True)
+    matrix.set("b", 2, False)
+    copy = InteractionMatrix()
+    copy.load_state(matrix.state_arrays())
+    assert copy.user_ids == ["a", "b"]
+    assert np.array_equal(dense(copy), dense(matrix))
+
+
+def test_swap_movies_and_column():
+    matrix = InteractionMatrix()
+    matrix.set("a", 10, True)
+    matrix.set("b", 20, False)
+    matrix.set("a", 20, True)
+    before = dense(matrix)
+
+    matrix.swap_movies(0, 1)
+    assert matrix.movie_ids == [20, 10]
+    assert np.array_equal(dense(matrix), before[:, [1, 0]])
+    rows, signals = matrix.column(0)
+    assert sorted(zip(rows.tolist(), signals.tolist())) == [(0, 1), (1, -1)]
@@ -0,0 +1,55 @@
+import asyncio
+from app import metrics
+from app.metrics import Counter, Histogram, Profile, gauges
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test.", labels=("stage",), buckets=(0.1, 1.0))
+    metrics.REGISTRY.remove(histogram)
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, "score")
+    lines = histogram.render()
+    assert 'test_seconds_bucket{stage="score",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="score",le="1"} 3' in lines
+    assert 'test_seconds_bucket{stage="score",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{stage="score"} 4' in lines
+
+
+def test_counter_and_gauges():
+    counter = Counter("test_total", "Test.", labels=("cache",))
+    metrics.REGISTRY.remove(counter)
+    counter.inc("hit")
+    counter.inc("hit", amount=2)
+    assert 'test_total{cache="hit"} 3' in counter.render()
+    lines = gauges("cache", "Cache.", [({"stat": "hits"}, 4), ({"stat": "name"}, "lru"), ({"stat": "on"}, True)])
+    assert lines[2:] == ['cache{stat="hits"} 4']
+
+
+def test_spans_feed_the_request_profile():
+    profile = Profile()
+    token = metrics._profile.set(profile)
+    try:
+        with metrics.recording("hybrid"):
+            for _ in range(2):
+                with metrics.span("score"):
+                    pass
+    finally:
+        metrics._profile.reset(token)
+    assert list(profile.stages) == ["score"]
+    assert profile.server_timing().startswith("score;dur=")
+    assert 'stage="score"' in metrics.render()
+
+
+def test_profiling_middleware_adds_server_timing():
+    sent = []
+
+    async def app(scope, receive, send):
+        assert metrics.current_profile() is not None
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"x-profile", b"1")]}
+    asyncio.run(metrics.ProfilingMiddleware(app)(scope, None, send))
+    assert dict(sent[0]["headers"])[b"server-timing"].startswith(b"total;dur=")
@@ -0,0 +1,63 @@
+import numpy as np
+from app.ml.interactions import InteractionMatrix
+from app.ml.neighbors import ExactNeighborIndex, LSHNeighborIndex, make_neighbor_index
+
+
+def random_matrix(n_users: int = 60, n_movies: int = 40, seed: int = 0) -> InteractionMatrix:
+    rng = np.random.default_rng(seed)
+    matrix = InteractionMatrix()
+    for user in range(n_users):
+        for movie in rng.choice(n_movies, size=8, replace=False).tolist():
+            matrix.set(f"u{user}", movie, bool(rng.random() < 0.7))
+    return matrix
+
+
+def test_exact_query_returns_top_cosine_users():
+    matrix = random_matrix()
+    index = ExactNeighborIndex(matrix)
+    rows, similarities = index.query(0, 5)
+    expected = matrix.cosine_to(0)
+    expected[0] = -np.inf
+    assert np.allclose(similarities, np.sort(expected)[::-1][:5])
+    assert 0 not in rows.tolist()
+
+
+def test_lsh_answers_exactly_below_its_threshold():
+    matrix = random_matrix()
+    lsh = make_neighbor_index(matrix, "lsh")
+    assert lsh.candidates(0) is None
+    assert np.array_equal(lsh.query(3, 5)[0], ExactNeighborIndex(matrix).query(3, 5)[0])
+
+
+def test_lsh_candidates_find_identical_users():
+    matrix = random_matrix()
+    for movie in range(8):
+        matrix.set("twin-a", movie, True)
+        matrix.set("twin-b", movie, True)
+    lsh = LSHNeighborIndex(matrix, exact_below=0)
+    twin = matrix.user_index["twin-a"]
+    assert matrix.user_index["twin-b"] in lsh.candidates(twin).tolist()
+    rows, similarities = lsh.query(twin, 1)
+    assert rows.tolist() == [matrix.user_index["twin-b"]] and np.isclose(similarities[0], 1.0)
+
+
+def test_incremental_updates_match_a_rebuild():
+    matrix = InteractionMatrix()
+    incremental = LSHNeighborIndex(matrix, exact_below=0)
+    rng = np.random.default_rng(2)
+    for _ in range(200):
+        incremental.update(*matrix.set(f"u{rng.integers(30)}", int(rng.integers(25)), bool(rng.random() < 0.5)))
+    rebuilt = LSHNeighborIndex(matrix, exact_below=0)
+    n = matrix.n_users
+    assert np.allclose(incremental._projections[:n], rebuilt._projections[:n], atol=1e-4)
+    assert np.array_equal(incremental._keys[:n], rebuilt._keys[:n])
+
+
+def test_swap_columns_keeps_projections():
+    matrix = random_matrix(20, 10)
+    lsh = LSHNeighborIndex(matrix, exact_below=0)
+    before = lsh._projections[:matrix.n_users].copy()
+    matrix.swap_movies(1, 4)
+    lsh.swap_columns(1, 4)
+    lsh.rebuild()
+    assert np.allclose(lsh._projections[:matrix.n_users], before, atol=1e-4)
@@ -0,0 +1,68 @@
+import numpy as np
+from app.ml.popularity import PopularityRanking
+from .test_catalog import movie, small_catalog
+
+
+def brute_force_top(ranking: PopularityRanking, limit: int, excluded=()) -> list:
+    order = np.lexsort((np.arange(len(ranking.scores)), -ranking.scores))
+    ids = [int(ranking.catalog.ids[row]) for row in order]
+    return [movie_id for movie_id in ids if movie_id not in set(excluded)][:limit]
+
+
+def test_top_is_by_rating_then_catalogue_order():
+    ranking = PopularityRanking(small_catalog())
+    assert ranking.top(2) == [2, 5]
+    assert ranking.top(5, excluded_movies=[2]) == [5, 9]
+
+
+def test_likes_re_rank_movies():
+    ranking = PopularityRanking(small_catalog(), like_weight=1.0)
+    ranking.update(9, 0, 1)
+    ranking.update(9, 0, 1)
+    assert ranking.top(1) == [9]
+    ranking.update(9, 1, -1)
+    assert ranking.top(3) == brute_force_top(ranking, 3)
+    ranking.update(404, 0, 1)  # not in the catalogue: ignored
+    assert ranking.top(3) == brute_force_top(ranking, 3)
+
+
+def test_load_matches_incremental_updates():
+    catalog = small_catalog()
+    incremental = PopularityRanking(catalog)
+    for movie_id, signal in [(5, 1), (9, -1), (9, -1), (2, 1)]:
+        incremental.update(movie_id, 0, signal)
+    loaded = PopularityRanking(catalog)
+    loaded.load([5, 9, 9, 2], [1, -1, -1, 1])
+    assert np.allclose(loaded.scores, incremental.scores)
+    assert loaded.top(3) == incremental.top(3)
+
+
+def test_upsert_ranks_new_and_changed_rows():
+    catalog = small_catalog()
+    ranking = PopularityRanking(catalog, like_weight=1.0)
+    row, _ = catalog.upsert(movie(50, rating=7.5))
+    ranking.upsert(row, net_likes=1)
+    assert ranking.top(1) == [50]
+    row, _ = catalog.upsert(movie(5, rating=0.5))
+    ranking.upsert(row)
+    assert ranking.top(4) == brute_force_top(ranking, 4) == [50, 2, 9, 5]
+
+
+def test_incremental_order_matches_a_full_sort():
+    catalog = small_catalog()
+    ranking = PopularityRanking(catalog, like_weight=0.5)
+    snapshot = {name: array.copy() for name, array in ranking.state_arrays().items()}
+    for array in snapshot.values():
+        array.flags.writeable = False
+    ranking.load_state(snapshot)
+    rng = np.random.default_rng(0)
+    for step in range(200):
+        if step % 20 == 0:
+            row, _ = catalog.upsert(movie(100 + step, rating=float(rng.uniform(0, 10))))
+            ranking.upsert(row, net_likes=int(rng.integers(-2, 3)))
+        else:
+            movie_id = int(rng.choice(catalog.ids))
+            ranking.update(movie_id, int(rng.choice([0, 1, -1])), int(rng.choice([1, -1])))
+        assert ranking.top(len(catalog)) == brute_force_top(ranking, len(catalog))
+    # The read-only snapshot it started from was copied, not shifted in place
+    assert snapshot["popularity.order"].tolist() == [1, 0, 2]
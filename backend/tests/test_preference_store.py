@@ -0,0 +1,160 @@
+import threading
+import pytest
+import app.preference_store
+from app.preference_store import LogPreferenceStore, SQLitePreferenceStore, StoreUnavailable, make_preference_store
+
+
+@pytest.fixture(params=["log", "sqlite"])
+def store_kind(request):
+    return request.param
+
+
+def test_replay_returns_committed_preferences(tmp_path, store_kind):
+    store = make_preference_store(store_kind, tmp_path)
+    store.wait_for(store.append("alice", 1, True))
+    store.append("bob", 2, False)
+    store.wait_for(store.append("alice", 1, False))
+    store.close()
+
+    reopened = make_preference_store(store_kind, tmp_path)
+    latest = {(user_id, movie_id): liked for user_id, movie_id, liked in reopened.replay()}
+    assert latest == {("alice", 1): False, ("bob", 2): False}
+    reopened.close()
+
+
+def test_group_commit_batches_concurrent_writers(tmp_path, store_kind):
+    store = make_preference_store(store_kind, tmp_path, commit_interval=0.01)
+    batches = []
+    write = store._write
+    store._write = lambda batch: (batches.append(len(batch)), write(batch))
+
+    def writer(i: int):
+        store.wait_for(store.append(f"user{i}", i, True))
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.close()
+    assert sum(batches) == 20 and len(batches) < 20
+
+
+def test_log_cuts_off_a_torn_tail(tmp_path):
+    store = LogPreferenceStore(tmp_path, snapshot_bytes=1 << 30)
+    store.append("alice", 1, True)
+    store.append("bob", 2, True)
+    store.flush()
+    store._log.close()
+    # Tear the last record in half, as a crash mid-write would
+    log = tmp_path / "log.bin"
+    log.write_bytes(log.read_bytes()[:-3])
+
+    reopened = LogPreferenceStore(tmp_path)
+    assert list(reopened.replay()) == [("alice", 1, True)]
+    reopened.wait_for(reopened.append("carol", 3, False))
+    assert list(reopened.replay()) == [("alice", 1, True), ("carol", 3, False)]
+    reopened.close()
+
+
+def test_log_compacts_into_the_snapshot(tmp_path):
+    store = LogPreferenceStore(tmp_path, snapshot_bytes=64)
+    for i in range(10):
+        store.append("alice", 1, i % 2 == 0)
+        store.append(f"user{i}", 2, True)
+    store.flush()
+    store._compactor.join()
+    assert (tmp_path / "snapshot.bin").exists() and not (tmp_path / "log.old").exists()
+    assert (tmp_path / "log.bin").stat().st_size < 64 + 64
+    store.close()
+
+    latest = {(u, m): liked for u, m, liked in LogPreferenceStore(tmp_path).replay()}
+    assert latest[("alice", 1)] is False and len(latest) == 11
+
+
+def test_commits_do_not_wait_for_compaction(tmp_path):
+    store = LogPreferenceStore(tmp_path, snapshot_bytes=64)
+    release = threading.Event()
+    fold = store._fold_rotated
+    store._fold_rotated = lambda: (release.wait(), fold())
+    for i in range(5):
+        store.wait_for(store.append(f"user{i}", i, True))
+    assert store._compactor.is_alive()
+    release.set()
+    store.close()
+    assert sorted(LogPreferenceStore(tmp_path).replay()) == [(f"user{i}", i, True) for i in range(5)]
+
+
+def test_failed_batches_are_dropped_and_writes_refused_until_retry(tmp_path, store_kind):
+    store = make_preference_store(store_kind, tmp_path, retry_interval=60)
+    store.wait_for(store.append("alice", 1, True))
+    write = store._write
+
+    def failing(batch):
+        store._write = write
+        raise OSError("disk full")
+
+    store._write = failing
+    with pytest.raises(OSError):
+        store.wait_for(store.append("bob", 2, True))
+    with pytest.raises(StoreUnavailable):
+        store.append("carol", 3, True)
+    store.retry_interval = 0
+    store.wait_for(store.append("dave", 4, True))
+    store.close()
+    reopened = make_preference_store(store_kind, tmp_path)
+    assert list(reopened.replay()) == [("alice", 1, True), ("dave", 4, True)]
+    reopened.close()
+
+
+def test_log_rolls_back_a_batch_whose_fsync_failed(tmp_path, monkeypatch):
+    store = LogPreferenceStore(tmp_path, retry_interval=0)
+    store.wait_for(store.append("alice", 1, True))
+    fsync = app.preference_store.os.fsync
+    failures = [OSError("fsync failed")]
+
+    def failing_fsync(fd):
+        if failures:
+            raise failures.pop()
+        fsync(fd)
+
+    monkeypatch.setattr(app.preference_store.os, "fsync", failing_fsync)
+    with pytest.raises(OSError):
+        store.wait_for(store.append("bob", 2, True))
+    store.wait_for(store.append("carol", 3, True))
+    store.close()
+    assert list(LogPreferenceStore(tmp_path).replay()) == [("alice", 1, True), ("carol", 3, True)]
+
+
+def test_sqlite_keeps_one_row_per_pair(tmp_path):
+    store = SQLitePreferenceStore(tmp_path / "prefs.sqlite3")
+    for liked in (True, False, True):
+        store.append("alice", 1, liked)
+    store.close()
+    assert list(SQLitePreferenceStore(tmp_path / "prefs.sqlite3").replay()) == [("alice", 1, True)]
+
+
+def test_unknown_store_kind(tmp_path):
+    with pytest.raises(ValueError):
+        make_preference_store("redis", tmp_path)
+
+
+@pytest.mark.parametrize("record", [("alice", 1 << 63, True), ("alice", -(1 << 63) - 1, False), ("\udc80", 1, True)])
+def test_bad_records_are_rejected_without_breaking_the_store(tmp_path, store_kind, record):
+    store = make_preference_store(store_kind, tmp_path)
+    store.wait_for(store.append("alice", 1, True))
+    with pytest.raises(ValueError):
+        store.append(*record)
+    store.wait_for(store.append("bob", 2, False))
+    store.close()
+    reopened = make_preference_store(store_kind, tmp_path)
+    assert list(reopened.replay()) == [("alice", 1, True), ("bob", 2, False)]
+    reopened.close()
+
+
+def test_log_rejects_user_ids_its_header_cannot_hold(tmp_path):
+    store = LogPreferenceStore(tmp_path)
+    with pytest.raises(ValueError):
+        store.append("x" * 0x10000, 1, True)
+    store.wait_for(store.append("x" * 0xFFFF, 1, True))
+    store.close()
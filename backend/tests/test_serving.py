@@ -0,0 +1,130 @@
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import uuid
+import numpy as np
+import pytest
+from app.models import RecommendationMode
+from app.serving import SharedArrays, StateWriter, WorkerDataService, WriterClient
+from .conftest import make_service
+from .test_catalog import movie
+from .test_data_service import ids
+
+
+def test_shared_arrays_round_trip():
+    arrays = {"a": np.arange(10, dtype=np.int64), "b": np.ones((3, 2), dtype=np.float32), "empty": np.zeros(0)}
+    created = SharedArrays.create(f"test-{uuid.uuid4().hex[:12]}", arrays)
+    try:
+        attached = SharedArrays.attach(created.name)
+        for key, array in arrays.items():
+            assert np.array_equal(attached.arrays[key], array)
+            assert not attached.arrays[key].flags.writeable
+        attached.release()
+    finally:
+        created.unlink()
+        created.release()
+    with pytest.raises(FileNotFoundError):
+        SharedArrays.attach(created.name)
+
+
+@pytest.fixture
+def cluster():
+    """A writer thread and one worker service in this process, wired as serve() wires processes."""
+    writer_service = make_service()
+    prefix = f"test-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    models = SharedArrays.create(f"{prefix}-models", writer_service.model_arrays())
+    version, base_version = mp.Value('q', 0), mp.Value('q', 0)
+    writer = StateWriter(writer_service, prefix, version, base_version, base_interval=4, poll_interval=0.01)
+    writer.publish()
+    requests, replies = queue.Queue(), [queue.Queue()]
+    thread = threading.Thread(target=writer.serve, args=(requests, replies), daemon=True)
+    thread.start()
+    worker = WorkerDataService(
+        models.name, prefix, version, base_version, WriterClient(0, requests, replies[0]), csv_path=writer_service.csv_path
+    )
+    yield writer_service, worker, writer
+    requests.put(None)
+    thread.join()
+    writer.close()
+    models.unlink()
+    models.release()
+
+
+def test_worker_reads_its_own_writes(cluster):
+    writer_service, worker, _ = cluster
+    worker.add_user_preference("alice", 2, True)
+    worker.add_user_preference("alice", 8, False)
+    worker.add_user_preference("bob", 2, True)
+    worker.add_user_preference("bob", 4, True)
+    assert worker.get_user_preferences("alice") == writer_service.get_user_preferences("alice")
+    for mode in RecommendationMode:
+        assert ids(worker.get_recommendations("alice", mode, 5)) == ids(writer_service.get_recommendations("alice", mode, 5))
+        batch, expected = (service.get_recommendations_many(["alice", "bob"], mode, 5) for service in (worker, writer_service))
+        assert list(map(ids, batch)) == list(map(ids, expected))
+
+
+def test_upserts_reach_workers_as_deltas(cluster):
+    writer_service, worker, _ = cluster
+    worker.add_user_preferences([("alice", 500, True), ("bob", 500, True), ("bob", 2, True)])
+    assert worker.upsert_movie(movie(500, genre="Crime", description="mafia family")) == writer_service.get_movie_by_id(500)
+    worker.upsert_movie(movie(3, title="Renamed"))
+    with pytest.raises(ValueError):
+        worker.upsert_movie(movie(1).copy(update={"id": -1}))
+    assert worker.get_all_movies() == writer_service.get_all_movies()
+    assert worker.interactions.movie_index[500] == worker.catalog.row_of(500)
+    for mode in RecommendationMode:
+        assert ids(worker.get_recommendations("bob", mode, 26)) == ids(writer_service.get_recommendations("bob", mode, 26))
+
+
+def test_writes_reach_workers_as_deltas(cluster, monkeypatch):
+    writer_service, worker, _ = cluster
+    worker.add_user_preferences([("alice", 2, True), ("bob", 4, True), ("bob", 6, False)])
+    worker.get_recommendations("bob", RecommendationMode.HYBRID, 5)
+    bob_profile = worker.hybrid_recommender.user_profiles["bob"]
+    rebuilds = []
+    monkeypatch.setattr(worker.neighbors, "rebuild", lambda: rebuilds.append(1))
+    worker.add_user_preference("alice", 8, True)
+    assert worker.hybrid_recommender.user_profiles["bob"] is bob_profile
+    assert not rebuilds
+    assert worker.get_user_preferences("alice") == writer_service.get_user_preferences("alice")
+
+
+def test_rejected_writes_fail_alone(cluster):
+    writer_service, worker, _ = cluster
+    errors = worker.add_user_preferences([("alice", 2, True), ("alice", 1 << 63, True), ("alice", 3, False)])
+    assert errors[0] is None and isinstance(errors[1], ValueError) and errors[2] is None
+    assert worker.get_user_preferences("alice") == {"liked_movies": [2], "disliked_movies": [3]}
+
+
+def test_lagging_worker_restarts_from_a_base(cluster):
+    writer_service, worker, writer = cluster
+    lagging = WorkerDataService(
+        writer.prefix + "-models", writer.prefix, writer.version, writer.base_version,
+        worker._writer, csv_path=writer_service.csv_path
+    )
+    worker.upsert_movie(movie(3, title="Renamed"))
+    for movie_id in range(1, 21):
+        worker.add_user_preference(f"user{movie_id % 3}", movie_id, movie_id % 2 == 0)
+        if movie_id % 5 == 0:
+            worker.upsert_movie(movie(100 + movie_id, description=f"film number {movie_id}"))
+    assert len(writer._bases) == writer.keep and writer._deltas[0][0] > writer._bases[0][0]
+    for user_id in ("user0", "user1", "user2"):
+        assert lagging.get_user_preferences(user_id) == writer_service.get_user_preferences(user_id)
+        for mode in RecommendationMode:
+            assert ids(lagging.get_recommendations(user_id, mode, 5)) == ids(writer_service.get_recommendations(user_id, mode, 5))
+    assert lagging.get_all_movies() == writer_service.get_all_movies()
+
+
+def test_retrained_models_are_published_while_idle(cluster):
+    writer_service, worker, writer = cluster
+    worker.add_user_preferences([(f"user{u}", m, True) for u in range(6) for m in (1, 2, 3 + u)])
+    assert not worker.factorization_recommender.trained
+    published = writer.version.value
+    writer_service.retrain_factorization()
+    deadline = time.monotonic() + 5
+    while writer.version.value == published and time.monotonic() < deadline:
+        time.sleep(0.01)
+    worker.get_recommendations("user0", RecommendationMode.MATRIX_FACTORIZATION, 5)
+    assert np.array_equal(worker.factorization_recommender.item_factors, writer_service.factorization_recommender.item_factors)
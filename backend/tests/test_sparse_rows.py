@@ -0,0 +1,24 @@
+import numpy as np
+import scipy.sparse as sp
+from app.ml.sparse_rows import GrowableCSR
+
+
+def test_rows_append_past_the_initial_capacity():
+    rng = np.random.default_rng(0)
+    rows = [sp.random(1, 6, density=0.5, random_state=i, format='csr') for i in range(40)]
+    growable = GrowableCSR(sp.vstack(rows[:2], format='csr'))
+    for row in rows[2:]:
+        growable.set_row(growable.matrix.shape[0], row)
+    assert (growable.matrix != sp.vstack(rows, format='csr')).nnz == 0
+
+    replaced = sp.csr_matrix(rng.random((1, 6)))
+    growable.set_row(3, replaced)
+    rows[3] = replaced
+    assert (growable.matrix != sp.vstack(rows, format='csr')).nnz == 0
+
+
+def test_wrapped_matrix_is_not_modified():
+    original = sp.csr_matrix(np.eye(3))
+    growable = GrowableCSR(original)
+    growable.set_row(1, sp.csr_matrix([[0.0, 0.0, 5.0]]))
+    assert original[1, 1] == 1 and growable.matrix[1, 2] == 5
@@ -0,0 +1,44 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+from app.ml.topk import row_blocks, top_k_indices, top_k_neighbors, top_k_rows, top_k_sparse_rows
+
+
+def test_top_k_indices_breaks_ties_by_index():
+    scores = np.array([1.0, 3.0, 2.0, 3.0, 2.0])
+    assert top_k_indices(scores, 3).tolist() == [1, 3, 2]
+    assert top_k_indices(scores, 10).tolist() == [1, 3, 2, 4, 0]
+    assert top_k_indices(scores, 0).tolist() == []
+
+
+def test_top_k_rows_matches_per_row_selection():
+    rng = np.random.default_rng(0)
+    scores = rng.integers(0, 4, size=(30, 12)).astype(np.float64)
+    scores[0, :] = -np.inf
+    for row, top in enumerate(top_k_rows(scores, 5)):
+        expected = top_k_indices(scores[row], 5)
+        assert top.tolist() == expected[np.isfinite(scores[row, expected])].tolist()
+
+
+def test_top_k_neighbors_matches_dense_cosine():
+    rng = np.random.default_rng(1)
+    matrix = normalize(sp.random(40, 25, density=0.2, random_state=1, format='csr'))
+    table = top_k_neighbors(matrix, 4, chunk_size=7).toarray()
+    similarities = (matrix @ matrix.T).toarray()
+    for row in range(40):
+        kept = np.flatnonzero(table[row])
+        assert len(kept) <= 4
+        assert np.allclose(table[row, kept], similarities[row, kept])
+        if len(kept):
+            assert similarities[row, kept].min() >= np.sort(similarities[row])[::-1][min(4, 40) - 1] - 1e-12
+
+
+def test_top_k_sparse_rows_keeps_largest_positive_entries():
+    matrix = sp.csr_matrix(np.array([[0.5, -1.0, 0.2, 0.9], [0.0, 0.0, 0.0, 0.0], [0.3, 0.3, 0.3, 0.1]]))
+    trimmed = top_k_sparse_rows(matrix, 2).toarray()
+    assert np.allclose(trimmed, [[0.5, 0, 0, 0.9], [0, 0, 0, 0], [0.3, 0.3, 0, 0]])
+
+
+def test_row_blocks_cover_every_row():
+    blocks = list(row_blocks(10, 4, max_cells=12))
+    assert [(block.start, block.stop) for block in blocks] == [(0, 3), (3, 6), (6, 9), (9, 10)]
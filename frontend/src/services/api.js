@@ -10,10 +10,18 @@ const api = axios.create({
 });
 
 export const movieAPI = {
-  // Get all movies
+  // Get all movies, following the /api/items page cursors
   getAllMovies: async () => {
-    const response = await api.get('/api/items');
-    return response.data;
+    const movies = [];
+    let cursor = null;
+    do {
+      const response = await api.get('/api/items', {
+        params: { limit: 1000, ...(cursor && { cursor }) }
+      });
+      movies.push(...response.data);
+      cursor = response.headers['x-next-cursor'];
+    } while (cursor);
+    return movies;
   },
 
   // Like a movie